@@ -0,0 +1,160 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+
+STATUS_BLOQUEIO = (403, 429, 503)
+
+
+class HostOcupado(TimeoutError):
+    """O slot do host não ficou livre dentro da espera máxima (ver `AgendadorHosts.slot`)."""
+
+    def __init__(self, host: str, espera: float):
+        super().__init__(f"host {host} ocupado/pausado por mais de {espera:.0f}s")
+        self.host = host
+
+
+class _EstadoHost:
+    def __init__(self, limite: int):
+        self.limite = limite
+        self.ativos = 0
+        self.pausado_ate = 0.0
+        self.falhas_seguidas = 0
+        self.latencia_media = None  # EWMA da duração das requisições
+        self.latencia_base = None   # menor EWMA observada (host "descansado")
+        self.concluidas = 0
+        self.liberou = asyncio.Event()
+
+
+class AgendadorHosts:
+    """Limita requisições simultâneas por hostname, com ajuste adaptativo (AIMD).
+
+    - cada host começa com `limite_inicial` slots e pode crescer até `limite_max`;
+    - 403/429/503 cortam o limite pela metade e pausam o host com backoff exponencial
+      (ou pelo `Retry-After`, quando informado);
+    - timeouts e erros de conexão (`registrar` com status None) também cortam o limite;
+      a partir de `falhas_para_pausa` seguidas o host é pausado com o mesmo backoff;
+    - se a latência média passa de `fator_lentidao` x a latência base do host, o limite
+      diminui em 1; caso contrário cresce em 1 a cada `limite` requisições concluídas.
+
+    Quem espera um host ocupado não segura slot global nenhum: o slot do host deve ser
+    adquirido antes do limite global de concorrência. Quando isso não dá (o download roda
+    dentro de um slot do Crawlee), `slot(host, espera_max)` desiste com HostOcupado.
+    """
+
+    def __init__(self, limite_inicial: int = 2, limite_max: int = 8, limite_min: int = 1,
+                 pausa_base: float = 30.0, pausa_max: float = 600.0, fator_lentidao: float = 3.0,
+                 falhas_para_pausa: int = 3):
+        self.limite_inicial = limite_inicial
+        self.limite_max = limite_max
+        self.limite_min = limite_min
+        self.pausa_base = pausa_base
+        self.pausa_max = pausa_max
+        self.fator_lentidao = fator_lentidao
+        self.falhas_para_pausa = falhas_para_pausa
+        self.hosts: dict[str, _EstadoHost] = {}
+
+    def _estado(self, host: str) -> _EstadoHost:
+        if host not in self.hosts:
+            self.hosts[host] = _EstadoHost(self.limite_inicial)
+        return self.hosts[host]
+
+    def saturado(self, host: str) -> bool:
+        """True se o host está pausado ou com todos os slots ocupados."""
+        estado = self._estado(host)
+        return estado.ativos >= estado.limite or estado.pausado_ate > time.monotonic()
+
+    @asynccontextmanager
+    async def slot(self, host: str, espera_max: float | None = None):
+        """Espera um slot livre do host (respeitando pausas) e o libera ao sair.
+
+        Com `espera_max`, levanta HostOcupado em vez de esperar mais do que isso
+        (ou de cara, se a pausa do host já passa do prazo).
+        """
+        estado = self._estado(host)
+        prazo = None if espera_max is None else time.monotonic() + espera_max
+        while True:
+            agora = time.monotonic()
+            espera = estado.pausado_ate - agora
+            if espera > 0:
+                if prazo is not None and estado.pausado_ate > prazo:
+                    raise HostOcupado(host, espera_max)
+                await asyncio.sleep(espera)
+                continue
+            if estado.ativos < estado.limite:
+                break
+            estado.liberou.clear()
+            if prazo is None:
+                await estado.liberou.wait()
+                continue
+            try:
+                await asyncio.wait_for(estado.liberou.wait(), prazo - agora)
+            except asyncio.TimeoutError:
+                raise HostOcupado(host, espera_max) from None
+
+        estado.ativos += 1
+        try:
+            yield
+        finally:
+            estado.ativos -= 1
+            estado.liberou.set()
+
+    def pausa_restante(self, host: str) -> float:
+        """Segundos até o fim da pausa do host (0 se não está pausado)."""
+        estado = self.hosts.get(host)
+        return max(0.0, estado.pausado_ate - time.monotonic()) if estado else 0.0
+
+    def registrar(self, host: str, status: int | None, duracao: float, retry_after: float | None = None):
+        """Atualiza o limite do host a partir do resultado de uma requisição (status None = timeout/conexão)."""
+        estado = self._estado(host)
+
+        if status is None:
+            estado.falhas_seguidas += 1
+            estado.limite = max(self.limite_min, estado.limite // 2)
+            if estado.falhas_seguidas >= self.falhas_para_pausa:
+                pausa = min(self.pausa_base * 2 ** (estado.falhas_seguidas - self.falhas_para_pausa), self.pausa_max)
+                estado.pausado_ate = time.monotonic() + pausa
+                logging.info(f"Host {host}: {estado.falhas_seguidas} falhas de rede seguidas, "
+                             f"limite {estado.limite}, pausa de {pausa:.0f}s")
+            return
+
+        if status in STATUS_BLOQUEIO:
+            estado.falhas_seguidas += 1
+            estado.limite = max(self.limite_min, estado.limite // 2)
+            pausa = retry_after or min(self.pausa_base * 2 ** (estado.falhas_seguidas - 1), self.pausa_max)
+            estado.pausado_ate = time.monotonic() + pausa
+            logging.info(f"Host {host} respondeu {status}: limite {estado.limite}, pausa de {pausa:.0f}s")
+            return
+
+        estado.falhas_seguidas = 0
+        if estado.latencia_media is None:
+            estado.latencia_media = duracao
+        else:
+            estado.latencia_media = 0.8 * estado.latencia_media + 0.2 * duracao
+        if estado.latencia_base is None or estado.latencia_media < estado.latencia_base:
+            estado.latencia_base = estado.latencia_media
+
+        estado.concluidas += 1
+        if estado.concluidas < estado.limite:
+            return
+        estado.concluidas = 0
+        if estado.latencia_media > self.fator_lentidao * estado.latencia_base:
+            estado.limite = max(self.limite_min, estado.limite - 1)
+        else:
+            estado.limite = min(self.limite_max, estado.limite + 1)
+
+
+def ler_retry_after(headers) -> float | None:
+    """Segundos do cabeçalho Retry-After (em segundos ou como data HTTP)."""
+    valor = headers.get("Retry-After") if headers else None
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,203 @@
+import os
+import asyncio
+import logging
+from functools import partial
+from contextlib import nullcontext
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pymupdf as fitz
+from extrator_emails import extrair_emails_texto, deduplicar
+
+
+class ResultadoPDF(NamedTuple):
+    emails: list[str]  # normalizados e sem repetição
+    paginas_lidas: int
+    paginas_totais: int
+    varredura_completa: bool  # True se precisou ler o documento inteiro
+    somente_imagem: bool = False  # sem camada de texto (digitalizado); a varredura não foi feita
+    pagina_ocr: bytes | None = None  # 1ª página como PDF avulso, para a fila de OCR (só com `pagina_ocr=True`)
+
+
+# abaixo disso a página é considerada sem texto (cabeçalhos/rodapés gerados pelo repositório têm mais)
+LIMIAR_TEXTO_PAGINA = 40
+
+
+def paginas_prioritarias(total: int, primeiras: int, ultimas: int) -> list[int]:
+    """Índices das primeiras N e últimas M páginas, sem repetição e em ordem."""
+    inicio = range(min(primeiras, total))
+    fim = range(max(total - ultimas, 0), total)
+    return sorted(set(inicio) | set(fim))
+
+
+def _varrer_paginas(doc, indices) -> list[str]:
+    emails = []
+    for i in indices:
+        text = doc[i].get_text() or ""
+        emails.extend(extrair_emails_texto(text))
+    return deduplicar(emails)
+
+
+def detectar_somente_imagem(doc, paginas: int = 2) -> bool:
+    """True se as primeiras `paginas` não têm texto nem fontes, mas têm imagens (PDF digitalizado).
+
+    Olha só o inventário da página (texto, fontes e imagens), sem renderizar nada, então custa
+    quase o mesmo que abrir o documento; evita varrer um PDF inteiro que não tem o que extrair.
+    """
+    for i in range(min(paginas, doc.page_count)):
+        page = doc[i]
+        if page.get_fonts() or not page.get_images():
+            return False
+        if len((page.get_text() or "").strip()) >= LIMIAR_TEXTO_PAGINA:
+            return False
+    return doc.page_count > 0
+
+
+def _primeira_pagina(doc) -> bytes:
+    novo = fitz.open()
+    novo.insert_pdf(doc, from_page=0, to_page=0)
+    return novo.tobytes(garbage=3, deflate=True)
+
+
+def _abrir_pdf(origem: bytes | str):
+    """Abre o PDF a partir dos bytes em memória ou de um caminho em disco."""
+    if isinstance(origem, str):
+        return fitz.open(origem, filetype="pdf")
+    return fitz.open(stream=origem, filetype="pdf")
+
+
+def extrair_emails_pdf(origem: bytes | str, primeiras_paginas: int | None = None, ultimas_paginas: int | None = None,
+                       pagina_ocr: bool = False) -> ResultadoPDF:
+    """Abre o PDF (bytes ou caminho de arquivo) e varre o texto procurando por emails.
+
+    Sem orçamento de páginas lê o documento inteiro. Com `primeiras_paginas`/`ultimas_paginas`
+    lê primeiro só essas páginas (onde ficam os emails dos autores correspondentes) e
+    só faz a varredura completa se nada for encontrado nelas.
+
+    PDFs sem camada de texto (ver `detectar_somente_imagem`) voltam com `somente_imagem`
+    em vez de uma varredura completa vazia; com `pagina_ocr` trazem a 1ª página para OCR.
+
+    Função de módulo (e não método) para poder ser enviada a um ProcessPoolExecutor.
+    """
+    with _abrir_pdf(origem) as doc:
+        total = doc.page_count
+        if detectar_somente_imagem(doc):
+            return ResultadoPDF([], min(2, total), total, False, True, _primeira_pagina(doc) if pagina_ocr else None)
+        if primeiras_paginas is None and ultimas_paginas is None:
+            return ResultadoPDF(_varrer_paginas(doc, range(total)), total, total, True)
+
+        prioritarias = paginas_prioritarias(total, primeiras_paginas or 0, ultimas_paginas or 0)
+        emails = _varrer_paginas(doc, prioritarias)
+        if emails or len(prioritarias) == total:
+            return ResultadoPDF(emails, len(prioritarias), total, len(prioritarias) == total)
+
+        # nada nas páginas prioritárias: fallback para o restante do documento
+        lidas = set(prioritarias)
+        restantes = [i for i in range(total) if i not in lidas]
+        emails = _varrer_paginas(doc, restantes)
+        return ResultadoPDF(emails, total, total, True)
+
+
+class BackendExtracao:
+    """Executa a extração de PDFs fora do event loop.
+
+    Modos:
+        - "inline": roda no próprio event loop (comportamento antigo, bom para debug)
+        - "thread": ThreadPoolExecutor (PyMuPDF libera parte do GIL)
+        - "processo": ProcessPoolExecutor com um worker por núcleo
+
+    `max_pendentes` limita quantos PDFs podem estar na fila/execução ao mesmo tempo.
+    Os crawlers reservam a vaga com `reservar` antes do download, para que o corpo nem
+    chegue à memória enquanto a extração está atrasada; quem passar do limite espera
+    ali, segurando a tarefa do crawler. Sem reserva, a espera fica no `extrair`.
+
+    `primeiras_paginas`/`ultimas_paginas` ativam a varredura com orçamento de páginas
+    (ver `extrair_emails_pdf`); None nos dois lê sempre o documento inteiro.
+    `pagina_ocr` faz os PDFs somente imagem trazerem a 1ª página (para a FilaOCR).
+    Os contadores `paginas_lidas`, `paginas_totais`, `varreduras_completas` e
+    `somente_imagem` acumulam o que foi efetivamente processado durante a execução.
+    """
+
+    MODOS = ("inline", "thread", "processo")
+
+    def __init__(self, modo: str = "processo", max_workers: int | None = None, max_pendentes: int | None = None,
+                 primeiras_paginas: int | None = 2, ultimas_paginas: int | None = 1, pagina_ocr: bool = False):
+        if modo not in self.MODOS:
+            raise ValueError(f"Modo de extração inválido: {modo} (use um de {self.MODOS})")
+        self.modo = modo
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pendentes = max_pendentes or self.max_workers * 2
+        self._extrair = partial(extrair_emails_pdf, primeiras_paginas=primeiras_paginas, ultimas_paginas=ultimas_paginas,
+                                pagina_ocr=pagina_ocr)
+
+        # contadores de páginas
+        self.pdfs_processados = 0
+        self.paginas_lidas = 0
+        self.paginas_totais = 0
+        self.varreduras_completas = 0
+        self.somente_imagem = 0
+
+        self._executor = None
+        self._sem = None  # criado sob demanda, dentro do event loop
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.modo == "thread":
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pdf")
+            elif self.modo == "processo":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _semaforo(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_pendentes)
+        return self._sem
+
+    async def reservar(self):
+        """Espera uma das `max_pendentes` vagas antes do download do PDF; devolve a função que a libera.
+
+        O PDF baixado com a vaga vai para `extrair(origem, reservado=True)`; quem baixou
+        libera a vaga ao descartar a resposta (ver RespostaPDF.reter_vaga).
+        """
+        sem = self._semaforo()
+        await sem.acquire()
+        liberada = False
+
+        def liberar():
+            nonlocal liberada
+            if not liberada:
+                liberada = True
+                sem.release()
+        return liberar
+
+    async def extrair(self, origem: bytes | str, reservado: bool = False) -> ResultadoPDF:
+        """Envia o PDF (bytes ou caminho em disco) para o backend e aguarda o resultado da extração.
+
+        Passar o caminho evita serializar o documento inteiro para o processo worker.
+        Com `reservado` a vaga já foi tomada por `reservar` antes do download.
+        """
+        async with nullcontext() if reservado else self._semaforo():  # backpressure: no máximo `max_pendentes` PDFs
+            if self.modo == "inline":
+                resultado = self._extrair(origem)
+            else:
+                loop = asyncio.get_running_loop()
+                resultado = await loop.run_in_executor(self._get_executor(), self._extrair, origem)
+
+        self.pdfs_processados += 1
+        self.paginas_lidas += resultado.paginas_lidas
+        self.paginas_totais += resultado.paginas_totais
+        self.varreduras_completas += resultado.varredura_completa
+        self.somente_imagem += resultado.somente_imagem
+        return resultado
+
+    def fechar(self):
+        """Encerra o pool (se houver), esperando as extrações em andamento."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logging.info(
+            f"Backend de extração '{self.modo}' encerrado | "
+            f"PDFs: {self.pdfs_processados} | "
+            f"Páginas lidas: {self.paginas_lidas}/{self.paginas_totais} | "
+            f"Varreduras completas: {self.varreduras_completas} | "
+            f"Somente imagem: {self.somente_imagem}"
+        )
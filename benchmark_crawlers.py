@@ -0,0 +1,348 @@
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from aiohttp import web
+import pandas as pd
+
+try:
+    import resource  # só Unix: CPU e pico de memória vêm do getrusage
+except ImportError:
+    resource = None
+
+
+PASTA_REPO = Path(__file__).resolve().parent
+# crawlee = FormatadoCrawler; aiohttp/impit = PipelinePDF com o transporte de mesmo nome
+CRAWLERS = ("crawlee", "aiohttp", "impit")
+REGEX_PDF = re.compile(r"/pdf/(\d+)")
+# ru_maxrss vem em KB no Linux e em bytes no macOS
+BYTES_MAXRSS = 1 if sys.platform == "darwin" else 1024
+
+
+# ---------------- servidor simulado ----------------
+class ServidorMock:
+    """Imita a API da Unpaywall e os hosts de PDF num servidor HTTP local.
+
+    Cada "host" de PDF é um endereço de loopback diferente (127.0.0.2, 127.0.0.3, ...),
+    para que o agendador por host dos crawlers veja hosts distintos. Os primeiros
+    `hosts_lentos` hosts respondem com `latencia_lenta`. A resposta da Unpaywall
+    (latência, 404, Elsevier) é sorteada com semente fixa pelo DOI, então todas as
+    execuções veem o mesmo cenário; 403/429 dos PDFs são sorteados a cada requisição.
+
+    `chegadas_unpaywall`/`chegadas_pdf` guardam o instante (time.time) da primeira
+    requisição de cada DOI, usado para medir a latência por etapa.
+    """
+
+    def __init__(self, pdfs: list[bytes], porta: int = 8765, n_hosts: int = 4, hosts_lentos: int = 1,
+                 latencia: tuple[float, float] = (0.05, 0.2), latencia_lenta: tuple[float, float] = (1.0, 3.0),
+                 taxa_404: float = 0.05, taxa_403: float = 0.02, taxa_429: float = 0.02, taxa_elsevier: float = 0.0,
+                 seed: int = 42):
+        self.pdfs = pdfs
+        self.porta = porta
+        self.n_hosts = n_hosts
+        self.hosts_lentos = hosts_lentos
+        self.latencia = latencia
+        self.latencia_lenta = latencia_lenta
+        self.taxa_404 = taxa_404
+        self.taxa_403 = taxa_403
+        self.taxa_429 = taxa_429
+        self.taxa_elsevier = taxa_elsevier
+        self.seed = seed
+        self._runner = None
+        self.zerar()
+
+    @property
+    def url_base_unpaywall(self) -> str:
+        return f"http://127.0.0.1:{self.porta}/v2/"
+
+    def zerar(self):
+        self.chegadas_unpaywall = {}
+        self.chegadas_pdf = {}
+        self.status = {}
+
+    def _sorteio(self, doi: str) -> random.Random:
+        return random.Random(f"{self.seed}:{doi}")
+
+    def _contar(self, status: int):
+        self.status[status] = self.status.get(status, 0) + 1
+
+    async def _unpaywall(self, request: web.Request):
+        doi = request.match_info["doi"]
+        self.chegadas_unpaywall.setdefault(doi, time.time())
+        rng = self._sorteio(doi)
+        await asyncio.sleep(rng.uniform(*self.latencia))
+
+        if rng.random() < self.taxa_404:
+            self._contar(404)
+            return web.json_response({"message": "not found"}, status=404)
+        indice = int(doi.rsplit(".", 1)[-1])
+        host = 2 + indice % self.n_hosts
+        publisher = "Elsevier BV" if rng.random() < self.taxa_elsevier else "Editora Simulada"
+        self._contar(200)
+        return web.json_response({
+            "doi": doi,
+            "doi_url": f"https://doi.org/{doi}",
+            "publisher": publisher,
+            "best_oa_location": {"url_for_pdf": f"http://127.0.0.{host}:{self.porta}/pdf/{indice}"},
+        })
+
+    async def _pdf(self, request: web.Request):
+        indice = int(REGEX_PDF.match(request.path).group(1))
+        doi = f"10.5555/bench.{indice}"
+        self.chegadas_pdf.setdefault(doi, time.time())
+        host = 2 + indice % self.n_hosts
+        lento = host - 2 < self.hosts_lentos
+        await asyncio.sleep(random.uniform(*(self.latencia_lenta if lento else self.latencia)))
+
+        # sorteados a cada requisição: o 429 é transitório (a retentativa pode passar), o 403 é definitivo
+        sorte = random.random()
+        if sorte < self.taxa_403:
+            self._contar(403)
+            return web.Response(status=403, text="forbidden")
+        if sorte < self.taxa_403 + self.taxa_429:
+            self._contar(429)
+            return web.Response(status=429, text="slow down", headers={"Retry-After": "1"})
+        self._contar(200)
+        return web.Response(body=self.pdfs[indice % len(self.pdfs)], content_type="application/pdf")
+
+    async def iniciar(self):
+        app = web.Application()
+        app.router.add_get("/v2/{doi:.+}", self._unpaywall)
+        app.router.add_get("/pdf/{indice}", self._pdf)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for host in range(1, self.n_hosts + 2):  # 127.0.0.1 = Unpaywall, os demais = hosts de PDF
+            await web.TCPSite(self._runner, f"127.0.0.{host}", self.porta).start()
+
+    async def parar(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def gerar_pdfs_sinteticos(quantidade: int = 5, paginas: int = 8) -> list[bytes]:
+    """PDFs de texto com emails na primeira página, para quando não há corpus real."""
+    import pymupdf as fitz
+    pdfs = []
+    for i in range(quantidade):
+        with fitz.open() as doc:
+            for p in range(paginas):
+                page = doc.new_page()
+                texto = f"Artigo simulado {i}, página {p + 1}.\n" + "Lorem ipsum dolor sit amet. " * 40
+                if p == 0:
+                    texto += f"\nCorrespondência: autor{i}@univ{i}.edu, {{ana,bia}}@lab{i}.org"
+                page.insert_textbox(page.rect + (50, 50, -50, -50), texto)
+            pdfs.append(doc.tobytes())
+    return pdfs
+
+
+def ler_corpus(pasta_pdfs) -> list[bytes]:
+    return [p.read_bytes() for p in sorted(Path(pasta_pdfs).glob("*.pdf"))]
+
+
+# ---------------- execução de um crawler (subprocesso) ----------------
+async def _rodar_crawler(crawler: str, concorrencia: int, pasta: Path, url_base: str):
+    import settings
+    settings.URL_BASE_UNPAYWALL = url_base  # os dois crawlers montam a URL da API a partir daqui
+
+    planilha = pasta / "dois.xlsx"
+    diario = pasta / "progresso.sqlite"
+    if crawler == "crawlee":
+        from hibrido_pdf import FormatadoCrawler
+        scrap = FormatadoCrawler()
+        await scrap.main(str(planilha), str(pasta / "emails.csv"), str(pasta / "elsevier.csv"), amostra=None,
+                         caminho_progresso=str(diario), concorrencia_maxima=concorrencia)
+    else:
+        from pipeline_pdf import PipelinePDF
+        from transportes import TRANSPORTES
+        scrap = PipelinePDF(TRANSPORTES[crawler]())
+        await scrap.main(str(planilha), str(pasta / "emails.csv"), str(pasta / "elsevier.csv"),
+                         concorrencia=concorrencia, caminho_progresso=str(diario))
+
+
+def executar_crawler(crawler: str, concorrencia: int, pasta: Path, url_base: str):
+    """Roda o crawler e grava em `pasta/medidas.json` o tempo de parede, CPU e pico de memória.
+
+    Roda num processo próprio para que CPU e memória (ru_maxrss) sejam só desta execução.
+    Sem o módulo `resource` (Windows) a CPU é só a deste processo e a memória fica None.
+    """
+    inicio = time.perf_counter()
+    asyncio.run(_rodar_crawler(crawler, concorrencia, pasta, url_base))
+    duracao = time.perf_counter() - inicio
+
+    if resource is None:
+        medidas = {"duracao": duracao, "cpu": time.process_time(), "pico_memoria_mb": None, "pico_memoria_workers_mb": None}
+    else:
+        proprio = resource.getrusage(resource.RUSAGE_SELF)
+        filhos = resource.getrusage(resource.RUSAGE_CHILDREN)  # workers do ProcessPoolExecutor
+        medidas = {
+            "duracao": duracao,
+            "cpu": proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime,
+            "pico_memoria_mb": proprio.ru_maxrss * BYTES_MAXRSS / 2 ** 20,
+            "pico_memoria_workers_mb": filhos.ru_maxrss * BYTES_MAXRSS / 2 ** 20,
+        }
+    (pasta / "medidas.json").write_text(json.dumps(medidas), encoding="utf-8")
+
+
+# ---------------- relatório ----------------
+def percentil(valores: list[float], p: float) -> float | None:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def _latencias(servidor: ServidorMock, diario: Path) -> tuple[dict, dict]:
+    """Latência por etapa de cada DOI, cruzando as chegadas no servidor com o diário de progresso."""
+    conn = sqlite3.connect(diario)
+    try:
+        registros = conn.execute("SELECT doi, estado, atualizado_em FROM progresso").fetchall()
+    finally:
+        conn.close()
+
+    etapas = {"unpaywall": [], "pdf": [], "total": []}
+    estados = {}
+    for doi, estado, fim in registros:
+        estados[estado] = estados.get(estado, 0) + 1
+        inicio = servidor.chegadas_unpaywall.get(doi)
+        pdf = servidor.chegadas_pdf.get(doi)
+        if inicio is not None:
+            etapas["total"].append(fim - inicio)
+        if inicio is not None and pdf is not None:
+            etapas["unpaywall"].append(pdf - inicio)  # API + fila até o pedido do PDF
+            etapas["pdf"].append(fim - pdf)           # download + extração + gravação
+    return etapas, estados
+
+
+async def rodar_benchmark(crawlers, concorrencias, n_dois: int, servidor: ServidorMock) -> list[dict]:
+    resultados = []
+    await servidor.iniciar()
+    try:
+        for crawler in crawlers:
+            for concorrencia in concorrencias:
+                servidor.zerar()
+                with tempfile.TemporaryDirectory(prefix=f"bench_{crawler}_") as tmp:
+                    pasta = Path(tmp)
+                    pd.DataFrame({"DOI": [f"10.5555/bench.{i}" for i in range(n_dois)]}).to_excel(pasta / "dois.xlsx", index=False)
+
+                    # cwd na pasta temporária: o storage do Crawlee e os logs ficam isolados por execução
+                    processo = await asyncio.create_subprocess_exec(
+                        sys.executable, str(Path(__file__).resolve()), "--executar", crawler,
+                        "--concorrencias", str(concorrencia), "--pasta", str(pasta),
+                        "--url-base", servidor.url_base_unpaywall,
+                        cwd=pasta, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+                    )
+                    _, erro = await processo.communicate()
+                    if processo.returncode != 0:
+                        logging.error(f"{crawler} (concorrência {concorrencia}) falhou:\n{erro.decode(errors='ignore')[-2000:]}")
+                        continue
+
+                    medidas = json.loads((pasta / "medidas.json").read_text(encoding="utf-8"))
+                    etapas, estados = _latencias(servidor, pasta / "progresso.sqlite")
+
+                resultado = {
+                    "crawler": crawler,
+                    "concorrencia": concorrencia,
+                    "dois": sum(estados.values()),
+                    "dois_por_segundo": sum(estados.values()) / medidas["duracao"],
+                    **medidas,
+                    "estados": estados,
+                    "status_servidor": dict(servidor.status),
+                }
+                for etapa, valores in etapas.items():
+                    resultado[f"{etapa}_p50"] = percentil(valores, 50)
+                    resultado[f"{etapa}_p95"] = percentil(valores, 95)
+                resultados.append(resultado)
+                imprimir_resultado(resultado)
+    finally:
+        await servidor.parar()
+    return resultados
+
+
+def _fmt(valor) -> str:
+    return "-" if valor is None else f"{valor:.2f}"
+
+
+def imprimir_resultado(r: dict):
+    print(
+        f"{r['crawler']:>8} | conc {r['concorrencia']:>3} | {r['dois']} DOIs em {r['duracao']:.1f}s "
+        f"({r['dois_por_segundo']:.2f} DOIs/s) | CPU {r['cpu']:.1f}s | "
+        f"memória {_fmt(r['pico_memoria_mb'])} MB (+ workers {_fmt(r['pico_memoria_workers_mb'])} MB)"
+    )
+    print(
+        f"{'':>8} | p50/p95 unpaywall {_fmt(r['unpaywall_p50'])}/{_fmt(r['unpaywall_p95'])}s | "
+        f"pdf {_fmt(r['pdf_p50'])}/{_fmt(r['pdf_p95'])}s | total {_fmt(r['total_p50'])}/{_fmt(r['total_p95'])}s | "
+        f"estados {r['estados']}"
+    )
+
+
+def comparar(resultados: list[dict], caminho_base, tolerancia: float) -> list[str]:
+    """Regressões de DOIs/s e p95 total em relação a um relatório salvo anteriormente."""
+    base = {(r["crawler"], r["concorrencia"]): r for r in json.loads(Path(caminho_base).read_text(encoding="utf-8"))}
+    regressoes = []
+    for r in resultados:
+        anterior = base.get((r["crawler"], r["concorrencia"]))
+        if not anterior:
+            continue
+        if r["dois_por_segundo"] < anterior["dois_por_segundo"] * (1 - tolerancia):
+            regressoes.append(f"{r['crawler']} conc {r['concorrencia']}: DOIs/s "
+                              f"{anterior['dois_por_segundo']:.2f} -> {r['dois_por_segundo']:.2f}")
+        if anterior.get("total_p95") and r.get("total_p95") and r["total_p95"] > anterior["total_p95"] * (1 + tolerancia):
+            regressoes.append(f"{r['crawler']} conc {r['concorrencia']}: p95 total "
+                              f"{anterior['total_p95']:.2f}s -> {r['total_p95']:.2f}s")
+    return regressoes
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos crawlers contra uma Unpaywall/hosts de PDF simulados")
+    parser.add_argument("--crawlers", nargs="+", choices=CRAWLERS, default=list(CRAWLERS))
+    parser.add_argument("--concorrencias", nargs="+", type=int, default=[10, 50])
+    parser.add_argument("--dois", type=int, default=200, help="DOIs por execução")
+    parser.add_argument("--pasta-pdfs", help="corpus de PDFs reais; sem ele são gerados PDFs sintéticos")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--hosts-lentos", type=int, default=1)
+    parser.add_argument("--latencia", nargs=2, type=float, default=[0.05, 0.2], metavar=("MIN", "MAX"),
+                        help="faixa de latência (s) da Unpaywall e dos hosts normais")
+    parser.add_argument("--latencia-lenta", nargs=2, type=float, default=[1.0, 3.0], metavar=("MIN", "MAX"),
+                        help="faixa de latência (s) dos hosts lentos")
+    parser.add_argument("--taxa-404", type=float, default=0.05)
+    parser.add_argument("--taxa-403", type=float, default=0.02)
+    parser.add_argument("--taxa-429", type=float, default=0.02)
+    parser.add_argument("--taxa-elsevier", type=float, default=0.0)
+    parser.add_argument("--saida", help="grava os resultados em JSON (base para comparações futuras)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior; sai com código 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    # modo interno: uma única execução de crawler, chamada pelo próprio benchmark num subprocesso
+    parser.add_argument("--executar", choices=CRAWLERS, help=argparse.SUPPRESS)
+    parser.add_argument("--pasta", help=argparse.SUPPRESS)
+    parser.add_argument("--url-base", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        executar_crawler(args.executar, args.concorrencias[0], Path(args.pasta), args.url_base)
+        sys.exit(0)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    pdfs = ler_corpus(args.pasta_pdfs) if args.pasta_pdfs else gerar_pdfs_sinteticos()
+    servidor = ServidorMock(pdfs, porta=args.porta, n_hosts=args.hosts, hosts_lentos=args.hosts_lentos,
+                            latencia=tuple(args.latencia), latencia_lenta=tuple(args.latencia_lenta),
+                            taxa_404=args.taxa_404, taxa_403=args.taxa_403, taxa_429=args.taxa_429,
+                            taxa_elsevier=args.taxa_elsevier)
+    resultados = asyncio.run(rodar_benchmark(args.crawlers, args.concorrencias, args.dois, servidor))
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+    if args.comparar:
+        regressoes = comparar(resultados, args.comparar, args.tolerancia)
+        for regressao in regressoes:
+            logging.error(f"Regressão: {regressao}")
+        sys.exit(1 if regressoes else 0)
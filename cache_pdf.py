@@ -0,0 +1,108 @@
+import json
+import time
+import sqlite3
+
+
+class CachePDF:
+    """Cache em disco (SQLite) dos emails extraídos de cada PDF.
+
+    Dois índices:
+        - por hash do conteúdo (sha256): PDFs idênticos servidos por URLs diferentes
+          (preprints espelhados, mesma cópia OA) são processados uma única vez;
+        - por URL, com ETag/Last-Modified: a próxima requisição à mesma URL vai
+          condicional e, num 304, nem o corpo é baixado.
+
+    O tamanho é limitado por `max_entradas`; ao passar do limite, os resultados
+    acessados há mais tempo são removidos (LRU) junto com as URLs que apontam para eles.
+    """
+
+    def __init__(self, caminho: str, max_entradas: int = 200_000):
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self.revalidados = 0  # respostas 304
+
+        self.conn = sqlite3.connect(caminho, isolation_level=None)  # autocommit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS resultado_pdf ("
+            " hash TEXT PRIMARY KEY,"
+            " emails TEXT NOT NULL,"
+            " acessado_em REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_resultado_acesso ON resultado_pdf (acessado_em)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS url_pdf ("
+            " url TEXT PRIMARY KEY,"
+            " hash TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_url_hash ON url_pdf (hash)")
+        self._total = self.conn.execute("SELECT COUNT(*) FROM resultado_pdf").fetchone()[0]
+
+    # ---------------- por URL ----------------
+    def validadores(self, url: str) -> dict:
+        """Cabeçalhos condicionais (If-None-Match / If-Modified-Since) para a URL, se conhecida."""
+        linha = self.conn.execute("SELECT etag, last_modified FROM url_pdf WHERE url = ?", (url,)).fetchone()
+        if linha is None:
+            return {}
+        etag, last_modified = linha
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def hash_da_url(self, url: str) -> str | None:
+        linha = self.conn.execute("SELECT hash FROM url_pdf WHERE url = ?", (url,)).fetchone()
+        return linha[0] if linha else None
+
+    # ---------------- por conteúdo ----------------
+    def buscar(self, hash_conteudo: str) -> list[str] | None:
+        """Emails já extraídos de um PDF com esse hash (None se não estiver no cache)."""
+        linha = self.conn.execute("SELECT emails FROM resultado_pdf WHERE hash = ?", (hash_conteudo,)).fetchone()
+        if linha is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE resultado_pdf SET acessado_em = ? WHERE hash = ?", (time.time(), hash_conteudo))
+        return json.loads(linha[0])
+
+    def salvar(self, hash_conteudo: str, emails: list[str], url: str | None = None,
+               etag: str | None = None, last_modified: str | None = None):
+        novo = self.conn.execute("SELECT 1 FROM resultado_pdf WHERE hash = ?", (hash_conteudo,)).fetchone() is None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO resultado_pdf (hash, emails, acessado_em) VALUES (?, ?, ?)",
+            (hash_conteudo, json.dumps(emails), time.time()),
+        )
+        if url:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO url_pdf (url, hash, etag, last_modified) VALUES (?, ?, ?, ?)",
+                (url, hash_conteudo, etag, last_modified),
+            )
+        if novo:
+            self._total += 1
+            if self._total > self.max_entradas:
+                self._evictar()
+
+    def _evictar(self):
+        """Remove os ~10% resultados menos recentemente usados e as URLs que apontam para eles."""
+        excesso = self._total - self.max_entradas + max(self.max_entradas // 10, 1)
+        self.conn.execute("BEGIN")
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _evictar (hash TEXT PRIMARY KEY)"
+        )
+        self.conn.execute("DELETE FROM _evictar")
+        self.conn.execute(
+            "INSERT INTO _evictar SELECT hash FROM resultado_pdf ORDER BY acessado_em LIMIT ?", (excesso,)
+        )
+        self.conn.execute("DELETE FROM url_pdf WHERE hash IN (SELECT hash FROM _evictar)")
+        self.conn.execute("DELETE FROM resultado_pdf WHERE hash IN (SELECT hash FROM _evictar)")
+        self.conn.execute("COMMIT")
+        self._total = self.conn.execute("SELECT COUNT(*) FROM resultado_pdf").fetchone()[0]
+
+    def fechar(self):
+        self.conn.close()
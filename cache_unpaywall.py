@@ -0,0 +1,58 @@
+import json
+import time
+import sqlite3
+
+
+class CacheUnpaywall:
+    """Cache em disco (SQLite) das respostas da Unpaywall, indexado por DOI.
+
+    Guarda apenas os campos usados pelo crawler (publisher, best_oa_location e doi_url).
+    Respostas 404 ficam como cache negativo, com TTL próprio (normalmente menor), para
+    não consultar de novo DOIs que a Unpaywall não conhece a cada rodada.
+    """
+
+    CAMPOS = ("publisher", "best_oa_location", "doi_url")
+
+    def __init__(self, caminho: str, ttl_segundos: float = 7 * 24 * 3600, ttl_404_segundos: float = 24 * 3600):
+        self.ttl = ttl_segundos
+        self.ttl_404 = ttl_404_segundos
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(caminho, isolation_level=None)  # autocommit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS unpaywall ("
+            " doi TEXT PRIMARY KEY,"
+            " dados TEXT,"             # NULL = 404 (cache negativo)
+            " salvo_em REAL NOT NULL)"
+        )
+
+    def buscar(self, doi: str) -> tuple[bool, dict | None]:
+        """Retorna (encontrado, dados). dados=None com encontrado=True significa 404 em cache."""
+        linha = self.conn.execute("SELECT dados, salvo_em FROM unpaywall WHERE doi = ?", (doi,)).fetchone()
+        if linha is not None:
+            dados, salvo_em = linha
+            ttl = self.ttl if dados is not None else self.ttl_404
+            if time.time() - salvo_em <= ttl:
+                self.hits += 1
+                return True, json.loads(dados) if dados is not None else None
+        self.misses += 1
+        return False, None
+
+    def salvar(self, doi: str, data: dict):
+        compacto = {campo: data.get(campo) for campo in self.CAMPOS}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO unpaywall (doi, dados, salvo_em) VALUES (?, ?, ?)",
+            (doi, json.dumps(compacto), time.time()),
+        )
+
+    def salvar_404(self, doi: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO unpaywall (doi, dados, salvo_em) VALUES (?, NULL, ?)",
+            (doi, time.time()),
+        )
+
+    def fechar(self):
+        self.conn.close()
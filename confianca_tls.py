@@ -0,0 +1,174 @@
+import ssl
+import time
+import socket
+import hashlib
+import select
+import asyncio
+import logging
+import sqlite3
+import certifi
+from OpenSSL import SSL
+from cryptography.hazmat.primitives import serialization
+
+FIM_CERTIFICADO = "-----END CERTIFICATE-----"
+
+
+def _folha(pem: str) -> tuple[str, str]:
+    """(PEM, SHA-256 em hex do DER) do primeiro certificado da cadeia: o do próprio host"""
+    fim = pem.index(FIM_CERTIFICADO) + len(FIM_CERTIFICADO)
+    folha = pem[:fim].strip() + "\n"
+    return folha, hashlib.sha256(ssl.PEM_cert_to_DER_cert(folha)).hexdigest()
+
+
+def _baixar_cadeia(host: str, porta: int, timeout: float) -> str:
+    """Handshake cru com OpenSSL (sem verificar) para obter a cadeia que o servidor apresenta, em PEM.
+
+    Conexão e handshake juntos respeitam `timeout`: o pyOpenSSL não lida com sockets com
+    timeout, então o handshake roda com o socket não bloqueante e espera no `select`.
+    """
+    prazo = time.monotonic() + timeout
+    ctx = SSL.Context(SSL.TLS_CLIENT_METHOD)
+    with socket.create_connection((host, porta), timeout=timeout) as sock:
+        sock.setblocking(False)
+        conn = SSL.Connection(ctx, sock)
+        conn.set_tlsext_host_name(host.encode())
+        conn.set_connect_state()
+        while True:
+            try:
+                conn.do_handshake()
+                break
+            except (SSL.WantReadError, SSL.WantWriteError) as e:
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    raise TimeoutError(f"handshake TLS com {host} passou de {timeout}s")
+                if isinstance(e, SSL.WantReadError):
+                    select.select([sock], [], [], restante)
+                else:
+                    select.select([], [sock], [], restante)
+        cadeia = conn.get_peer_cert_chain() or []
+    return "".join(
+        cert.to_cryptography().public_bytes(serialization.Encoding.PEM).decode("ascii") for cert in cadeia
+    )
+
+
+class CacheConfiancaTLS:
+    """Certificados de hosts com TLS quebrado, fixados no primeiro contato e persistidos (SQLite).
+
+    Quando um host falha na verificação, `contexto(host)` baixa a cadeia apresentada por ele
+    num thread (o handshake do OpenSSL é bloqueante), grava o certificado folha e devolve um
+    SSLContext que aceita as raízes do certifi e, além delas, só aquele certificado exato
+    (pino pelo SHA-256): outro certificado do host, ou um assinado pelos intermediários que
+    ele apresentou, não passa. Requisições simultâneas ao mesmo host esperam a mesma
+    resolução; o contexto fica em memória e é reaproveitado.
+
+    É confiança no primeiro uso (TOFU): o certificado visto na resolução não é verificado, e
+    quem estiver no meio do caminho nesse momento fica fixado até o pino expirar (`ttl_segundos`,
+    7 dias) ou ser invalidado. Quando o host troca de certificado, a resolução seguinte fixa o
+    novo e loga as duas impressões digitais.
+
+    `contexto_conhecido(host)` devolve o contexto sem I/O de rede, para que os crawlers usem
+    direto o fallback nos hosts já conhecidos em vez de falhar primeiro a cada DOI; se a
+    cadeia conhecida também falhar (certificado renovado), os crawlers chamam `invalidar`
+    e resolvem de novo uma vez. Falhas ao baixar a cadeia ficam em cache negativo por
+    `espera_falha` segundos.
+    """
+
+    def __init__(self, caminho: str, ttl_segundos: float = 7 * 24 * 3600, espera_falha: float = 3600.0,
+                 timeout: float = 10.0):
+        self.ttl = ttl_segundos
+        self.espera_falha = espera_falha
+        self.timeout = timeout
+        self.resolvidos = 0  # cadeias baixadas nesta execução
+        self.reaproveitados = 0
+
+        self._contextos: dict[str, ssl.SSLContext] = {}
+        self._impressoes: dict[str, str] = {}  # SHA-256 do certificado fixado (ou do último, se invalidado)
+        self._falhas: dict[str, float] = {}
+        self._travas: dict[str, asyncio.Lock] = {}
+
+        self.conn = sqlite3.connect(caminho, isolation_level=None)  # autocommit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cadeia_tls ("
+            " host TEXT PRIMARY KEY,"
+            " pem TEXT NOT NULL,"
+            " salvo_em REAL NOT NULL)"
+        )
+        self._carregar()
+
+    def _carregar(self):
+        limite = time.time() - self.ttl
+        for host, pem in self.conn.execute("SELECT host, pem FROM cadeia_tls WHERE salvo_em >= ?", (limite,)):
+            try:
+                self._contextos[host], self._impressoes[host] = self._criar_contexto(pem)
+            except (ssl.SSLError, ValueError) as e:
+                logging.warning(f"Cadeia TLS em cache inválida para {host}: {e}")
+
+    @staticmethod
+    def _criar_contexto(pem: str) -> tuple[ssl.SSLContext, str]:
+        """SSLContext que fixa o certificado folha de `pem` e a impressão SHA-256 dele"""
+        folha, impressao = _folha(pem)
+        ctx = ssl.create_default_context(cafile=certifi.where())
+        # só a folha vira âncora: a verificação pode terminar nela (PARTIAL_CHAIN), mas não nos
+        # intermediários que o host apresentou
+        ctx.load_verify_locations(cadata=folha)
+        ctx.verify_flags |= ssl.VERIFY_X509_PARTIAL_CHAIN
+        ctx.verify_flags &= ~ssl.VERIFY_X509_STRICT
+        return ctx, impressao
+
+    def contexto_conhecido(self, host: str) -> ssl.SSLContext | None:
+        ctx = self._contextos.get(host)
+        if ctx is not None:
+            self.reaproveitados += 1
+        return ctx
+
+    async def contexto(self, host: str, porta: int = 443) -> ssl.SSLContext | None:
+        """SSLContext de fallback do host, baixando a cadeia se ainda não estiver em cache (None se falhar)."""
+        if host in self._contextos:
+            return self.contexto_conhecido(host)
+        trava = self._travas.setdefault(host, asyncio.Lock())
+        async with trava:
+            if host in self._contextos:  # outra tarefa resolveu enquanto esperávamos
+                return self.contexto_conhecido(host)
+            if time.monotonic() - self._falhas.get(host, float("-inf")) < self.espera_falha:
+                return None
+
+            loop = asyncio.get_running_loop()
+            try:
+                pem = await asyncio.wait_for(loop.run_in_executor(None, _baixar_cadeia, host, porta, self.timeout),
+                                             self.timeout * 2)
+                ctx, impressao = self._criar_contexto(pem)
+            except Exception as e:
+                self._falhas[host] = time.monotonic()
+                logging.warning(f"Não foi possível obter a cadeia TLS de {host}: {e}")
+                return None
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cadeia_tls (host, pem, salvo_em) VALUES (?, ?, ?)",
+                (host, _folha(pem)[0], time.time()),
+            )
+            anterior = self._impressoes.get(host)
+            if anterior and anterior != impressao:
+                logging.warning(f"Certificado de {host} mudou: {anterior} -> {impressao}")
+            self._contextos[host] = ctx
+            self._impressoes[host] = impressao
+            self.resolvidos += 1
+            logging.info(f"Certificado TLS de {host} fixado (SHA-256 {impressao})")
+            return ctx
+
+    def invalidar(self, host: str, contexto: ssl.SSLContext | None = None):
+        """Descarta a cadeia do host (ex.: o fallback também falhou após renovação do certificado).
+
+        Com `contexto`, só descarta se ele ainda for o do host: downloads simultâneos que
+        falharam com a cadeia antiga não apagam a que outro acabou de resolver.
+        """
+        if contexto is not None and self._contextos.get(host) is not contexto:
+            return
+        self._contextos.pop(host, None)
+        self.conn.execute("DELETE FROM cadeia_tls WHERE host = ?", (host,))
+
+    def fechar(self):
+        logging.info(f"Cache TLS: {len(self._contextos)} hosts | {self.resolvidos} cadeias baixadas | "
+                     f"{self.reaproveitados} reaproveitamentos")
+        self.conn.close()
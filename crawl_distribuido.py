@@ -0,0 +1,331 @@
+import sys
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import subprocess
+from pathlib import Path
+import pandas as pd
+from progresso import ESTADOS_CONCLUIDOS, DiarioProgresso
+from entrada_dois import ler_dois
+from snapshot_unpaywall import normalizar_doi
+from escritor_resultados import abrir_saida
+
+
+# ---------------- sharding determinístico ----------------
+def shard_de(doi: str, total: int, por_prefixo: bool = False) -> int:
+    """Shard do DOI em [0, total), estável entre máquinas e execuções.
+
+    Com `por_prefixo` o hash usa só o prefixo do DOI (registrante, ex. 10.1016): DOIs do
+    mesmo publisher, e na prática do mesmo host de PDF, caem no mesmo nó, e o limite por
+    host do AgendadorHosts continua valendo para o cluster inteiro.
+    """
+    chave = normalizar_doi(doi)
+    if por_prefixo:
+        chave = chave.split("/", 1)[0]
+    return int.from_bytes(hashlib.blake2b(chave.encode(), digest_size=8).digest(), "big") % total
+
+
+def filtrar_shard(dois, indice: int, total: int, por_prefixo: bool = False):
+    for doi in dois:
+        if shard_de(doi, total, por_prefixo) == indice:
+            yield doi
+
+
+# ---------------- fila compartilhada ----------------
+class FilaCompartilhada:
+    """Fila de DOIs em SQLite compartilhada por vários workers (processos ou nós).
+
+    `popular` insere os DOIs uma vez; cada worker reserva blocos com `reservar` (lease de
+    `lease_segundos`: reservas de um worker que morreu voltam para a fila quando expiram).
+    Dentro de um event loop use `iterar_async`: a reserva espera o lock dos outros workers
+    num thread, com conexão própria.
+    A fila também faz o papel de diário de progresso do PipelinePDF (`registrar`/`fechar`):
+    estados de ESTADOS_CONCLUIDOS encerram o DOI; os demais o devolvem à fila até
+    `max_tentativas`, depois ficam como "falhou".
+
+    Vários nós precisam de um arquivo num disco compartilhado com lock confiável
+    (SQLite sobre NFS não é); na dúvida, use o modo por shard, que não compartilha nada.
+    """
+
+    def __init__(self, caminho: str, lease_segundos: float = 1800.0, max_tentativas: int = 3):
+        self.caminho = caminho
+        self.lease = lease_segundos
+        self.max_tentativas = max_tentativas
+
+        self.conn = self._conectar()
+        self._conn_reservas = None  # conexão das reservas feitas fora do event loop (iterar_async)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tarefas ("
+            " doi TEXT PRIMARY KEY,"
+            " ordem INTEGER NOT NULL,"
+            " situacao TEXT NOT NULL DEFAULT 'pendente',"  # pendente | reservado | concluido | falhou
+            " worker TEXT,"
+            " reservado_em REAL,"
+            " tentativas INTEGER NOT NULL DEFAULT 0,"
+            " estado TEXT)"                                 # último estado registrado pelo pipeline
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_situacao ON tarefas (situacao, ordem)")
+
+    def _conectar(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, isolation_level=None, timeout=60, **kwargs)  # autocommit; espera locks de outros workers
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def popular(self, dois, tamanho_lote: int = 10_000) -> int:
+        """Insere os DOIs (os já existentes são ignorados); retorna quantos entraram"""
+        (ordem,) = self.conn.execute("SELECT COALESCE(MAX(ordem), 0) FROM tarefas").fetchone()
+        inseridos = 0
+        lote = []
+        for doi in dois:
+            ordem += 1
+            lote.append((doi, ordem))
+            if len(lote) >= tamanho_lote:
+                inseridos += self._inserir(lote)
+                lote = []
+        if lote:
+            inseridos += self._inserir(lote)
+        return inseridos
+
+    def _inserir(self, lote) -> int:
+        antes = self.conn.total_changes
+        self.conn.execute("BEGIN")
+        self.conn.executemany("INSERT OR IGNORE INTO tarefas (doi, ordem) VALUES (?, ?)", lote)
+        self.conn.execute("COMMIT")
+        return self.conn.total_changes - antes
+
+    def reservar(self, worker: str, quantidade: int, conn: sqlite3.Connection | None = None) -> list[str]:
+        """Reserva até `quantidade` DOIs pendentes (ou com lease expirado) para o worker"""
+        conn = conn or self.conn
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")  # lock de escrita já na leitura: dois workers não pegam o mesmo DOI
+        try:
+            dois = [doi for (doi,) in conn.execute(
+                "SELECT doi FROM tarefas WHERE situacao = 'pendente' OR (situacao = 'reservado' AND reservado_em < ?) "
+                "ORDER BY ordem LIMIT ?",
+                (agora - self.lease, quantidade),
+            )]
+            conn.executemany(
+                "UPDATE tarefas SET situacao = 'reservado', worker = ?, reservado_em = ? WHERE doi = ?",
+                [(worker, agora, doi) for doi in dois],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return dois
+
+    def iterar(self, worker: str, tamanho_reserva: int = 100):
+        """DOIs para o worker, reservando o próximo bloco só quando o anterior foi consumido"""
+        while True:
+            dois = self.reservar(worker, tamanho_reserva)
+            if not dois:
+                return
+            yield from dois
+
+    async def iterar_async(self, worker: str, tamanho_reserva: int = 100):
+        """Como `iterar`, sem bloquear o event loop enquanto outro worker segura o lock da fila"""
+        if self._conn_reservas is None:
+            self._conn_reservas = self._conectar(check_same_thread=False)  # uma reserva por vez, em threads do executor
+        while True:
+            dois = await asyncio.to_thread(self.reservar, worker, tamanho_reserva, self._conn_reservas)
+            if not dois:
+                return
+            for doi in dois:
+                yield doi
+
+    def registrar(self, doi: str, estado: str):
+        if estado in ESTADOS_CONCLUIDOS:
+            self.conn.execute("UPDATE tarefas SET situacao = 'concluido', estado = ? WHERE doi = ?", (estado, doi))
+            return
+        self.conn.execute(
+            "UPDATE tarefas SET tentativas = tentativas + 1, estado = ?,"
+            " situacao = CASE WHEN tentativas + 1 >= ? THEN 'falhou' ELSE 'pendente' END"
+            " WHERE doi = ?",
+            (estado, self.max_tentativas, doi),
+        )
+
+    def resumo(self) -> dict[str, int]:
+        return dict(self.conn.execute("SELECT situacao, COUNT(*) FROM tarefas GROUP BY situacao"))
+
+    def fechar(self):
+        if self._conn_reservas is not None:
+            self._conn_reservas.close()
+        self.conn.close()
+
+
+# ---------------- merge ----------------
+def ler_saida(caminho) -> pd.DataFrame:
+    """Lê uma saída de worker (.csv, .jsonl ou .parquet), tudo como texto"""
+    sufixo = Path(caminho).suffix.lower()
+    if sufixo == ".jsonl":
+        return pd.read_json(caminho, lines=True, dtype=str)
+    if sufixo == ".parquet":
+        return pd.read_parquet(caminho).astype("string")
+    return pd.read_csv(caminho, dtype=str)
+
+
+def mesclar_saidas(arquivos, destino: str, normalizar_emails: bool = True) -> int:
+    """Junta as saídas dos workers num arquivo só, sem linhas repetidas; retorna quantas linhas ficaram.
+
+    As colunas vêm do primeiro arquivo (emails/doi/estado ou urls elsevier/doi). Emails e DOIs
+    são comparados em minúsculas e o estado não conta, então o mesmo par achado por dois
+    workers aparece uma vez.
+    """
+    tabelas = [ler_saida(a) for a in arquivos if Path(a).exists() and Path(a).stat().st_size > 0]
+    if not tabelas:
+        logging.warning(f"Nada para mesclar em {destino}")
+        return 0
+    cabecalho = list(tabelas[0].columns)
+    df = pd.concat(tabelas, ignore_index=True)[cabecalho].dropna(how="all")
+    if normalizar_emails and "emails" in df.columns:
+        df["emails"] = df["emails"].str.strip().str.lower()
+    chave = df["doi"].str.strip().str.lower()
+    colunas_chave = [c for c in cabecalho if c not in ("doi", "estado")] + ["_chave"]
+    df = df.assign(_chave=chave).drop_duplicates(colunas_chave).drop(columns="_chave")
+
+    saida = abrir_saida(destino, cabecalho)
+    try:
+        saida.gravar(list(df.itertuples(index=False, name=None)))
+    finally:
+        saida.fechar()
+    logging.info(f"Merge: {len(tabelas)} arquivos -> {len(df)} linhas em {destino}")
+    return len(df)
+
+
+# ---------------- worker ----------------
+def _criar_pipeline(args):
+    from pipeline_pdf import PipelinePDF
+    from transportes import TRANSPORTES
+    from confianca_tls import CacheConfiancaTLS
+    from retentativas import FilaRetentativas
+
+    cache = Path(args.pasta_cache or args.saida)
+    cache.mkdir(parents=True, exist_ok=True)
+    transporte = TRANSPORTES[args.transporte](confianca_tls=CacheConfiancaTLS(str(cache / "cache_tls.sqlite")))
+    return PipelinePDF(transporte, caminho_cache_unpaywall=str(cache / "cache_unpaywall.sqlite"),
+                       caminho_cache_pdf=str(cache / "cache_pdf.sqlite"), caminho_indice_snapshot=args.snapshot,
+                       retentativas=FilaRetentativas())
+
+
+async def rodar_worker(args):
+    """Um worker: DOIs da fila compartilhada (`--fila`) ou do seu shard da planilha (`--shard i/N`)"""
+    pasta = Path(args.saida)
+    pasta.mkdir(parents=True, exist_ok=True)
+    pipeline = _criar_pipeline(args)
+    if args.fila:
+        fila = FilaCompartilhada(args.fila, lease_segundos=args.lease)
+        pipeline.progresso = fila
+        dois, concluidos = fila.iterar_async(args.id, args.reserva), frozenset()
+    else:
+        indice, total = (int(x) for x in args.shard.split("/"))
+        pipeline.progresso = DiarioProgresso(str(pasta / f"progresso_{args.id}.sqlite"))
+        concluidos = pipeline.progresso.concluidos()
+        dois = filtrar_shard(ler_dois(args.planilha), indice, total, args.por_prefixo)
+
+    logging.info(f"Worker {args.id} iniciado ({'fila ' + args.fila if args.fila else 'shard ' + args.shard})")
+    # saídas por worker (append ao reiniciar, por isso sem Parquet); o merge junta tudo no final
+    await pipeline.processar(dois, str(pasta / f"emails_{args.id}{args.formato}"),
+                             str(pasta / f"elsevier_{args.id}{args.formato}"),
+                             concorrencia=args.concorrencia, concluidos=concluidos, retomar=True)
+
+
+def mesclar_pasta(pasta: str, formato: str = ".csv"):
+    pasta = Path(pasta)
+    for prefixo in ("emails", "elsevier"):
+        arquivos = sorted(p for p in pasta.glob(f"{prefixo}_*") if p.stem != f"{prefixo}_mesclado")
+        mesclar_saidas(arquivos, str(pasta / f"{prefixo}_mesclado{formato}"),
+                       normalizar_emails=prefixo == "emails")
+
+
+def rodar_local(args):
+    """Sobe `--workers` processos worker nesta máquina (teste local do modo distribuído) e faz o merge"""
+    comando = [sys.executable, __file__, "worker", "--saida", args.saida, "--transporte", args.transporte,
+               "--concorrencia", str(args.concorrencia), "--formato", args.formato]
+    if args.snapshot:
+        comando += ["--snapshot", args.snapshot]
+    if args.pasta_cache:
+        comando += ["--pasta-cache", args.pasta_cache]
+
+    if args.fila:
+        fila = FilaCompartilhada(args.fila)
+        logging.info(f"Fila: {fila.popular(ler_dois(args.planilha))} DOIs novos")
+        fila.fechar()
+    processos = []
+    for i in range(args.workers):
+        extra = ["--fila", args.fila] if args.fila else ["--planilha", args.planilha, "--shard", f"{i}/{args.workers}"]
+        if args.por_prefixo:
+            extra.append("--por-prefixo")
+        processos.append(subprocess.Popen(comando + ["--id", f"w{i}"] + extra))
+    codigos = [p.wait() for p in processos]
+    if any(codigos):
+        logging.warning(f"Workers terminaram com códigos {codigos}")
+    if args.fila:
+        fila = FilaCompartilhada(args.fila)
+        logging.info(f"Fila: {fila.resumo()}")
+        fila.fechar()
+    mesclar_pasta(args.saida, args.formato)
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(process)d - %(levelname)s - %(message)s",
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="Coleta distribuída: fila compartilhada ou shards, e merge das saídas")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_popular = sub.add_parser("popular", help="insere os DOIs da planilha na fila compartilhada")
+    p_popular.add_argument("fila")
+    p_popular.add_argument("planilha")
+
+    p_status = sub.add_parser("status", help="contagem de DOIs por situação na fila")
+    p_status.add_argument("fila")
+
+    p_mesclar = sub.add_parser("mesclar", help="junta as saídas dos workers de uma pasta, sem duplicatas")
+    p_mesclar.add_argument("pasta")
+    p_mesclar.add_argument("--formato", default=".csv", choices=[".csv", ".jsonl", ".parquet"])
+
+    for nome in ("worker", "local"):
+        p = sub.add_parser(nome, help="um worker" if nome == "worker" else "N workers locais + merge")
+        p.add_argument("--saida", required=True, help="pasta das saídas por worker")
+        p.add_argument("--fila", default=None, help="SQLite da fila compartilhada")
+        p.add_argument("--planilha", default=None, help="planilha de DOIs (modo shard, ou para popular a fila)")
+        p.add_argument("--por-prefixo", action="store_true", help="shard pelo prefixo do DOI (host-aware)")
+        p.add_argument("--transporte", default="aiohttp", choices=["aiohttp", "impit"])
+        p.add_argument("--concorrencia", type=int, default=10)
+        p.add_argument("--snapshot", default=None, help="índice do snapshot da Unpaywall")
+        p.add_argument("--pasta-cache", default=None, help="pasta dos caches SQLite (padrão: --saida)")
+        # as saídas dos workers recebem append ao reiniciar, o que o Parquet não aceita; use `mesclar --formato .parquet`
+        p.add_argument("--formato", default=".csv", choices=[".csv", ".jsonl"])
+        if nome == "worker":
+            p.add_argument("--id", required=True, help="nome do worker (único no cluster)")
+            p.add_argument("--shard", default=None, help="i/N: processa só o shard i de N")
+            p.add_argument("--reserva", type=int, default=100, help="DOIs reservados por vez na fila")
+            p.add_argument("--lease", type=float, default=1800.0, help="segundos até uma reserva expirar")
+        else:
+            p.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.comando == "popular":
+        fila = FilaCompartilhada(args.fila)
+        logging.info(f"{fila.popular(ler_dois(args.planilha))} DOIs novos na fila | {fila.resumo()}")
+        fila.fechar()
+    elif args.comando == "status":
+        fila = FilaCompartilhada(args.fila)
+        print(fila.resumo())
+        fila.fechar()
+    elif args.comando == "mesclar":
+        mesclar_pasta(args.pasta, args.formato)
+    elif args.comando == "worker":
+        if not args.fila and not (args.planilha and args.shard):
+            parser.error("worker precisa de --fila ou de --planilha com --shard i/N")
+        asyncio.run(rodar_worker(args))
+    else:
+        if not args.planilha:
+            parser.error("local precisa de --planilha")
+        rodar_local(args)
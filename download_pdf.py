@@ -0,0 +1,285 @@
+import os
+import time
+import hashlib
+import tempfile
+from contextlib import nullcontext
+from urllib.parse import urlparse
+from crawlee import Request
+from crawlee.http_clients import ImpitHttpClient, HttpxHttpClient, HttpCrawlingResult
+from typing_extensions import override
+from agendador_hosts import ler_retry_after
+from otel_setup import tracer, bytes_downloaded_counter
+from retentativas import falha_transitoria, erro_de_certificado
+
+
+MAGIC_PDF = b"%PDF-"
+JANELA_SNIFF = 1024  # a especificação permite lixo antes do cabeçalho %PDF- dentro do primeiro KB
+
+
+class RespostaPDF:
+    """Resposta de download de PDF já consumida em streaming.
+
+    Implementa o mesmo protocolo do `HttpResponse` do crawlee (`status_code`, `headers`,
+    `read`, `read_stream`), mas o corpo fica em `conteudo` (PDFs pequenos) ou em um
+    arquivo temporário em `caminho` (PDFs grandes), que o PyMuPDF abre direto do disco.
+
+    `motivo_abortado` indica por que o corpo não foi baixado:
+    "não é pdf" (sniff dos primeiros bytes falhou) ou "tamanho excedido".
+
+    `hash_conteudo` é o sha256 do corpo (calculado durante o download) ou, num
+    304 de revalidação, o hash guardado no cache para a URL.
+
+    `tls_fallback` indica que o download usou a cadeia do host guardada no cache TLS.
+    `duracao_download` são os segundos da requisição (sem a espera pelo slot do host).
+    `liberar_vaga` devolve a vaga de extração reservada antes do download (BackendExtracao.reservar);
+    é chamada uma vez, por `descartar`. Só fica na resposta se há PDF para extrair (ver `reter_vaga`).
+    """
+
+    def __init__(self, http_version: str, status_code: int, headers):
+        self.http_version = http_version
+        self.status_code = status_code
+        self.headers = headers
+        self.conteudo: bytes | None = None
+        self.caminho: str | None = None
+        self.tamanho = 0
+        self.motivo_abortado: str | None = None
+        self.hash_conteudo: str | None = None
+        self.tls_fallback = False
+        self.duracao_download = 0.0
+        self.liberar_vaga = None
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.motivo_abortado is None and (self.conteudo is not None or self.caminho is not None)
+
+    @property
+    def origem(self) -> bytes | str | None:
+        """O que deve ser passado para o extrator: caminho em disco ou bytes em memória."""
+        return self.caminho or self.conteudo
+
+    async def read(self) -> bytes:
+        """Corpo em memória; b"" quando o PDF foi para disco.
+
+        O parser do HttpCrawler chama `read()` em toda resposta: ler aqui o arquivo
+        temporário traria de volta para a memória justamente os PDFs grandes. Quem
+        precisa do corpo usa `origem`.
+        """
+        if self.caminho:
+            return b""
+        return self.conteudo or b""
+
+    async def read_stream(self):
+        yield await self.read()
+
+    def reter_vaga(self, liberar_vaga):
+        """Guarda a vaga de extração até o `descartar` se há PDF para extrair; senão a libera já.
+
+        Respostas sem corpo (status de erro, 304, não é pdf) podem nunca chegar ao handler
+        (o Crawlee transforma status de erro em exceção) e não devem prender a vaga.
+        """
+        if self.is_pdf:
+            self.liberar_vaga = liberar_vaga
+        else:
+            liberar_vaga()
+
+    def descartar(self):
+        """Remove o arquivo temporário (se houver) e libera a vaga de extração. Chamar ao fim do handler."""
+        if self.liberar_vaga:
+            self.liberar_vaga()
+            self.liberar_vaga = None
+        if self.caminho:
+            try:
+                os.remove(self.caminho)
+            except OSError:
+                pass
+            self.caminho = None
+        self.conteudo = None
+
+
+async def consumir_corpo_pdf(chunks, headers, resposta: RespostaPDF, max_bytes: int, limiar_disco: int,
+                             pasta_temp: str | None = None):
+    """Consome o corpo (iterador assíncrono de chunks) de uma resposta 200 para dentro de `resposta`.
+
+    Independente do cliente HTTP: usado pelo ImpitPDFStreamingClient e pelo transporte aiohttp.
+    """
+    tamanho_declarado = headers.get("Content-Length")
+    if tamanho_declarado and tamanho_declarado.isdigit() and int(tamanho_declarado) > max_bytes:
+        resposta.motivo_abortado = "tamanho excedido"
+        return
+
+    buffer = bytearray()
+    arquivo = None
+    sha = hashlib.sha256()
+    try:
+        async for chunk in chunks:
+            resposta.tamanho += len(chunk)
+            sha.update(chunk)
+            if resposta.tamanho > max_bytes:
+                resposta.motivo_abortado = "tamanho excedido"
+                break
+
+            if arquivo is not None:
+                arquivo.write(chunk)
+                continue
+
+            buffer.extend(chunk)
+            if len(buffer) >= JANELA_SNIFF and MAGIC_PDF not in buffer[:JANELA_SNIFF]:
+                resposta.motivo_abortado = "não é pdf"  # página HTML etc.: não baixa o resto
+                break
+            if len(buffer) > limiar_disco:  # passa a gravar em disco
+                arquivo = tempfile.NamedTemporaryFile(suffix=".pdf", dir=pasta_temp, delete=False)
+                resposta.caminho = arquivo.name
+                arquivo.write(buffer)
+                buffer = bytearray()
+    except BaseException:
+        # erro de rede ou cancelamento (timeout do handler) no meio do corpo: não deixa o temporário no disco
+        if arquivo is not None:
+            arquivo.close()
+        resposta.descartar()
+        raise
+    finally:
+        if arquivo is not None:
+            arquivo.close()
+
+    if resposta.motivo_abortado is None and arquivo is None:
+        if MAGIC_PDF in buffer[:JANELA_SNIFF]:
+            resposta.conteudo = bytes(buffer)
+        else:
+            resposta.motivo_abortado = "não é pdf"
+    if resposta.motivo_abortado is not None:
+        resposta.descartar()
+    else:
+        resposta.hash_conteudo = sha.hexdigest()
+
+
+class ImpitPDFStreamingClient(ImpitHttpClient):
+    """ImpitHttpClient que baixa as requisições label='pdf' em streaming.
+
+    - não lê o corpo de respostas com status diferente de 200;
+    - aborta pelo Content-Length ou assim que o download passar de `max_bytes`;
+    - faz sniff do `%PDF-` nos primeiros bytes e aborta respostas que não são PDF;
+    - mantém em memória até `limiar_disco` bytes e depois despeja em arquivo temporário.
+
+    Com `cache_pdf` (CachePDF), URLs já vistas vão com If-None-Match/If-Modified-Since;
+    num 304 o corpo não é baixado e a resposta leva o hash guardado no cache.
+
+    Com `agendador` (AgendadorHosts), cada download ocupa um slot do host do PDF
+    e o resultado (status/duração, ou timeout/erro de conexão) alimenta o limite
+    adaptativo daquele host. O download roda dentro de um slot do Crawlee, então a
+    espera pelo host vai no máximo até `espera_max_host` segundos: depois disso a
+    requisição falha com HostOcupado (transitória) e volta pela fila de retentativas.
+
+    Com `backend_pdf` (BackendExtracao), cada download reserva antes uma vaga de extração,
+    liberada quando o handler descarta a resposta: PDFs não se acumulam na memória
+    enquanto a extração está atrasada. Falha, cancelamento ou resposta sem PDF liberam a
+    vaga aqui mesmo.
+
+    Com `confianca_tls` (CacheConfiancaTLS), hosts com cadeia de certificados quebrada
+    são baixados por um cliente httpx que confia na cadeia guardada do host (o impit
+    não aceita SSLContext); hosts já conhecidos vão direto por esse cliente.
+
+    As demais requisições (Unpaywall) seguem o caminho normal do ImpitHttpClient.
+    """
+
+    def __init__(self, *args, max_bytes: int = 50 * 1024 * 1024, limiar_disco: int = 4 * 1024 * 1024,
+                 pasta_temp: str | None = None, cache_pdf=None, agendador=None, confianca_tls=None,
+                 espera_max_host: float = 30.0, backend_pdf=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_bytes = max_bytes
+        self.limiar_disco = limiar_disco
+        self.pasta_temp = pasta_temp
+        self.cache_pdf = cache_pdf
+        self.agendador = agendador
+        self.espera_max_host = espera_max_host
+        self.backend_pdf = backend_pdf
+        self.confianca_tls = confianca_tls
+        self._clientes_fallback: dict[str, HttpxHttpClient] = {}  # um por host, reaproveitado
+        self._clientes_descartados: list[HttpxHttpClient] = []  # cadeia invalidada; fechados no __aexit__
+
+    @override
+    async def __aexit__(self, *exc):
+        for cliente in [*self._clientes_fallback.values(), *self._clientes_descartados]:
+            await cliente.__aexit__(*exc)
+        self._clientes_fallback.clear()
+        self._clientes_descartados.clear()
+        return await super().__aexit__(*exc)
+
+    async def _cliente_fallback(self, host: str, contexto) -> HttpxHttpClient:
+        if host not in self._clientes_fallback:
+            cliente = HttpxHttpClient(verify=contexto)
+            await cliente.__aenter__()
+            self._clientes_fallback[host] = cliente
+        return self._clientes_fallback[host]
+
+    @override
+    async def crawl(self, request: Request, *, session=None, proxy_info=None, statistics=None) -> HttpCrawlingResult:
+        if request.label != "pdf":
+            return await super().crawl(request, session=session, proxy_info=proxy_info, statistics=statistics)
+
+        headers = dict(request.headers)
+        if self.cache_pdf:
+            headers.update(self.cache_pdf.validadores(request.url))
+
+        host = urlparse(request.url).hostname
+        async with self.agendador.slot(host, self.espera_max_host) if self.agendador else nullcontext():
+            liberar_vaga = await self.backend_pdf.reservar() if self.backend_pdf else None
+            inicio = time.perf_counter()
+            try:
+                resposta = await self._baixar_com_fallback(host, request, headers, session, proxy_info, statistics)
+            except BaseException as e:  # inclui o CancelledError do timeout do handler
+                if liberar_vaga:
+                    liberar_vaga()
+                if self.agendador and isinstance(e, Exception) and falha_transitoria(excecao=e):
+                    # timeout/conexão também conta contra o host
+                    self.agendador.registrar(host, None, time.perf_counter() - inicio)
+                raise
+            if liberar_vaga:
+                resposta.reter_vaga(liberar_vaga)
+            resposta.duracao_download = time.perf_counter() - inicio
+            bytes_downloaded_counter.add(resposta.tamanho, {"host": host or ""})
+            if self.agendador:
+                self.agendador.registrar(host, resposta.status_code, resposta.duracao_download,
+                                         retry_after=ler_retry_after(resposta.headers))
+
+        return HttpCrawlingResult(http_response=resposta)
+
+    async def _baixar_com_fallback(self, host, request: Request, headers, session, proxy_info, statistics) -> RespostaPDF:
+        with tracer.start_as_current_span("download_pdf") as span:
+            span.set_attribute("host", host or "")
+            contexto = self.confianca_tls.contexto_conhecido(host) if self.confianca_tls else None
+            cliente = await self._cliente_fallback(host, contexto) if contexto else self
+            try:
+                resposta = await self._baixar(cliente, request, headers, session, proxy_info, statistics)
+            except Exception as e:
+                if not self.confianca_tls or not erro_de_certificado(e):
+                    raise
+                if contexto:
+                    # a cadeia guardada não vale mais (certificado renovado): descarta e resolve de novo
+                    self.confianca_tls.invalidar(host, contexto)
+                    if self._clientes_fallback.get(host) is cliente:
+                        self._clientes_descartados.append(self._clientes_fallback.pop(host))
+                # falha de certificado: resolve a cadeia uma vez e tenta de novo
+                contexto = await self.confianca_tls.contexto(host, urlparse(request.url).port or 443)
+                if contexto is None:
+                    raise
+                cliente = await self._cliente_fallback(host, contexto)
+                resposta = await self._baixar(cliente, request, headers, session, proxy_info, statistics)
+            resposta.tls_fallback = contexto is not None
+            span.set_attributes({"http.status_code": resposta.status_code, "bytes": resposta.tamanho,
+                                 "abortado": resposta.motivo_abortado or "", "tls_fallback": resposta.tls_fallback})
+        return resposta
+
+    async def _baixar(self, cliente, request: Request, headers, session, proxy_info, statistics) -> RespostaPDF:
+        async with cliente.stream(request.url, method=request.method, headers=headers,
+                                  session=session, proxy_info=proxy_info) as resp:
+            if statistics:
+                statistics.register_status_code(resp.status_code)
+            resposta = RespostaPDF(resp.http_version, resp.status_code, resp.headers)
+            if resp.status_code == 200:
+                await self._consumir_corpo(resp, resposta)
+            elif resp.status_code == 304 and self.cache_pdf:
+                resposta.hash_conteudo = self.cache_pdf.hash_da_url(request.url)
+        return resposta
+
+    async def _consumir_corpo(self, resp, resposta: RespostaPDF):
+        await consumir_corpo_pdf(resp.read_stream(), resp.headers, resposta, self.max_bytes, self.limiar_disco, self.pasta_temp)
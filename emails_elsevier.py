@@ -0,0 +1,59 @@
+import re
+import json
+import html
+from extrator_emails import extrair_emails_texto, deduplicar
+
+# Coleta, numa única chamada ao navegador, tudo que pode conter o email dos autores:
+# o estado pré-carregado do artigo (JSON embutido), links mailto: e o bloco de autores (mesmo oculto)
+JS_COLETAR = """
+() => {
+    const jsons = Array.from(document.querySelectorAll('script[type="application/json"]')).map(s => s.textContent);
+    if (window.__PRELOADED_STATE__) {
+        try { jsons.push(JSON.stringify(window.__PRELOADED_STATE__)); } catch (e) {}
+    }
+    const mailtos = Array.from(document.querySelectorAll('a[href^="mailto:"]')).map(a => a.getAttribute('href'));
+    const autores = Array.from(document.querySelectorAll('#author-group, .author-group, .AuthorGroups'))
+        .map(el => el.textContent);
+    return {jsons, mailtos, autores};
+}
+"""
+
+# equivalentes de JS_COLETAR para o HTML estático (sem navegador)
+REGEX_SCRIPT_JSON = re.compile(r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.S | re.I)
+REGEX_MAILTO = re.compile(r'href="mailto:([^"]+)"', re.I)
+
+
+def _emails_no_estado(no, encontrados: list):
+    """Percorre o JSON do artigo procurando nós {"#name": "e-address", "_": "<email>"}."""
+    if isinstance(no, dict):
+        if no.get("#name") == "e-address" and isinstance(no.get("_"), str):
+            encontrados.append(no["_"])
+        for valor in no.values():
+            _emails_no_estado(valor, encontrados)
+    elif isinstance(no, list):
+        for valor in no:
+            _emails_no_estado(valor, encontrados)
+
+
+def extrair_emails_coleta(coleta: dict) -> list[str]:
+    """Emails (normalizados, sem repetição) a partir do retorno de JS_COLETAR."""
+    emails = []
+    for texto in coleta.get("jsons") or []:
+        try:
+            _emails_no_estado(json.loads(texto), emails)
+        except (ValueError, TypeError):
+            continue
+    for href in coleta.get("mailtos") or []:
+        emails.extend(extrair_emails_texto(href))
+    for texto in coleta.get("autores") or []:
+        emails.extend(extrair_emails_texto(texto or ""))
+    return deduplicar(emails)
+
+
+def extrair_emails_html(texto_html: str) -> list[str]:
+    """Mesma extração de `extrair_emails_coleta`, mas a partir do HTML estático da página."""
+    coleta = {
+        "jsons": REGEX_SCRIPT_JSON.findall(texto_html),
+        "mailtos": [html.unescape(href) for href in REGEX_MAILTO.findall(texto_html)],
+    }
+    return extrair_emails_coleta(coleta)
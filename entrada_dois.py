@@ -0,0 +1,75 @@
+import random
+from pathlib import Path
+import pandas as pd
+
+
+def ler_linhas_em_blocos(caminho, colunas: list[str], tamanho_bloco: int = 10_000):
+    """Lê as colunas pedidas da planilha em blocos, sem carregar o arquivo inteiro.
+
+    Suporta CSV (pandas com chunksize), Parquet (pyarrow, por record batch),
+    Excel (openpyxl em modo read_only, linha a linha) e o .xls antigo (xlrd, lido
+    de uma vez e entregue em blocos). Gera um DataFrame por bloco.
+    """
+    sufixo = Path(caminho).suffix.lower()
+
+    if sufixo == ".csv":
+        yield from pd.read_csv(caminho, usecols=colunas, chunksize=tamanho_bloco)
+
+    elif sufixo == ".parquet":
+        import pyarrow.parquet as pq
+        arquivo = pq.ParquetFile(caminho)
+        for batch in arquivo.iter_batches(batch_size=tamanho_bloco, columns=colunas):
+            yield batch.to_pandas()
+
+    elif sufixo in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+        wb = load_workbook(caminho, read_only=True)
+        try:
+            linhas = wb.active.iter_rows(values_only=True)
+            cabecalho = list(next(linhas))
+            indices = [cabecalho.index(c) for c in colunas]
+            bloco = []
+            for linha in linhas:
+                bloco.append([linha[i] for i in indices])
+                if len(bloco) >= tamanho_bloco:
+                    yield pd.DataFrame(bloco, columns=colunas)
+                    bloco = []
+            if bloco:
+                yield pd.DataFrame(bloco, columns=colunas)
+        finally:
+            wb.close()
+
+    elif sufixo == ".xls":
+        # o xlrd não lê em streaming, mas o .xls tem no máximo 65.536 linhas
+        df = pd.read_excel(caminho, usecols=colunas)
+        for inicio in range(0, len(df), tamanho_bloco):
+            yield df.iloc[inicio:inicio + tamanho_bloco]
+
+    else:
+        raise ValueError(f"Formato de planilha não suportado: {sufixo} (use .csv, .parquet, .xlsx, .xlsm ou .xls)")
+
+
+def ler_dois(caminho, coluna: str = "DOI", tamanho_bloco: int = 10_000):
+    """Gera os DOIs (não vazios) da planilha, bloco a bloco."""
+    for bloco in ler_linhas_em_blocos(caminho, [coluna], tamanho_bloco):
+        for doi in bloco[coluna].dropna():
+            yield doi
+
+
+def embaralhar_em_janela(itens, janela: int = 10_000, seed: int | None = 42):
+    """Embaralha um fluxo usando só uma janela de `janela` itens em memória.
+
+    Não é uma permutação uniforme do arquivo inteiro, mas basta para desfazer as
+    sequências de DOIs do mesmo host que vêm juntas na planilha.
+    """
+    rng = random.Random(seed)
+    buffer = []
+    for item in itens:
+        if len(buffer) < janela:
+            buffer.append(item)
+            continue
+        i = rng.randrange(janela)
+        yield buffer[i]
+        buffer[i] = item
+    rng.shuffle(buffer)
+    yield from buffer
@@ -0,0 +1,189 @@
+import os
+import json
+import asyncio
+from pathlib import Path
+from progresso import abrir_csv_saida
+from otel_setup import tracer
+
+
+# ---------------- saídas ----------------
+class SaidaCSV:
+    def __init__(self, caminho, cabecalho: list[str], retomar: bool = False):
+        self.f, self.writer = abrir_csv_saida(caminho, cabecalho, retomar)
+
+    def gravar(self, linhas):
+        self.writer.writerows(linhas)
+
+    def flush(self):
+        self.f.flush()
+
+    def fechar(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+
+class SaidaJSONL:
+    """Uma linha JSON por registro, com as chaves do cabeçalho."""
+
+    def __init__(self, caminho, cabecalho: list[str], retomar: bool = False):
+        self.cabecalho = cabecalho
+        self.f = open(caminho, "a" if retomar else "w", encoding="utf-8")
+
+    def gravar(self, linhas):
+        self.f.writelines(json.dumps(dict(zip(self.cabecalho, linha)), ensure_ascii=False) + "\n" for linha in linhas)
+
+    def flush(self):
+        self.f.flush()
+
+    def fechar(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+
+class SaidaParquet:
+    """Cada lote vira um row group; todas as colunas como texto.
+
+    Parquet não aceita append: ao retomar, um arquivo existente não é sobrescrito.
+    """
+
+    def __init__(self, caminho, cabecalho: list[str], retomar: bool = False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if retomar and os.path.exists(caminho):
+            raise ValueError(f"Saída Parquet não suporta append: {caminho} já existe")
+        self.pa = pa
+        self.cabecalho = cabecalho
+        self.schema = pa.schema([(coluna, pa.string()) for coluna in cabecalho])
+        self.writer = pq.ParquetWriter(caminho, self.schema)
+
+    def gravar(self, linhas):
+        colunas = list(zip(*linhas)) if linhas else [[] for _ in self.cabecalho]
+        tabela = self.pa.table(
+            {nome: [None if v is None else str(v) for v in valores] for nome, valores in zip(self.cabecalho, colunas)},
+            schema=self.schema,
+        )
+        self.writer.write_table(tabela)
+
+    def flush(self):
+        pass  # cada write_table já fecha um row group
+
+    def fechar(self):
+        self.writer.close()
+
+
+def abrir_saida(caminho, cabecalho: list[str], retomar: bool = False):
+    """Escolhe a saída pela extensão do arquivo (.csv, .jsonl ou .parquet)."""
+    sufixo = Path(caminho).suffix.lower()
+    if sufixo == ".jsonl":
+        return SaidaJSONL(caminho, cabecalho, retomar)
+    if sufixo == ".parquet":
+        return SaidaParquet(caminho, cabecalho, retomar)
+    return SaidaCSV(caminho, cabecalho, retomar)
+
+
+# ---------------- escritor ----------------
+class EscritorLotes:
+    """Tarefa dedicada que grava os resultados em lotes, sem lock nem flush por linha.
+
+    Os handlers só colocam linhas na fila (`escrever`/`escrever_muitas`); a tarefa junta
+    até `tamanho_lote` linhas ou `intervalo` segundos e faz um único flush por lote.
+    O callback `depois` roda só depois que as linhas do item foram gravadas, o que
+    permite registrar o progresso do DOI apenas quando a saída já está no arquivo.
+
+    Usar como `async with EscritorLotes(saida) as escritor:`; ao sair, a fila é
+    esvaziada e o arquivo é sincronizado com o disco, mesmo se houver exceção.
+    Se a tarefa de gravação morrer (disco cheio, erro na saída), quem escreve recebe
+    a exceção dela em vez de ficar esperando vaga na fila.
+    """
+
+    def __init__(self, saida, tamanho_lote: int = 500, intervalo: float = 1.0, max_fila: int = 10_000):
+        self.saida = saida
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.fila = asyncio.Queue(maxsize=max_fila)  # backpressure se o disco não acompanhar
+        self.linhas_gravadas = 0
+        self._tarefa = None
+
+    async def __aenter__(self):
+        self._tarefa = asyncio.create_task(self._loop())
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.fechar()
+
+    async def escrever(self, linha, depois=None):
+        await self._enfileirar(([linha], depois))
+
+    async def escrever_muitas(self, linhas, depois=None):
+        """Enfileira as linhas (pode ser vazia, só para agendar o `depois`)."""
+        await self._enfileirar((list(linhas), depois))
+
+    def _verificar_tarefa(self):
+        if self._tarefa is not None and self._tarefa.done():
+            self._tarefa.result()  # relança a exceção da gravação
+            raise RuntimeError(f"escritor de {type(self.saida).__name__} já encerrado")
+
+    async def _enfileirar(self, item):
+        self._verificar_tarefa()
+        try:
+            self.fila.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            if self._tarefa is None:
+                await self.fila.put(item)
+                return
+        # fila cheia: espera a vaga, mas acorda se a tarefa de gravação morrer enquanto isso
+        put = asyncio.ensure_future(self.fila.put(item))
+        await asyncio.wait([put, self._tarefa], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self._verificar_tarefa()
+        put.result()
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        fim = False
+        while not fim:
+            item = await self.fila.get()
+            if item is None:
+                break
+            lote = [item]
+            n = len(item[0])
+            prazo = loop.time() + self.intervalo
+            while n < self.tamanho_lote:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.fila.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    fim = True
+                    break
+                lote.append(item)
+                n += len(item[0])
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        linhas = [linha for linhas, _ in lote for linha in linhas]
+        if linhas:
+            with tracer.start_as_current_span("gravar_lote") as span:
+                span.set_attributes({"saida": type(self.saida).__name__, "linhas": len(linhas)})
+                self.saida.gravar(linhas)
+                self.saida.flush()
+            self.linhas_gravadas += len(linhas)
+        for _, depois in lote:
+            if depois:
+                depois()
+
+    async def fechar(self):
+        try:
+            if self._tarefa is not None:
+                await self._enfileirar(None)
+                await self._tarefa
+        finally:
+            self._tarefa = None
+            self.saida.fechar()
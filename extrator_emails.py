@@ -0,0 +1,119 @@
+import re
+
+
+REGEX_EMAIL = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+# marcadores que justificam olhar o trecho: "@" (e o "＠" de largura total) ou "at" entre colchetes/parênteses
+REGEX_ARROBA = re.compile(r"[@＠]")
+REGEX_MARCADOR_OFUSCADO = re.compile(r"[\[\(\{<]\s*(?:at|arroba)\s*[\]\)\}>]", re.I)
+REGEX_AT_OFUSCADO = re.compile(r"\s*[\[\(\{<]\s*(?:at|arroba)\s*[\]\)\}>]\s*", re.I)
+REGEX_DOT_OFUSCADO = re.compile(r"\s*[\[\(\{<]\s*(?:dot|ponto)\s*[\]\)\}>]\s*", re.I)
+
+# quebras de linha no meio do endereço: depois de @ ou _, ou dentro de um domínio que ainda não pode
+# ter terminado: "joao@usp.\nbr" (só um rótulo antes do ".") e "maria@uni-\nbonn.de" (domínio não
+# termina em "-"). Depois de um domínio completo ("joao@usp.br.\nmaria@...") a linha não é juntada,
+# e nada é colado numa linha que começa com um endereço ("0000-0002-\njoao@usp.br")
+REGEX_QUEBRA_APOS = re.compile(r"([@_])[ \t]*\n\s*")
+REGEX_QUEBRA_DOMINIO = re.compile(
+    r"(@[a-zA-Z0-9-]*[a-zA-Z0-9]\.|@[a-zA-Z0-9.-]*-)[ \t]*\n\s*(?=[a-z0-9])(?![^\s@]*@)"
+)
+REGEX_QUEBRA_ANTES = re.compile(r"[ \t]*\n\s*(?=@)")
+
+# {a,b}@uni.edu, (a|b)@uni.edu, [a; b]@uni.edu
+REGEX_AGRUPADO = re.compile(
+    r"[\{\(\[]\s*([\w.%+-]+(?:\s*[,;|/]\s*[\w.%+-]+)+)\s*[\}\)\]]\s*@\s*([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"
+)
+REGEX_SEPARADOR_GRUPO = re.compile(r"\s*[,;|/]\s*")
+
+# caracteres em volta de cada marcador que entram no trecho analisado
+JANELA_ANTES = 200
+JANELA_DEPOIS = 120
+
+
+def normalizar_email(email: str) -> str:
+    """Caixa baixa e sem pontuação sobrando nas pontas (ex.: ponto final da frase)."""
+    return email.strip(".-_").lower()
+
+
+def _marcadores(texto: str) -> list[int]:
+    posicoes = [m.start() for m in REGEX_ARROBA.finditer(texto)]
+    ofuscados = [m.start() for m in REGEX_MARCADOR_OFUSCADO.finditer(texto)]
+    if ofuscados:
+        posicoes = sorted(posicoes + ofuscados)
+    return posicoes
+
+
+def _trechos(texto: str):
+    """Junta as janelas em volta de cada marcador em trechos contínuos, sem sobreposição."""
+    inicio = fim = None
+    for posicao in _marcadores(texto):
+        a, b = max(posicao - JANELA_ANTES, 0), posicao + JANELA_DEPOIS
+        if fim is not None and a <= fim:
+            fim = b
+            continue
+        if fim is not None:
+            yield texto[inicio:fim]
+        inicio, fim = a, b
+    if fim is not None:
+        yield texto[inicio:fim]
+
+
+def _desofuscar(trecho: str) -> str:
+    trecho = trecho.replace("­", "").replace("＠", "@")  # hífen "soft" da hifenização e @ de largura total
+    trecho = REGEX_AT_OFUSCADO.sub("@", trecho)
+    trecho = REGEX_DOT_OFUSCADO.sub(".", trecho)
+    trecho = REGEX_QUEBRA_ANTES.sub("", trecho)
+    trecho = REGEX_QUEBRA_APOS.sub(r"\1", trecho)
+    return REGEX_QUEBRA_DOMINIO.sub(r"\1", trecho)
+
+
+def extrair_emails_texto(texto: str) -> list[str]:
+    """Emails normalizados e sem repetição encontrados no texto.
+
+    A regex só roda nos trechos em volta de um "@" ou de um "[at]"/"(at)"; páginas sem
+    marcador nenhum saem sem custo além da busca do marcador. Em cada trecho:
+      - "name [at] domain [dot] edu" e "＠" viram endereços normais;
+      - endereços quebrados entre linhas são reunidos quando o pedaço antes da quebra não
+        pode ser um endereço completo. O hífen no fim da linha é mantido, mas só dentro do
+        domínio (hífens são comuns em domínios, e o LaTeX não hifeniza endereços); o soft
+        hyphen (U+00AD) é removido;
+      - "{a,b}@uni.edu" é expandido em a@uni.edu e b@uni.edu.
+    """
+    emails = []
+    for trecho in _trechos(texto):
+        trecho = _desofuscar(trecho)
+        for m in REGEX_AGRUPADO.finditer(trecho):
+            emails.extend(f"{nome}@{m.group(2)}" for nome in REGEX_SEPARADOR_GRUPO.split(m.group(1)) if nome)
+        trecho = REGEX_AGRUPADO.sub(" ", trecho)
+        emails.extend(REGEX_EMAIL.findall(trecho))
+    return deduplicar(emails)
+
+
+def deduplicar(emails) -> list[str]:
+    """Normaliza e remove repetições, mantendo a ordem da primeira ocorrência."""
+    return list(dict.fromkeys(e for e in map(normalizar_email, emails) if "@" in e))
+
+
+# ---------------- Benchmark ----------------
+if __name__ == "__main__":
+    # compara com a regex antiga num corpus de textos extraídos de PDFs (um .txt por PDF):
+    #   python extrator_emails.py pasta_com_txts
+    import sys
+    import time
+    from pathlib import Path
+
+    textos = [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(Path(sys.argv[1]).glob("*.txt"))]
+
+    t0 = time.perf_counter()
+    antigos = [REGEX_EMAIL.findall(texto) for texto in textos]
+    t1 = time.perf_counter()
+    novos = [extrair_emails_texto(texto) for texto in textos]
+    t2 = time.perf_counter()
+
+    total_antigo = sum(len(e) for e in antigos)
+    unicos_antigo = sum(len(set(e)) for e in antigos)
+    total_novo = sum(len(e) for e in novos)
+    extras = sum(len(set(n) - {normalizar_email(e) for e in a}) for a, n in zip(antigos, novos))
+    print(f"Textos: {len(textos)}")
+    print(f"Regex antiga: {total_antigo} emails ({unicos_antigo} únicos por texto) em {t1 - t0:.3f}s")
+    print(f"Extrator novo: {total_novo} emails (já deduplicados) em {t2 - t1:.3f}s | {extras} que a regex antiga não achava")
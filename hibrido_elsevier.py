@@ -1,20 +1,26 @@
 import re
-import csv
+import time
+import weakref
 import asyncio
 import pandas as pd
+from contextlib import AsyncExitStack
 from datetime import timedelta
 from pathlib import Path
+from urllib.parse import urlparse
 from crawlee.browsers import BrowserPool, PlaywrightBrowserController, PlaywrightBrowserPlugin
 from crawlee.crawlers import PlaywrightCrawler, PlaywrightCrawlingContext, PlaywrightPreNavCrawlingContext
 from crawlee import Request, ConcurrencySettings
+from crawlee.storages import RequestQueue
+from crawlee.http_clients import ImpitHttpClient
 from datetime import timedelta
-from crawlee.fingerprint_suite import (
-    DefaultFingerprintGenerator,
-    HeaderGeneratorOptions,
-    ScreenOptions,
-)
 from camoufox import AsyncNewBrowser
 from typing_extensions import override
+from progresso import DiarioProgresso, ESTADOS_CONCLUIDOS_ELSEVIER
+from escritor_resultados import EscritorLotes, abrir_saida
+from entrada_dois import ler_linhas_em_blocos
+from politica_recursos import PoliticaRecursos
+from emails_elsevier import JS_COLETAR, extrair_emails_coleta, extrair_emails_html
+from otel_setup import tracer, pages_scraped_counter, emails_extracted_counter, request_duration_histogram
 
 import logging
 logging.getLogger("crawlee").setLevel(logging.INFO)
@@ -22,6 +28,10 @@ logging.getLogger("crawlee").setLevel(logging.INFO)
 class CamoufoxPlugin(PlaywrightBrowserPlugin):
     """Example browser plugin that uses Camoufox browser,
     but otherwise keeps the functionality of PlaywrightBrowserPlugin.
+
+    O limite de páginas por navegador vem de `max_open_pages_per_browser` do plugin.
+    Sem páginas anônimas (`use_incognito_pages=False`), as páginas de um navegador
+    compartilham o mesmo contexto, então cookies aceitos uma vez valem para as próximas.
     """
 
     @override
@@ -33,29 +43,60 @@ class CamoufoxPlugin(PlaywrightBrowserPlugin):
             browser=await AsyncNewBrowser(
                 self._playwright, **self._browser_launch_options
             ),
-            # Increase, if camoufox can handle it in your use case.
-            max_open_pages_per_browser=1,
+            max_open_pages_per_browser=self._max_open_pages_per_browser,
             # This turns off the crawlee header_generation. Camoufox has its own.
             header_generator=None,
         )
 
 
 class ExtracaoElsevier:
-    def __init__(self):
+    def __init__(self, max_navegadores: int = 1, paginas_por_navegador: int = 3, retirar_navegador_apos: int | None = 200,
+                 politica_recursos: PoliticaRecursos | None = None, pasta_debug: str | None = None,
+                 modo_extracao: str = "dom+cliques", tier_http: bool = True, concorrencia_http: int = 10):
         self.regex = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
-        self.csv_writer = None
-        self.csv_file = None
-        self.csv_lock = asyncio.Lock()
+        # concorrência = navegadores x páginas; o BrowserPool só abre outro navegador quando os atuais estão cheios
+        self.max_navegadores = max_navegadores
+        self.paginas_por_navegador = paginas_por_navegador
+        self.retirar_navegador_apos = retirar_navegador_apos  # recicla o navegador depois de N páginas
+        self.saidas = {}  # EscritorLotes dos emails, por arquivo de entrada
+        self.progresso = None  # DiarioProgresso quando a execução é retomável
+        self._contextos_aquecidos = weakref.WeakSet()  # contextos em que os cookies já foram aceitos
+        # bloqueio de imagens/fontes/mídia e rastreadores antes da navegação (None = padrão)
+        self.politica_recursos = politica_recursos or PoliticaRecursos()
+        # screenshots só em modo debug: pasta onde salvar um PNG por artigo
+        self.pasta_debug = Path(pasta_debug) if pasta_debug else None
+        if self.pasta_debug:
+            self.pasta_debug.mkdir(parents=True, exist_ok=True)
+        # "dom": só o JSON/DOM embutido | "cliques": só o painel de autores | "dom+cliques": DOM com fallback
+        if modo_extracao not in ("dom", "cliques", "dom+cliques"):
+            raise ValueError(f"Modo de extração inválido: {modo_extracao}")
+        self.modo_extracao = modo_extracao
+        self.tempos = {"dom": [], "cliques": []}  # segundos por artigo, por caminho que resolveu
+        # tier HTTP: tenta o HTML estático com impersonation antes de abrir o navegador
+        self.http_client = ImpitHttpClient(browser="chrome", http3=True, verify=True) if tier_http else None
+        self.concorrencia_http = concorrencia_http
+        self.tiers = {"http": 0, "navegador": 0, "sem email": 0}  # artigos resolvidos em cada tier
 
-    # Handler padrão do router
-    async def handle_elsevier(self, ctx: PlaywrightCrawlingContext):
-        print('chamou a função -------------------------------------------------------------------------------')
-        page = ctx.page
-        #await page.wait_for_timeout(30000) # isso não está funcionando, ou seja não está nem chamando a função, ou o problema está dentro da prórpia função/contexto
+    async def _aceitar_cookies(self, page):
+        """Aceita o banner de cookies só na primeira página de cada contexto do navegador"""
+        if page.context in self._contextos_aquecidos:
+            return
+        try:
+            await page.get_by_role("button", name="Accept all cookies").click(timeout=5000)
+        except Exception:
+            pass  # banner não apareceu
+        self._contextos_aquecidos.add(page.context)
 
-        await page.screenshot(path=r"debug\debug_camoufox.png")
-        await page.get_by_role("button", name="Accept all cookies").click()
+    async def _extrair_emails_dom(self, page) -> list[str]:
+        """Lê os emails do estado pré-carregado do artigo / DOM oculto, numa única chamada evaluate"""
+        coleta = await page.evaluate(JS_COLETAR)
+        return extrair_emails_coleta(coleta)
+
+    async def _extrair_emails_cliques(self, page) -> list[str]:
+        """Caminho antigo: abre o painel de cada autor (ícone de envelope) e procura o email no texto"""
+        await self._aceitar_cookies(page)
         #await page.get_by_role("button", name="Close").click()
+        emails = []
 
         # Localiza ícones de envelope
         side_bar_list = await page.locator("svg.icon-envelope").all()
@@ -69,9 +110,7 @@ class ExtracaoElsevier:
                         await page.get_by_role("button", name="Close Author panel").click(timeout=3000)
                     try: # Tenta localizar e extrair email
                         email = await page.locator(f"text=/{self.regex.pattern}/").inner_text()
-                        async with self.csv_lock:
-                            self.csv_writer.writerow([email, ctx.request.user_data["doi"]])
-                            self.csv_file.flush()
+                        emails.append(email)
                         print("Email encontrado:", email)
                     except Exception:
                         print("Nenhum email encontrado nesse painel.")
@@ -83,63 +122,254 @@ class ExtracaoElsevier:
                         print("Fechou popup e vai tentar de novo.")
                     except Exception:
                         print("Não achou popup para fechar.")
-            
+        return emails
+
+    # Handler padrão do router
+    async def handle_elsevier(self, ctx: PlaywrightCrawlingContext):
+        logging.debug(f"Handler Elsevier | {ctx.request.url}")
+        page = ctx.page
+        #await page.wait_for_timeout(30000) # isso não está funcionando, ou seja não está nem chamando a função, ou o problema está dentro da prórpia função/contexto
+
+        if self.pasta_debug:
+            await page.screenshot(path=self.pasta_debug / f"debug_camoufox_{ctx.request.user_data['ordem doi']}.png")
+        saida = self.saidas[ctx.request.user_data["arquivo"]]
+        emails, caminho, tempo_dom, tempo_cliques = [], None, None, None
+        pages_scraped_counter.add(1, {"handler": "elsevier"})
+
+        with tracer.start_as_current_span("elsevier_navegador") as span:
+            span.set_attributes({"doi": ctx.request.user_data["doi"], "host": urlparse(ctx.request.url).hostname or ""})
+            if self.modo_extracao in ("dom", "dom+cliques"):
+                t0 = time.perf_counter()
+                try:
+                    emails = await self._extrair_emails_dom(page)
+                except Exception as e:
+                    span.record_exception(e)
+                    logging.warning(f"[DOI {ctx.request.user_data['ordem doi']}] Extração pelo DOM falhou: {e}")
+                tempo_dom = time.perf_counter() - t0
+                caminho = "dom"
 
+            # cliques só como fallback (ou forçado, para comparar os dois caminhos)
+            if self.modo_extracao == "cliques" or (self.modo_extracao == "dom+cliques" and not emails):
+                t0 = time.perf_counter()
+                emails = await self._extrair_emails_cliques(page)
+                tempo_cliques = time.perf_counter() - t0
+                caminho = "cliques"
+            span.set_attributes({"caminho": caminho, "emails": len(emails)})
 
-    async def main(self, folder_path_data, folder_path_emails):
-        fingerprint_generator = DefaultFingerprintGenerator(
-            header_options=HeaderGeneratorOptions(browsers=['chrome']),
+            await saida.escrever_muitas([email, ctx.request.user_data["doi"]] for email in emails)
+        self.tiers["navegador" if emails else "sem email"] += 1
+        self.tempos[caminho].append((tempo_dom or 0) + (tempo_cliques or 0))
+        emails_extracted_counter.add(len(emails), {"origem": "elsevier", "caminho": caminho})
+        request_duration_histogram.record((tempo_dom or 0) + (tempo_cliques or 0), {"handler": "elsevier", "caminho": caminho})
+        logging.info(
+            f"[DOI {ctx.request.user_data['ordem doi']}] | "
+            f"Caminho: {caminho} | "
+            f"Emails: {len(emails)} | "
+            f"DOM: {f'{tempo_dom:.2f}s' if tempo_dom is not None else '-'} | "
+            f"Cliques: {f'{tempo_cliques:.2f}s' if tempo_cliques is not None else '-'}"
         )
 
+    def _linhas(self, arquivos, concluidos: set, tamanho_bloco: int):
+        """Percorre todos os CSVs em blocos, gerando (url, doi, ordem_doi, arquivo) ainda não processados"""
+        for arquivo in arquivos:
+            ordem_doi = 0
+            for bloco in ler_linhas_em_blocos(arquivo, ['urls elsevier', 'doi'], tamanho_bloco):
+                for url, doi in zip(bloco['urls elsevier'], bloco['doi']):
+                    ordem_doi += 1
+                    if pd.isna(url) or pd.isna(doi) or doi in concluidos:
+                        continue
+                    yield url, doi, ordem_doi, arquivo.name
+
+    async def _registrar_processado(self, doi, arquivo):
+        if self.progresso:  # registra só depois que os emails do artigo forem gravados
+            await self.saidas[arquivo].escrever_muitas([], depois=lambda: self.progresso.registrar(doi, "elsevier processado"))
+
+    async def _tentar_http(self, url, doi, ordem_doi, arquivo) -> bool:
+        """Tier rápido: baixa o HTML sem navegador e procura os emails no JSON/markup estático"""
+        with tracer.start_as_current_span("elsevier_http") as span:
+            span.set_attributes({"doi": doi, "host": urlparse(url).hostname or ""})
+            try:
+                resp = await self.http_client.send_request(url)
+                span.set_attribute("http.status_code", resp.status_code)
+                if resp.status_code != 200:
+                    return False
+                corpo = await resp.read()
+                span.set_attribute("bytes", len(corpo))
+                emails = extrair_emails_html(corpo.decode("utf-8", errors="replace"))
+            except Exception as e:
+                span.record_exception(e)
+                print(f"[DOI {ordem_doi}] Tier HTTP falhou: {e}")
+                return False
+            span.set_attribute("emails", len(emails))
+        pages_scraped_counter.add(1, {"handler": "elsevier_http", "status": resp.status_code})
+        if not emails:
+            return False
+        emails_extracted_counter.add(len(emails), {"origem": "elsevier", "caminho": "http"})
+
+        await self.saidas[arquivo].escrever_muitas([email, doi] for email in emails)
+        await self._registrar_processado(doi, arquivo)
+        self.tiers["http"] += 1
+        print(f"[DOI {ordem_doi}] | Caminho: http | Emails: {len(emails)}")
+        return True
+
+    async def _encher_fila(self, fila: asyncio.Queue, linhas):
+        """Produtor do modo arquivo: passa as linhas dos CSVs para a fila e sinaliza o fim com None"""
+        for linha in linhas:
+            await fila.put(linha)
+            await asyncio.sleep(0)  # deixa o crawler andar enquanto os CSVs são lidos
+        await fila.put(None)
+
+    async def _gerar_requests(self, fila: asyncio.Queue):
+        """Gera sob demanda as requisições do navegador; com o tier HTTP ativo, só as que ele não resolveu.
+
+        Consome (url, doi, ordem_doi[, arquivo]) da fila até receber None; cada janela do tier HTTP
+        junta o que já estiver disponível, sem esperar encher.
+        """
+        tamanho_janela = self.concorrencia_http if self.http_client else 1
+        fim = False
+        while not fim:
+            item = await fila.get()
+            if item is None:
+                break
+            janela = [item]
+            while len(janela) < tamanho_janela and not fila.empty():
+                item = fila.get_nowait()
+                if item is None:
+                    fim = True
+                    break
+                janela.append(item)
+
+            linhas = []
+            for url, doi, ordem_doi, *arquivo in janela:
+                linhas.append((url, doi, ordem_doi, arquivo[0] if arquivo else None))  # None = saída única
+            if self.http_client:
+                resolvidos = await asyncio.gather(*(self._tentar_http(*linha) for linha in linhas))
+            else:
+                resolvidos = [False] * len(linhas)
+
+            for (url, doi, ordem_doi, arquivo), resolvido in zip(linhas, resolvidos):
+                if resolvido:
+                    continue
+                print(f"[DOI {ordem_doi}] Enfileirado Elsevier | {url}")
+                yield Request.from_url(
+                    url=url,
+                    label="elsevier",
+                    user_data={'doi': doi, 'ordem doi': ordem_doi, 'arquivo': arquivo}
+                )
+
+    async def _alimentar(self, crawler: PlaywrightCrawler, fila: asyncio.Queue):
+        """Passa as requisições da fila para a RequestQueue do crawler e o encerra depois do None.
+
+        O crawler roda com keep_alive: pode ficar minutos sem URL nova (o estágio PDF não manda
+        nada por um tempo) sem terminar. Depois do None, espera a RequestQueue esvaziar e chama
+        `crawler.stop()`; se a alimentação falhar, o crawler também para.
+        """
+        try:
+            async for request in self._gerar_requests(fila):
+                await crawler.add_requests([request])
+            gerente = await crawler.get_request_manager()
+            while not await gerente.is_finished():
+                await asyncio.sleep(1)
+        finally:
+            crawler.stop("Fila Elsevier concluída")
+
+    async def _executar(self, fila: asyncio.Queue, caminhos_saida: dict, retomar: bool):
+        """Roda o crawler de navegador consumindo a fila, com um EscritorLotes por saída"""
+        max_concorrencia = self.max_navegadores * self.paginas_por_navegador
+        # fila própria (alias) para não colidir com outro crawler rodando no mesmo processo
+        fila_requests = await RequestQueue.open(alias="elsevier")
+
         crawler = PlaywrightCrawler(
             max_request_retries=0,
-            browser_pool=BrowserPool(plugins=[CamoufoxPlugin(browser_launch_options={"headless": True})]),
+            request_manager=fila_requests,
+            keep_alive=True,  # quem encerra é o _alimentar
+            browser_pool=BrowserPool(
+                plugins=[CamoufoxPlugin(
+                    browser_launch_options={"headless": True},
+                    max_open_pages_per_browser=self.paginas_por_navegador,
+                    use_incognito_pages=False,  # contexto compartilhado: cookies aceitos valem para as próximas páginas
+                )],
+                retire_browser_after_page_count=self.retirar_navegador_apos,
+            ),
             concurrency_settings=ConcurrencySettings(
-                min_concurrency=2,
-                desired_concurrency=3,
-                max_concurrency=3,        # mantenha baixo com sites sensíveis
+                min_concurrency=min(2, max_concorrencia),
+                desired_concurrency=max_concorrencia,
+                max_concurrency=max_concorrencia,        # mantenha baixo com sites sensíveis
                 # max_tasks_per_minute=30, # opcional p/ “ritmar” requisições
             ),
             #request_handler_timeout=timedelta(seconds=120) # tempo máximo do handler
         )
 
-        for arquivo in folder_path_data.iterdir():
-            if arquivo.suffix != ".csv":
-                continue
-            
-            dados = pd.read_csv(arquivo)
+        @crawler.pre_navigation_hook
+        async def _bloquear_recursos(ctx: PlaywrightPreNavCrawlingContext):
+            await self.politica_recursos.instalar(ctx.page)
 
-            processed_name = arquivo.stem.replace('coletadas', 'processadas') + arquivo.suffix
-            save_path_emails = folder_path_emails / processed_name
-            with open(save_path_emails, "w", newline="", encoding="utf-8") as f:
-                self.csv_file = f
-                self.csv_writer = csv.writer(f)
-                self.csv_writer.writerow(['emails', 'doi'])
+        @crawler.router.handler("elsevier")
+        async def _elsevier(ctx: PlaywrightCrawlingContext):
+            await self.handle_elsevier(ctx)
+            await self._registrar_processado(ctx.request.user_data['doi'], ctx.request.user_data['arquivo'])
 
-                router = crawler.router
+        async with AsyncExitStack() as pilha:
+            for nome, caminho in caminhos_saida.items():
+                self.saidas[nome] = await pilha.enter_async_context(
+                    EscritorLotes(abrir_saida(caminho, ['emails', 'doi'], retomar)))
+            if self.http_client:
+                await pilha.enter_async_context(self.http_client)
 
-                @router.handler("elsevier")
-                async def _elsevier(ctx: PlaywrightCrawlingContext):
-                    print("chamou a função -------------------------------------------------------------------------------")
-                    await self.handle_elsevier(ctx)
+            alimentacao = asyncio.create_task(self._alimentar(crawler, fila))
+            try:
+                await crawler.run()
+            finally:
+                if not alimentacao.done():
+                    alimentacao.cancel()
+            if not alimentacao.cancelled() and alimentacao.exception():
+                raise alimentacao.exception()
 
-                request_list = []
+        print(f"Recursos bloqueados: {self.politica_recursos.bloqueadas} | liberados: {self.politica_recursos.liberadas}")
+        total = sum(self.tiers.values())
+        for tier, quantidade in self.tiers.items():
+            print(f"Tier {tier}: {quantidade} artigos ({quantidade / total:.1%})" if total else f"Tier {tier}: 0 artigos")
+        for caminho, tempos in self.tempos.items():
+            if tempos:
+                print(f"Caminho {caminho}: {len(tempos)} artigos | média {sum(tempos) / len(tempos):.2f}s/artigo")
+        if self.progresso:
+            self.progresso.fechar()
 
-                for ordem_doi, row in dados.iterrows(): # Enfileira a URL inicial
-                    if pd.isna(row['urls elsevier']) or pd.isna(row['doi']):
-                        continue
-                    url = row['urls elsevier']
-                    doi = row['doi']
-                    request_list.append(
-                        Request.from_url(
-                            url=url,
-                            label="elsevier",
-                            user_data={'doi': doi, 'ordem doi': ordem_doi}
-                        )
-                    )
-                    print(f"[DOI {ordem_doi}] Enfileirado Elsevier | {url}")
-
-                await crawler.run(request_list)
+    async def main(self, folder_path_data, folder_path_emails, caminho_progresso: str | None = None, tamanho_bloco: int = 5_000):
+        """Processa todos os CSVs da pasta numa única execução do crawler, mantendo os navegadores aquecidos.
+
+        Com `caminho_progresso` a execução é retomável: DOIs já processados são pulados e os CSVs recebem append
+        """
+        retomar = caminho_progresso is not None
+        concluidos = set()
+        if retomar:
+            self.progresso = DiarioProgresso(caminho_progresso)
+            concluidos = self.progresso.concluidos(ESTADOS_CONCLUIDOS_ELSEVIER)
+            print(f"Retomando execução: {len(concluidos)} DOIs já processados serão pulados")
+
+        arquivos = [arquivo for arquivo in folder_path_data.iterdir() if arquivo.suffix == ".csv"]
+        caminhos_saida = {
+            arquivo.name: folder_path_emails / (arquivo.stem.replace('coletadas', 'processadas') + arquivo.suffix)
+            for arquivo in arquivos
+        }
+
+        fila = asyncio.Queue(maxsize=self.concorrencia_http * 10)
+        produtor = asyncio.create_task(self._encher_fila(fila, self._linhas(arquivos, concluidos, tamanho_bloco)))
+        try:
+            await self._executar(fila, caminhos_saida, retomar)
+        finally:
+            produtor.cancel()
+
+    async def main_fila(self, fila: asyncio.Queue, save_path_emails, caminho_progresso: str | None = None):
+        """Modo pipeline: consome (url, doi, ordem_doi) de uma fila em memória até receber None.
+
+        Usado pelo `PipelineUnificado`, em que o crawler da Unpaywall alimenta a fila enquanto
+        este crawler já está rodando; todos os emails vão para `save_path_emails`.
+        """
+        retomar = caminho_progresso is not None
+        if retomar:
+            self.progresso = DiarioProgresso(caminho_progresso)
+        await self._executar(fila, {None: save_path_emails}, retomar)
 
 
 if __name__ == "__main__":
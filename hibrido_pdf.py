@@ -6,62 +6,182 @@ from datetime import datetime
 from urllib.parse import urlparse
 from OpenSSL import SSL
 from crawlee.crawlers import HttpCrawler, HttpCrawlingContext
-from crawlee.http_clients import ImpitHttpClient
-from crawlee import Request
-from otel_setup import tracer, pages_scraped_counter, emails_extracted_counter, pdf_processing_histogram, request_duration_histogram
+from crawlee import Request, ConcurrencySettings
+from crawlee.request_loaders import RequestList
+from itertools import islice
+from otel_setup import tracer, pages_scraped_counter, request_duration_histogram
 import ssl
-import pandas as pd
 import certifi
 import time
 import settings
-import pymupdf as fitz
 import json
-
-
-# --- Logging Config ---
-logging.basicConfig(level=logging.INFO, filename=f"{__file__}.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s", encoding="utf-8")
-console = logging.StreamHandler(sys.stdout)
-console.setLevel(logging.INFO)
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-console.setFormatter(formatter)
-logging.getLogger().addHandler(console)
-
-# --- Logging Config Crawlee ---
-crawlee_logger = logging.getLogger("crawlee")
-crawlee_logger.propagate = True
-
-class FormatadoCrawler:
-    def __init__(self):
+from backend_pdf import BackendExtracao
+from download_pdf import ImpitPDFStreamingClient, RespostaPDF
+from cache_unpaywall import CacheUnpaywall
+from snapshot_unpaywall import IndiceSnapshotUnpaywall
+from registros import RegistroRequisicoes
+from cache_pdf import CachePDF
+from agendador_hosts import AgendadorHosts, ler_retry_after
+from retentativas import FilaRetentativas, falha_transitoria
+from confianca_tls import CacheConfiancaTLS
+from entrada_dois import ler_dois, embaralhar_em_janela
+from progresso import DiarioProgresso
+from escritor_resultados import EscritorLotes, abrir_saida
+from pipeline_pdf import ProcessamentoPDF, COLUNAS_EMAILS_PDF, resolver_unpaywall
+
+
+def configurar_logging(caminho_log: str = f"{__file__}.log"):
+    """Log da execução em arquivo (sobrescrito a cada execução) e no console.
+
+    Chamada só pelos programas (`__main__`): no modo de extração "processo" com spawn
+    (Windows), cada worker reimporta este módulo e, se a configuração ficasse no import,
+    truncaria o log da execução principal.
+    """
+    # --- Logging Config ---
+    logging.basicConfig(level=logging.INFO, filename=caminho_log, filemode="w",
+                        format="%(asctime)s - %(levelname)s - %(message)s", encoding="utf-8")
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.INFO)
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    console.setFormatter(formatter)
+    logging.getLogger().addHandler(console)
+
+    # --- Logging Config Crawlee ---
+    crawlee_logger = logging.getLogger("crawlee")
+    crawlee_logger.propagate = True
+
+
+# status que chegam aos handlers em vez de virar HttpClientStatusCodeError no Crawlee:
+# 404 da Unpaywall é "DOI desconhecido" (cache negativo); 403/404 de PDF são estados finais;
+# 429/5xx passam pela retentativa adiada
+STATUS_TRATADOS_NO_HANDLER = {403, 404, 429, 500, 502, 503, 504}
+
+class FormatadoCrawler(ProcessamentoPDF):
+    nome_transporte = "crawlee"
+
+    def __init__(self, modo_extracao: str = "processo", workers_extracao: int | None = None, max_pdfs_pendentes: int | None = None,
+                 primeiras_paginas: int | None = 2, ultimas_paginas: int | None = 1,
+                 max_bytes_pdf: int = 50 * 1024 * 1024, limiar_disco_pdf: int = 4 * 1024 * 1024,
+                 caminho_cache_unpaywall: str | None = None, ttl_cache_unpaywall: float = 7 * 24 * 3600,
+                 caminho_cache_pdf: str | None = None, max_entradas_cache_pdf: int = 200_000,
+                 limite_por_host: int = 2, limite_max_por_host: int = 8, caminho_cache_tls: str | None = None,
+                 caminho_indice_snapshot: str | None = None, fila_ocr=None, caminho_registros: str | None = None,
+                 retentativas=None):
         self.email_registro_api = settings.EMAIL_REGISTRO_API
         self.regex_email = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
         self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+        # extração de PDF fora do event loop (inline | thread | processo)
+        # primeiras/últimas páginas são lidas antes; None nos dois = documento inteiro
+        self.backend_pdf = BackendExtracao(modo_extracao, max_workers=workers_extracao, max_pendentes=max_pdfs_pendentes,
+                                           primeiras_paginas=primeiras_paginas, ultimas_paginas=ultimas_paginas,
+                                           pagina_ocr=fila_ocr is not None)
+        # OCR de baixa prioridade da 1ª página dos PDFs somente imagem (ocr_pdf.FilaOCR; None = só marca o estado)
+        self.fila_ocr = fila_ocr
+        # registro estruturado por requisição para o relatório de desempenho (registros.py; None = desativado)
+        self.caminho_registros = caminho_registros
+        # retentativas adiadas de timeouts/429/5xx (retentativas.FilaRetentativas; None = falha fica para a próxima execução)
+        self.retentativas = retentativas
+        # download em streaming: PDFs acima de max_bytes são abortados, acima do limiar vão para disco
+        self.max_bytes_pdf = max_bytes_pdf
+        self.limiar_disco_pdf = limiar_disco_pdf
+        # cache em disco das respostas da Unpaywall (None = desativado)
+        self.cache_unpaywall = CacheUnpaywall(caminho_cache_unpaywall, ttl_cache_unpaywall) if caminho_cache_unpaywall else None
+        # índice local do snapshot/changefiles da Unpaywall (None = só API e cache)
+        self.indice_snapshot = IndiceSnapshotUnpaywall(caminho_indice_snapshot) if caminho_indice_snapshot else None
+        # cache dos emails por hash do PDF / URL revalidada (None = desativado)
+        self.cache_pdf = CachePDF(caminho_cache_pdf, max_entradas_cache_pdf) if caminho_cache_pdf else None
+        # concorrência por host dos downloads de PDF, com backoff em 403/429 e hosts lentos
+        self.agendador = AgendadorHosts(limite_inicial=limite_por_host, limite_max=limite_max_por_host)
+        # cadeias de hosts com TLS quebrado, persistidas entre execuções (None = sem fallback)
+        self.confianca_tls = CacheConfiancaTLS(caminho_cache_tls) if caminho_cache_tls else None
 
         # runtime state
-        self.csv_writer = None
-        self.csv_file = None
-        self.csv_lock = asyncio.Lock()  # protege escrita concorrente
+        self.saida_pdf = None       # EscritorLotes dos emails (criado no main)
+        self.saida_elsevier = None  # EscritorLotes das URLs Elsevier
+        self.progresso = None  # DiarioProgresso quando a execução é retomável
+        self.registros = None  # RegistroRequisicoes (aberto no main)
+        self.fila_elsevier = None  # asyncio.Queue do estágio Elsevier no PipelineUnificado (None = só grava o CSV)
 
     # ---------------- utilidades ----------------
-    def _processar_pdf(self, pdf_bytes: bytes, ordem_doi: int):
-        """Processa o PDF: varre o texto procurando por emails"""
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        emails = []
-        emails_encontrados = 0
-        for page in doc:
-            text = page.get_text() or ""
-            for email in re.findall(self.regex_email, text):
-                emails.append(email)
-                emails_encontrados += 1
-        logging.info(f"Extração PDF concluída - {emails_encontrados} e-mails (DOI {ordem_doi})")
-        return emails
-
-    async def _escrever_emails_csv(self, emails, doi):
-        # escrita thread-safe
-        async with self.csv_lock:
-            for email in emails:
-                self.csv_writer_pdf.writerow([email, doi])
-            self.csv_file_pdf.flush()
+    async def _escrever_elsevier(self, url_artigo, doi, ordem_doi):
+        """Grava a URL Elsevier; no pipeline unificado também a entrega ao estágio do navegador,
+        que registra o DOI no diário só depois de extrair os emails"""
+        if self.fila_elsevier is None:
+            await self.saida_elsevier.escrever([url_artigo, doi], depois=lambda: self._registrar_estado(doi, "elsevier"))
+            return
+        await self.saida_elsevier.escrever([url_artigo, doi])
+        await self.fila_elsevier.put((url_artigo, doi, ordem_doi))
+
+    def _agendar_retentativa(self, request: Request, status=None, excecao=None, retry_after=None) -> bool:
+        """Adia uma nova tentativa da requisição se a falha for transitória; False se for definitiva.
+
+        A nova requisição tem outro unique_key (a RequestQueue já marcou a original como tratada),
+        montado a partir da chave da primeira tentativa, e entra no fim da fila quando a espera
+        vence (ver `_realimentar`).
+        """
+        if not self.retentativas or not falha_transitoria(status, excecao):
+            return False
+        host = urlparse(request.url).hostname
+        tentativa = request.user_data.get("tentativa", 0) + 1
+        chave_original = request.user_data.get("chave_original", request.unique_key)
+        nova = Request.from_url(
+            url=request.url,
+            label=request.label,
+            unique_key=f"{chave_original}#tentativa{tentativa}",
+            user_data={"doi": request.user_data["doi"], "ordem_doi": request.user_data["ordem_doi"],
+                       "tentativa": tentativa, "chave_original": chave_original},
+        )
+        # o host pode já estar pausado pelo agendador (403/429/503): não volta antes da pausa acabar
+        retry_after = retry_after or self.agendador.pausa_restante(host) or None
+        return self.retentativas.agendar(nova, host, tentativa, retry_after)
+
+    async def _realimentar(self, crawler: HttpCrawler):
+        """Devolve as retentativas vencidas ao crawler e o encerra quando não resta nada (keep_alive)"""
+        gerente = await crawler.get_request_manager()
+
+        async def ocioso():
+            return await gerente.is_finished()
+
+        async for request in self.retentativas.liberar(ocioso):
+            await crawler.add_requests([request])
+        logging.info(self.retentativas.resumo())
+        crawler.stop("Fila e retentativas concluídas")
+
+    async def handle_falha(self, ctx, erro: Exception):
+        """Requisição que falhou no Crawlee (timeout, erro de conexão, status de erro): retentativa ou estado final.
+
+        Também grava o registro da requisição, com o status HTTP ou a classe da exceção.
+        """
+        doi = ctx.request.user_data["doi"]
+        ordem_doi = ctx.request.user_data["ordem_doi"]
+        resp = getattr(ctx, "http_response", None)
+        if isinstance(resp, RespostaPDF):  # baixada mas não tratada: devolve a vaga e apaga o temporário
+            resp.descartar()
+        if ctx.request.label == "pdf":
+            # o download não chegou ao handler: mesmo tratamento de uma resposta de PDF, sem corpo
+            await self._concluir_pdf(None, ctx.request.url, doi, ordem_doi, time.perf_counter(),
+                                     lambda *falha: self._agendar_retentativa(ctx.request, *falha), erro)
+            return
+        status = getattr(erro, "status_code", None)
+        if self._agendar_retentativa(ctx.request, status, erro):
+            resultado = "retentativa agendada"
+        else:
+            resultado = "falhou"
+            self._registrar_estado(doi, "falhou")
+            logging.error(f"[DOI {ordem_doi}] falhou | {ctx.request.url} | {erro}")
+        await self._registrar_requisicao(etapa="unpaywall", doi=doi, host=urlparse(ctx.request.url).hostname,
+                                         http_status=status, estado=resultado, motivo_abortado=type(erro).__name__)
+
+    def _resolver_unpaywall(self, data: dict):
+        """Extrai do JSON da Unpaywall a URL do artigo e se o publisher é Elsevier"""
+        return resolver_unpaywall(data)
+
+    def _request_pdf(self, url_artigo, doi, ordem_doi):
+        return Request.from_url(
+            url=url_artigo,
+            label="pdf",
+            user_data={"doi": doi, "ordem_doi": ordem_doi},
+        )
 
     # ---------------- handlers do crawler ----------------
     async def handle_unpaywall(self, ctx: HttpCrawlingContext):
@@ -77,129 +197,164 @@ class FormatadoCrawler:
         print(f'processando {ctx.request.url}')
 
         t0 = time.perf_counter()
-        
+        pages_scraped_counter.add(1, {"handler": "unpaywall", "status": resp.status_code})
+        with tracer.start_as_current_span("unpaywall") as span:
+            span.set_attributes({"doi": doi, "http.status_code": resp.status_code})
+            resultado = await self._tratar_unpaywall(ctx, resp, doi, ordem_doi)
+            span.set_attribute("resultado", resultado)
+        t_total = time.perf_counter() - t0
+        request_duration_histogram.record(t_total, {"handler": "unpaywall", "resultado": resultado})
+        await self._registrar_requisicao(etapa="unpaywall", doi=doi, host=urlparse(ctx.request.url).hostname,
+                                         http_status=resp.status_code, estado=resultado, t_total=t_total)
+
+    async def _tratar_unpaywall(self, ctx: HttpCrawlingContext, resp, doi, ordem_doi) -> str:
+        """Decide o destino do DOI a partir da resposta da Unpaywall; devolve o resultado para a telemetria"""
+        t0 = time.perf_counter()
+
         if resp.status_code == 404:
+            if self.cache_unpaywall:
+                self.cache_unpaywall.salvar_404(doi)
+            self._registrar_estado(doi, "página unpaywall vazia")
             ctx.log.info(f"[DOI {ordem_doi}] Página Unpaywall Vazia | DOI: {doi}")
-            return
-        
+            return "404"
+        if self._agendar_retentativa(ctx.request, resp.status_code, retry_after=ler_retry_after(resp.headers)):
+            return "retentativa agendada"
+        if resp.status_code != 200:
+            self._registrar_estado(doi, f"requisição unpaywall {resp.status_code}")
+            ctx.log.info(f"[DOI {ordem_doi}] Unpaywall respondeu {resp.status_code} | DOI: {doi}")
+            return f"http {resp.status_code}"
+
         try:
             raw = await resp.read()
             data = json.loads(raw)
         except Exception as e:
+            self._registrar_estado(doi, "json unpaywall falhou")
             ctx.log.info(f"[DOI {ordem_doi}] Falha ao decodificar JSON | DOI: {doi} | Erro: {e}")
-            return
-        
-        best_loc = data.get("best_oa_location") or {}
-        url_artigo = best_loc.get("url_for_pdf") or best_loc.get("url") or data.get("doi_url")
+            return "json inválido"
+
+        if self.cache_unpaywall and resp.status_code == 200:
+            self.cache_unpaywall.salvar(doi, data)
+
+        url_artigo, is_elsevier = self._resolver_unpaywall(data)
         if not url_artigo:
+            self._registrar_estado(doi, "sem pdf")
             ctx.log.info(f"[DOI {ordem_doi}] Nenhum PDF disponível | DOI: {doi}")
-            return
+            return "sem pdf"
         
-        publisher = (data.get("publisher") or "")
-        if "Elsevier" in publisher:
-            async with self.csv_lock:
-                self.csv_writer_elsevier.writerow([url_artigo, doi])
-                self.csv_file_elsevier.flush()
+        if is_elsevier:
+            await self._escrever_elsevier(url_artigo, doi, ordem_doi)
             ctx.log.info(f"[DOI {ordem_doi}] URL Elsevier coletada | {url_artigo}")
-            return
+            return "elsevier"
         
         else:
-            await ctx.add_requests([
-                Request.from_url(
-                    url=url_artigo,
-                    label="pdf",
-                    user_data={"doi": doi, "ordem_doi": ordem_doi},
-                )
-            ], forefront=True)
+            # host ocupado/pausado vai para o fim da fila, para não prender slots enquanto espera
+            host_pdf = urlparse(url_artigo).hostname
+            saturado = self.agendador.saturado(host_pdf)
+            with tracer.start_as_current_span("enfileirar") as span:
+                span.set_attributes({"host": host_pdf or "", "host_saturado": saturado})
+                await ctx.add_requests([self._request_pdf(url_artigo, doi, ordem_doi)], forefront=not saturado)
             t1 = time.perf_counter()
             ctx.log.info(f"[DOI {ordem_doi}] Enfileirado PDF | {url_artigo} | Prep: {t1 - t0:.2f}s")
-            return
+            return "pdf enfileirado"
 
 
     async def handle_pdf(self, ctx: HttpCrawlingContext):
-        """Faz download do PDF e extrai emails."""
-        doi = ctx.request.user_data["doi"]
-        ordem_doi = ctx.request.user_data["ordem_doi"]
+        """Extrai os emails do PDF já baixado em streaming pelo ImpitPDFStreamingClient (ver ProcessamentoPDF)."""
+        resp = ctx.http_response
+        # o handler só roda depois do download: o tempo total soma os dois
+        await self._concluir_pdf(resp, ctx.request.url, ctx.request.user_data["doi"], ctx.request.user_data["ordem_doi"],
+                                 time.perf_counter() - resp.duracao_download,
+                                 lambda *falha: self._agendar_retentativa(ctx.request, *falha))
 
-        inicio_total = time.perf_counter()
+    # ---------------- orquestração ----------------
+    def _buscar_local(self, doi) -> tuple[bool, dict | None]:
+        """Resolve o DOI sem a API: primeiro no índice do snapshot, depois no cache Unpaywall"""
+        if self.indice_snapshot:
+            encontrado, data = self.indice_snapshot.buscar(doi)
+            if encontrado:
+                return True, data
+        if self.cache_unpaywall:
+            return self.cache_unpaywall.buscar(doi)
+        return False, None
+
+    async def _gerar_requests(self, dois, concluidos: set):
+        """Gera sob demanda as requisições iniciais (Unpaywall, ou PDF direto quando a Unpaywall está em cache)"""
+        base = settings.URL_BASE_UNPAYWALL
+        email = self.email_registro_api
+
+        for ordem_doi, doi in enumerate(dois, start=1):
+            if doi in concluidos:
+                continue
+            encontrado, data = self._buscar_local(doi)
+            if encontrado:  # DOI no snapshot ou já resolvido em rodada anterior: pula a chamada à API
+                url_artigo, is_elsevier = self._resolver_unpaywall(data) if data else (None, False)
+                if not url_artigo:
+                    self._registrar_estado(doi, "sem pdf" if data else "página unpaywall vazia")
+                    logging.info(f"[DOI {ordem_doi}] Unpaywall local: sem PDF/404 | DOI: {doi}")
+                elif is_elsevier:
+                    await self._escrever_elsevier(url_artigo, doi, ordem_doi)
+                else:
+                    yield self._request_pdf(url_artigo, doi, ordem_doi)
+                continue
+
+            api_url = f"{base}{doi}?email={email}"
+            yield Request.from_url(
+                url=api_url,
+                label="unpaywall",
+                user_data={"doi": doi, "ordem_doi": ordem_doi},
+            )
 
-        emails_encontrados = 0
-        status = None
-        resp = ctx.http_response
-        body = await resp.read()
-        ct = (resp.headers.get("Content-Type") or "").lower()
+    async def main(self, caminho_planilha_doi: str, save_emails_pdf: str, save_urls_elsevier: str, limite_concorrencia: int = 10, amostra: int | None = 250,
+                   caminho_progresso: str | None = None, tamanho_bloco: int = 10_000, janela_embaralhamento: int = 10_000,
+                   concorrencia_maxima: int | None = None):
+        """Percorre a planilha de DOIs (CSV, Parquet ou Excel) em streaming.
 
+        Os DOIs são lidos em blocos de `tamanho_bloco` e embaralhados numa janela de
+        `janela_embaralhamento` itens; as requisições entram na fila do crawler sob demanda.
+        Com `caminho_progresso` a execução é retomável: DOIs já concluídos são pulados e os CSVs recebem append.
+        `concorrencia_maxima` limita as tarefas simultâneas do crawler (None = autoscaling padrão do Crawlee)
+        """
+        dois = embaralhar_em_janela(ler_dois(caminho_planilha_doi, "DOI", tamanho_bloco), janela_embaralhamento)
+        if amostra is not None:
+            dois = islice(dois, amostra)
 
-        try:
-            is_pdf = ("pdf" in ct) or (len(body) >= 5 and body[:5] == b"%PDF-") # verificação simples de PDF
-            if resp.status_code == 200 and is_pdf:
-                t0 = time.perf_counter()
-                emails = self._processar_pdf(body, ordem_doi)
-                t1 = time.perf_counter()
-
-                emails_encontrados = len(emails)
-                await self._escrever_emails_csv(emails, doi)
-                status = "pdf normal"
-
-                emails_extracted_counter.add(emails_encontrados, {"status": "ok"})
-                pdf_processing_histogram.record(t1 - t0, {"status": "ok"})
-            elif resp.status_code == 404:
-                status = "página vazia"
-                ctx.log.info(f'ERRO | [DOI {ordem_doi}] | Página vazia | {ctx.request.url}')
-            elif resp.status_code == 403:
-                status = f"requisição {resp.status_code}"
-                ctx.log.info(f'ERRO | [DOI {ordem_doi}] | Requisição falhou | {ctx.request.url}')
-            elif resp.status_code == 200:
-                status = "não é pdf"
-            else:
-                status = f"requisição {resp.status_code}"
-
-        except ssl.SSLCertVerificationError as e:
-            # Com ImpitHttpClient isso é raro; se quiser implementar fallback custom, você pode fazê-lo aqui.
-            status = "ssl verification error"
+        retomar = caminho_progresso is not None
+        concluidos = set()
+        if retomar:
+            self.progresso = DiarioProgresso(caminho_progresso)
+            concluidos = self.progresso.concluidos()
+            logging.info(f"Retomando execução: {len(concluidos)} DOIs já concluídos serão pulados")
 
-        except Exception as e:
-            status = "processamento falhou"
-            print(f'{e}')
-
-        host_name = urlparse(ctx.request.url).hostname
-        fim_total = time.perf_counter()
-        request_duration_histogram.record(fim_total - inicio_total, {"handler": "pdf"})
-
-        ctx.log.info(
-            f'[DOI {ordem_doi}] | '
-            f'Status: {status} | '
-            f'Emails encontrados: {emails_encontrados or 0} | '
-            f'Host: {host_name} | '
-            f'Total: {fim_total - inicio_total:.2f}s | '
-            f'DOI: {doi}'
-        )
-    
-    # ---------------- orquestração ----------------
-    async def main(self, caminho_planilha_doi: str, save_emails_pdf: str, save_urls_elsevier: str, limite_concorrencia: int = 10, amostra: int = 250):
-        planilha_doi = pd.read_excel(caminho_planilha_doi)
-        dois = planilha_doi["DOI"].sample(frac=1, random_state=42).reset_index(drop=True)
-
-        import csv
-        with open(save_emails_pdf, "w", newline="", encoding="utf-8") as f_pdf, \
-             open(save_urls_elsevier, "w", newline="", encoding='utf-8') as f_elsevier:
-            self.csv_file_pdf = f_pdf
-            self.csv_writer_pdf = csv.writer(f_pdf)
-            self.csv_writer_pdf.writerow(["emails", "doi"])
-            self.csv_file_elsevier = f_elsevier
-            self.csv_writer_elsevier = csv.writer(f_elsevier)
-            self.csv_writer_elsevier.writerow(["urls elsevier", "doi"])
+        # saídas gravadas em lote por tarefas dedicadas (formato pela extensão: .csv, .jsonl ou .parquet)
+        async with EscritorLotes(abrir_saida(save_emails_pdf, COLUNAS_EMAILS_PDF, retomar)) as self.saida_pdf, \
+                   EscritorLotes(abrir_saida(save_urls_elsevier, ["urls elsevier", "doi"], retomar)) as self.saida_elsevier:
 
             # HTTP client com impersonation (Chrome por padrão), HTTP/3 habilitado
-            http_client = ImpitHttpClient(
+            # PDFs são baixados em streaming (sniff de %PDF-, limite de tamanho e spool em disco)
+            http_client = ImpitPDFStreamingClient(
                 browser="chrome",
                 http3=True,
                 verify=True,
+                max_bytes=self.max_bytes_pdf,
+                limiar_disco=self.limiar_disco_pdf,
+                cache_pdf=self.cache_pdf,
+                agendador=self.agendador,
+                confianca_tls=self.confianca_tls,
+                backend_pdf=self.backend_pdf,  # a vaga de extração é reservada antes do download
             )
 
+            # fila alimentada preguiçosamente pelo gerador; PDFs enfileirados vão para a RequestQueue do tandem
+            request_list = RequestList(self._gerar_requests(dois, concluidos))
             crawler = HttpCrawler(
                 http_client=http_client,
-                max_request_retries=0
+                request_manager=await request_list.to_tandem(),
+                max_request_retries=0,  # retentativas imediatas não ajudam em 429/5xx; ver self.retentativas
+                ignore_http_error_status_codes=STATUS_TRATADOS_NO_HANDLER,
+                retry_on_blocked=False,  # 429/503 seguem para a retentativa adiada, não para rotação de sessão
+                keep_alive=self.retentativas is not None,  # quem encerra é o _realimentar
+                concurrency_settings=ConcurrencySettings(max_concurrency=concorrencia_maxima,
+                                                         desired_concurrency=concorrencia_maxima)
+                if concorrencia_maxima else None,
             )
 
             router = crawler.router
@@ -217,31 +372,50 @@ class FormatadoCrawler:
             async def _default(ctx: HttpCrawlingContext):
                 ctx.log.info(f'Processing {ctx.request.url}')
 
-            # Seeda a fila com as chamadas da Unpaywall
-            start_requests = []
-            base = settings.URL_BASE_UNPAYWALL
-            email = self.email_registro_api
-
-            for ordem_doi, doi in enumerate(dois.head(amostra), start=1):
-                api_url = f"{base}{doi}?email={email}"
-                start_requests.append(
-                    Request.from_url(
-                        url=api_url,
-                        label="unpaywall",
-                        user_data={"doi": doi, "ordem_doi": ordem_doi},
-                    )
-                )
-
-            await crawler.run(start_requests)
+            @crawler.failed_request_handler
+            async def _falhou(ctx, erro: Exception):
+                await self.handle_falha(ctx, erro)
+
+            if self.fila_ocr:
+                await self.fila_ocr.iniciar(retomar, self._registrar_estado)
+            if self.caminho_registros:
+                self.registros = await RegistroRequisicoes(self.caminho_registros, retomar).__aenter__()
+            realimentacao = asyncio.create_task(self._realimentar(crawler)) if self.retentativas else None
+            try:
+                await crawler.run()
+            finally:
+                if realimentacao and not realimentacao.done():
+                    realimentacao.cancel()
+                if self.registros:
+                    await self.registros.__aexit__(None, None, None)
+                if self.fila_ocr:
+                    await self.fila_ocr.fechar()
+                self.backend_pdf.fechar()
+                if self.cache_unpaywall:
+                    logging.info(f"Cache Unpaywall: {self.cache_unpaywall.hits} hits | {self.cache_unpaywall.misses} chamadas à API")
+                    self.cache_unpaywall.fechar()
+                if self.indice_snapshot:
+                    self.indice_snapshot.fechar()
+                if self.cache_pdf:
+                    logging.info(f"Cache PDF: {self.cache_pdf.hits} hits | {self.cache_pdf.misses} misses")
+                    self.cache_pdf.fechar()
+                if self.confianca_tls:
+                    self.confianca_tls.fechar()
+
+        # o diário fecha depois dos escritores, que ainda registram estados ao esvaziar a fila
+        if self.progresso:
+            self.progresso.fechar()
 
 
 # ---------------- Programa ----------------
 if __name__ == "__main__":
+    configurar_logging()
     caminho_planilha_doi = settings.CAMINHO_PLANILHA_DOI
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     save_emails_pdf = fr"C:\Users\emails_coletados_pdf_{timestamp}.csv"
     save_urls_elsevier = fr"C:\Users\urls_coletadas_elsevier{timestamp}.csv"
-    scrap = FormatadoCrawler()
+    scrap = FormatadoCrawler(caminho_cache_unpaywall="cache_unpaywall.sqlite", caminho_cache_pdf="cache_pdf.sqlite",
+                             caminho_cache_tls="cache_tls.sqlite", retentativas=FilaRetentativas())
 
     inicio_codigo = time.perf_counter()
     try:
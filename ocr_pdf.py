@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from extrator_emails import extrair_emails_texto
+from escritor_resultados import EscritorLotes, abrir_saida
+
+
+def _baixar_prioridade():
+    """Initializer do worker de OCR: menor prioridade de CPU, para não competir com a coleta"""
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):  # Windows não tem os.nice
+        pass
+
+
+def ocr_primeira_pagina(pagina_pdf: bytes, idioma: str = "eng", dpi: int = 200) -> list[str]:
+    """OCR local (Tesseract, via PyMuPDF) de um PDF de uma página; retorna os emails encontrados.
+
+    Função de módulo para rodar no ProcessPoolExecutor da FilaOCR.
+    """
+    import pymupdf as fitz
+    with fitz.open(stream=pagina_pdf, filetype="pdf") as doc:
+        page = doc[0]
+        textpage = page.get_textpage_ocr(language=idioma, dpi=dpi, full=True)
+        return extrair_emails_texto(page.get_text(textpage=textpage) or "")
+
+
+class FilaOCR:
+    """Fila de baixa prioridade para OCR da 1ª página de PDFs somente imagem.
+
+    Roda à parte da coleta: `enviar` nunca espera (se a fila estiver cheia o documento é
+    descartado e contado em `descartados`), e o OCR roda num único processo com `nice`
+    máximo. Os emails vão para `caminho_saida` (colunas emails/doi/estado) e o DOI é registrado
+    como "pdf ocr" no diário depois de gravado. Ao fim da coleta, `esperar_no_fim=False`
+    descarta o que ainda estiver na fila em vez de esperar o OCR.
+
+    Precisa do Tesseract instalado (PyMuPDF o chama pelo TESSDATA_PREFIX); se o OCR falhar
+    por falta dele, a fila se desativa e só loga.
+    """
+
+    def __init__(self, caminho_saida: str, max_fila: int = 1000, workers: int = 1, idioma: str = "eng", dpi: int = 200,
+                 esperar_no_fim: bool = True):
+        self.caminho_saida = caminho_saida
+        self.esperar_no_fim = esperar_no_fim
+        self.idioma = idioma
+        self.dpi = dpi
+        self.workers = workers
+        self.fila = asyncio.Queue(maxsize=max_fila)
+        self.enviados = 0
+        self.descartados = 0
+        self.processados = 0
+        self.com_emails = 0
+        self.ativa = True
+
+        self.saida = None             # EscritorLotes dos emails do OCR (criado no iniciar)
+        self.registrar_estado = None  # callback (doi, estado) do pipeline
+        self._executor = None
+        self._tarefas = []
+
+    async def iniciar(self, retomar: bool = False, registrar_estado=None):
+        self.saida = EscritorLotes(abrir_saida(self.caminho_saida, ["emails", "doi", "estado"], retomar))
+        await self.saida.__aenter__()
+        self.registrar_estado = registrar_estado
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_baixar_prioridade)
+        self._tarefas = [asyncio.create_task(self._loop()) for _ in range(self.workers)]
+
+    def enviar(self, pagina_pdf: bytes | None, doi: str, ordem_doi: int):
+        if not self.ativa or pagina_pdf is None:
+            return
+        try:
+            self.fila.put_nowait((pagina_pdf, doi, ordem_doi))
+            self.enviados += 1
+        except asyncio.QueueFull:
+            self.descartados += 1
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.fila.get()
+            if item is None:
+                return
+            pagina_pdf, doi, ordem_doi = item
+            if not self.ativa:
+                continue
+            try:
+                emails = await loop.run_in_executor(self._executor, ocr_primeira_pagina, pagina_pdf, self.idioma, self.dpi)
+            except Exception as e:
+                if "tesseract" in str(e).lower() or "tessdata" in str(e).lower():
+                    self.ativa = False
+                    logging.warning(f"OCR desativado (Tesseract indisponível): {e}")
+                else:
+                    logging.error(f"OCR falhou (DOI {ordem_doi}): {e}")
+                continue
+            self.processados += 1
+            self.com_emails += bool(emails)
+            logging.info(f"[DOI {ordem_doi}] OCR: {len(emails)} e-mails | DOI: {doi}")
+            depois = (lambda d=doi: self.registrar_estado(d, "pdf ocr")) if self.registrar_estado else None
+            await self.saida.escrever_muitas(([email, doi, "pdf ocr"] for email in emails), depois=depois)
+
+    async def fechar(self):
+        """Encerra a fila e a saída; processa o que já foi enfileirado, ou descarta sem `esperar_no_fim`"""
+        if not self.esperar_no_fim:
+            while not self.fila.empty():
+                self.fila.get_nowait()
+                self.descartados += 1
+        for _ in self._tarefas:
+            await self.fila.put(None)
+        await asyncio.gather(*self._tarefas)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        await self.saida.fechar()
+        logging.info(f"Fila OCR: {self.enviados} enviados | {self.processados} processados | "
+                     f"{self.com_emails} com emails | {self.descartados} descartados")
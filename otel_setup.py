@@ -0,0 +1,103 @@
+import os
+import atexit
+import logging
+from contextlib import contextmanager
+
+
+NOME_SERVICO = os.environ.get("OTEL_SERVICE_NAME", "scrap-emails")
+
+
+# ---------------- no-op (sem opentelemetry instalado) ----------------
+class _SpanNoop:
+    def set_attribute(self, chave, valor):
+        pass
+
+    def set_attributes(self, atributos):
+        pass
+
+    def record_exception(self, excecao, *args, **kwargs):
+        pass
+
+    def set_status(self, *args, **kwargs):
+        pass
+
+
+class _TracerNoop:
+    @contextmanager
+    def start_as_current_span(self, nome, *args, **kwargs):
+        yield _SpanNoop()
+
+
+class _InstrumentoNoop:
+    def add(self, valor, atributos=None):
+        pass
+
+    def record(self, valor, atributos=None):
+        pass
+
+
+class _MeterNoop:
+    def create_counter(self, *args, **kwargs):
+        return _InstrumentoNoop()
+
+    def create_histogram(self, *args, **kwargs):
+        return _InstrumentoNoop()
+
+
+def _configurar():
+    """Tracer e meter do OpenTelemetry.
+
+    Só exporta se houver coletor configurado (OTEL_EXPORTER_OTLP_ENDPOINT) e o SDK com o
+    exportador OTLP estiver instalado; caso contrário usa os providers no-op da API, ou
+    os objetos no-op deste módulo quando nem a API está instalada. Devolve também a
+    função que esvazia os exportadores no fim do processo.
+    """
+    try:
+        from opentelemetry import trace, metrics
+    except ImportError:
+        return _TracerNoop(), _MeterNoop(), lambda: None
+
+    if not os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return trace.get_tracer(NOME_SERVICO), metrics.get_meter(NOME_SERVICO), lambda: None
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+    except ImportError:
+        logging.warning("OTEL_EXPORTER_OTLP_ENDPOINT definido, mas o SDK/exportador OTLP não está instalado: telemetria desativada")
+        return trace.get_tracer(NOME_SERVICO), metrics.get_meter(NOME_SERVICO), lambda: None
+
+    recurso = Resource.create({"service.name": NOME_SERVICO})
+    tracer_provider = TracerProvider(resource=recurso)
+    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # endpoint lido das variáveis OTEL_*
+    meter_provider = MeterProvider(resource=recurso, metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter())])
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(meter_provider)
+
+    def desligar():
+        tracer_provider.shutdown()
+        meter_provider.shutdown()
+
+    logging.info(f"Telemetria OTLP ativa: {os.environ['OTEL_EXPORTER_OTLP_ENDPOINT']}")
+    return trace.get_tracer(NOME_SERVICO), metrics.get_meter(NOME_SERVICO), desligar
+
+
+tracer, meter, desligar = _configurar()
+atexit.register(desligar)  # esvazia os spans/métricas pendentes ao sair
+
+# ---------------- métricas ----------------
+pages_scraped_counter = meter.create_counter(
+    "pages_scraped", unit="1", description="Respostas processadas pelos handlers (Unpaywall, PDF, Elsevier)")
+emails_extracted_counter = meter.create_counter(
+    "emails_extracted", unit="1", description="Emails extraídos")
+bytes_downloaded_counter = meter.create_counter(
+    "bytes_downloaded", unit="By", description="Bytes de PDF baixados")
+pdf_processing_histogram = meter.create_histogram(
+    "pdf_processing_duration", unit="s", description="Tempo de extração do texto/emails do PDF")
+request_duration_histogram = meter.create_histogram(
+    "request_duration", unit="s", description="Duração de cada etapa (atributo 'handler')")
@@ -0,0 +1,515 @@
+import time
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from itertools import islice
+from urllib.parse import urlparse
+import settings
+from backend_pdf import BackendExtracao
+from cache_unpaywall import CacheUnpaywall
+from snapshot_unpaywall import IndiceSnapshotUnpaywall
+from cache_pdf import CachePDF
+from agendador_hosts import AgendadorHosts, ler_retry_after
+from entrada_dois import ler_dois, embaralhar_em_janela
+from progresso import DiarioProgresso
+from escritor_resultados import EscritorLotes, abrir_saida
+from registros import RegistroRequisicoes
+from retentativas import falha_transitoria
+from otel_setup import tracer, pages_scraped_counter, emails_extracted_counter, pdf_processing_histogram, request_duration_histogram
+
+
+# ---------------- regras comuns aos pipelines ----------------
+# saída de emails dos PDFs: o estado acompanha cada linha (ex.: "pdf somente imagem" vai para o OCR)
+COLUNAS_EMAILS_PDF = ["emails", "doi", "estado"]
+
+
+def resolver_unpaywall(data: dict):
+    """Extrai do JSON da Unpaywall a URL do artigo e se o publisher é Elsevier"""
+    best_loc = data.get("best_oa_location") or {}
+    url_artigo = best_loc.get("url_for_pdf") or best_loc.get("url") or data.get("doi_url")
+    is_elsevier = "Elsevier" in (data.get("publisher") or "")
+    return url_artigo, is_elsevier
+
+
+def estado_resposta_pdf(resp) -> str:
+    """Estado terminal de um download de PDF que não veio do cache (RespostaPDF)."""
+    if resp.status_code == 200 and resp.is_pdf:
+        return "pdf fallback" if resp.tls_fallback else "pdf normal"
+    if resp.status_code == 404:
+        return "página vazia"
+    if resp.status_code == 200 and resp.motivo_abortado == "tamanho excedido":
+        return "pdf muito grande"
+    if resp.status_code == 200:
+        return "não é pdf"
+    return f"requisição {resp.status_code}"
+
+
+async def iterar_dois(dois):
+    """Itera um iterável de DOIs comum ou assíncrono (ex.: FilaCompartilhada.iterar_async)."""
+    if hasattr(dois, "__aiter__"):
+        async for doi in dois:
+            yield doi
+    else:
+        for doi in dois:
+            yield doi
+
+
+class ProcessamentoPDF:
+    """Tratamento da resposta de um download de PDF, comum ao FormatadoCrawler e ao PipelinePDF.
+
+    Cada um faz o download do seu jeito (slot do host, transporte, TLS) e entrega a
+    RespostaPDF, ou a exceção do download, a `_concluir_pdf`: cache/304, extração,
+    PDF somente imagem -> OCR, retentativa adiada, saída, diário e registro da requisição.
+
+    Quem herda fornece `backend_pdf`, `cache_pdf`, `fila_ocr`, `saida_pdf`, `progresso`,
+    `registros` e `nome_transporte`.
+    """
+
+    nome_transporte = None
+
+    def _registrar_estado(self, doi, estado):
+        """Grava o estado terminal do DOI no diário de progresso (se houver)"""
+        if self.progresso:
+            self.progresso.registrar(doi, estado)
+
+    async def _registrar_requisicao(self, **campos):
+        """Registro estruturado da requisição (ver registros.CAMPOS), se ativado"""
+        if self.registros:
+            await self.registros.registrar(transporte=self.nome_transporte, **campos)
+
+    async def _escrever_emails(self, emails, doi, estado):
+        """Enfileira os emails no escritor; o estado do DOI só vai para o diário depois de gravados.
+
+        PDF somente imagem sem emails ganha uma linha sem email, para a marcação chegar à saída.
+        """
+        linhas = [[email, doi, estado] for email in emails]
+        if not linhas and estado == "pdf somente imagem":
+            linhas = [["", doi, estado]]
+        await self.saida_pdf.escrever_muitas(linhas, depois=lambda: self._registrar_estado(doi, estado))
+
+    def _salvar_cache_pdf(self, url, resp, emails):
+        if self.cache_pdf and resp.hash_conteudo:
+            self.cache_pdf.salvar(resp.hash_conteudo, emails, url,
+                                  etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+
+    async def _extrair_resposta_pdf(self, resp, url, doi, ordem_doi) -> tuple[str, list[str], float]:
+        """(estado, emails, segundos de extração) de uma resposta baixada"""
+        if resp.status_code == 304 and self.cache_pdf and not resp.hash_conteudo:
+            resp.hash_conteudo = self.cache_pdf.hash_da_url(url)
+
+        # PDF idêntico (mesmo hash) ou URL revalidada com 304: reaproveita os emails sem processar
+        emails_cache = self.cache_pdf.buscar(resp.hash_conteudo) if self.cache_pdf and resp.hash_conteudo else None
+        if resp.status_code in (200, 304) and emails_cache is not None:
+            if resp.status_code == 200:  # nova URL para um conteúdo já conhecido
+                self._salvar_cache_pdf(url, resp, emails_cache)
+            return "pdf em cache", emails_cache, 0.0
+        if not resp.is_pdf:
+            return estado_resposta_pdf(resp), [], 0.0
+
+        t0 = time.perf_counter()
+        with tracer.start_as_current_span("parse_pdf") as span_parse:
+            span_parse.set_attribute("bytes", resp.tamanho)
+            resultado = await self.backend_pdf.extrair(resp.origem, reservado=resp.liberar_vaga is not None)
+            span_parse.set_attribute("emails", len(resultado.emails))
+        t_parse = time.perf_counter() - t0
+        pdf_processing_histogram.record(t_parse, {"status": "ok"})
+        logging.info(
+            f"Extração PDF concluída - {len(resultado.emails)} e-mails | "
+            f"Páginas lidas: {resultado.paginas_lidas}/{resultado.paginas_totais} "
+            f"{'(somente imagem) ' if resultado.somente_imagem else ''}(DOI {ordem_doi})"
+        )
+        if resultado.somente_imagem:  # sem camada de texto: marca em vez de um zero silencioso
+            # fora do cache: um hit ou 304 depois perderia a marcação e o envio ao OCR
+            if self.fila_ocr:
+                self.fila_ocr.enviar(resultado.pagina_ocr, doi, ordem_doi)
+            return "pdf somente imagem", resultado.emails, t_parse
+        self._salvar_cache_pdf(url, resp, resultado.emails)
+        return estado_resposta_pdf(resp), resultado.emails, t_parse
+
+    async def _concluir_pdf(self, resp, url, doi, ordem_doi, inicio_total: float, reagendar=None, erro=None) -> str:
+        """Leva o download (`resp`, ou a exceção `erro` com `resp` None) até o estado final do DOI.
+
+        `inicio_total` é o perf_counter do início da etapa, incluindo a espera pelo slot do host;
+        `reagendar(status, excecao, retry_after)` adia uma nova tentativa e devolve False se a
+        falha é definitiva (None = sem retentativas). Devolve o estado.
+        """
+        host = urlparse(url).hostname
+        http_status = resp.status_code if resp is not None else getattr(erro, "status_code", None)
+        emails, t_parse = [], 0.0
+        with tracer.start_as_current_span("pdf") as span:
+            span.set_attributes({"doi": doi, "host": host or "", "transporte": self.nome_transporte})
+            try:
+                if resp is None:
+                    span.record_exception(erro)
+                    status = f"requisição {http_status}" if http_status else "download falhou"
+                    logging.error(f"Erro baixando PDF (DOI {ordem_doi}): {erro}")
+                else:
+                    pages_scraped_counter.add(1, {"handler": "pdf", "status": resp.status_code})
+                    span.set_attributes({"http.status_code": resp.status_code, "bytes": resp.tamanho})
+                    status, emails, t_parse = await self._extrair_resposta_pdf(resp, url, doi, ordem_doi)
+            except Exception as e:
+                span.record_exception(e)
+                status, emails = "processamento falhou", []
+                logging.error(f"Erro processando PDF (DOI {ordem_doi}): {e}")
+            finally:
+                if resp is not None:
+                    resp.descartar()  # apaga o arquivo temporário do PDF, se houver
+
+            # timeout, 429, 5xx: nova tentativa adiada, no fim da fila; o DOI só vai para o diário no final
+            if reagendar and (status == "download falhou" or status.startswith("requisição ")) and reagendar(
+                    http_status, erro, ler_retry_after(resp.headers) if resp is not None else None):
+                status = "retentativa agendada"
+            span.set_attributes({"status": status, "emails": len(emails)})
+            if status != "retentativa agendada":
+                await self._escrever_emails(emails, doi, status)
+
+        if emails:
+            emails_extracted_counter.add(len(emails), {"origem": "pdf", "status": status})
+        t_total = time.perf_counter() - inicio_total
+        request_duration_histogram.record(t_total, {"handler": "pdf", "status": status,
+                                                    "transporte": self.nome_transporte})
+        await self._registrar_requisicao(
+            etapa="pdf", doi=doi, host=host, http_status=http_status, estado=status, emails=len(emails),
+            bytes=resp.tamanho if resp else 0, t_download=resp.duracao_download if resp else None,
+            t_parse=t_parse, t_total=t_total, tls_fallback=resp.tls_fallback if resp else None,
+            motivo_abortado=resp.motivo_abortado if resp else type(erro).__name__ if erro else None,
+        )
+        logging.info(
+            f'[DOI {ordem_doi}] | '
+            f'Status: {status} | '
+            f'Emails encontrados: {len(emails)} | '
+            f'Host: {host} | '
+            f'Bytes: {resp.tamanho if resp else 0} | '
+            f'Total: {t_total:.2f}s | '
+            f'DOI: {doi}'
+        )
+        return status
+
+
+# ---------------- pipeline ----------------
+class PipelinePDF(ProcessamentoPDF):
+    """Unpaywall -> PDF -> emails com o transporte HTTP escolhido em tempo de execução.
+
+    O transporte (ver transportes.py: aiohttp ou impit) só faz as requisições; estados,
+    caches, agendador por host, extração e saídas são os mesmos para qualquer um, o que
+    permite comparar os dois nas mesmas entradas. Os estados e as colunas de saída são
+    os do FormatadoCrawler.
+
+    `concorrencia` tarefas consomem os DOIs; cada consulta à Unpaywall e cada download
+    ocupa um slot global. O download espera primeiro o slot do host e depois o global,
+    então um host lento não prende slots globais. A extração roda no BackendExtracao.
+    """
+
+    def __init__(self, transporte, modo_extracao: str = "processo", workers_extracao: int | None = None,
+                 max_pdfs_pendentes: int | None = None, primeiras_paginas: int | None = 2, ultimas_paginas: int | None = 1,
+                 caminho_cache_unpaywall: str | None = None, ttl_cache_unpaywall: float = 7 * 24 * 3600,
+                 caminho_cache_pdf: str | None = None, max_entradas_cache_pdf: int = 200_000,
+                 limite_por_host: int = 2, limite_max_por_host: int = 8, caminho_indice_snapshot: str | None = None,
+                 fila_ocr=None, caminho_registros: str | None = None, retentativas=None):
+        self.transporte = transporte
+        self.email_registro_api = settings.EMAIL_REGISTRO_API
+        self.backend_pdf = BackendExtracao(modo_extracao, max_workers=workers_extracao, max_pendentes=max_pdfs_pendentes,
+                                           primeiras_paginas=primeiras_paginas, ultimas_paginas=ultimas_paginas,
+                                           pagina_ocr=fila_ocr is not None)
+        # FilaOCR (ocr_pdf.py) para a 1ª página dos PDFs somente imagem (None = só marca o estado)
+        self.fila_ocr = fila_ocr
+        # registro estruturado por requisição (.jsonl/.parquet; ver registros.py)
+        self.caminho_registros = caminho_registros
+        # FilaRetentativas (retentativas.py) para timeouts/429/5xx; None = falha fica para a próxima execução
+        self.retentativas = retentativas
+        self.cache_unpaywall = CacheUnpaywall(caminho_cache_unpaywall, ttl_cache_unpaywall) if caminho_cache_unpaywall else None
+        # índice do snapshot da Unpaywall (snapshot_unpaywall.py); a API só é chamada nos misses
+        self.indice_snapshot = IndiceSnapshotUnpaywall(caminho_indice_snapshot) if caminho_indice_snapshot else None
+        self.cache_pdf = CachePDF(caminho_cache_pdf, max_entradas_cache_pdf) if caminho_cache_pdf else None
+        self.agendador = AgendadorHosts(limite_inicial=limite_por_host, limite_max=limite_max_por_host)
+
+        # runtime state
+        self.sem = None             # limite global (criado no main)
+        self.saida_pdf = None       # EscritorLotes dos emails
+        self.saida_elsevier = None  # EscritorLotes das URLs Elsevier (None = só registra o estado)
+        self.progresso = None
+        self.registros = None       # RegistroRequisicoes (None = desativado)
+        self._downloads = set()     # tarefas de download/extração em andamento
+        self._pendentes = None      # limita quantas tarefas de download podem existir
+        self._ocupados = 0          # consumidores processando um DOI
+        self._entrada_esgotada = False
+
+    # ---------------- utilidades ----------------
+    @property
+    def nome_transporte(self):
+        return self.transporte.nome
+
+    async def _escrever_elsevier(self, url_artigo, doi):
+        if self.saida_elsevier is None:
+            self._registrar_estado(doi, "elsevier")
+            return
+        await self.saida_elsevier.escrever([url_artigo, doi], depois=lambda: self._registrar_estado(doi, "elsevier"))
+
+    # ---------------- etapas ----------------
+    async def _consultar_unpaywall(self, doi, ordem_doi) -> tuple[str | None, dict | None]:
+        """(estado terminal, dados); estado None quando há dados para seguir"""
+        if self.indice_snapshot:
+            encontrado, data = self.indice_snapshot.buscar(doi)
+            if encontrado:
+                return None, data
+        if self.cache_unpaywall:
+            encontrado, data = self.cache_unpaywall.buscar(doi)
+            if encontrado:
+                return (None, data) if data else ("página unpaywall vazia", None)
+
+        api_url = f"{settings.URL_BASE_UNPAYWALL}{doi}?email={self.email_registro_api}"
+        t0 = time.perf_counter()
+        with tracer.start_as_current_span("unpaywall") as span:
+            span.set_attributes({"doi": doi, "transporte": self.transporte.nome})
+            async with self.sem:
+                t_download = time.perf_counter()
+                status, data = await self.transporte.obter_json(api_url)
+                t_download = time.perf_counter() - t_download
+            span.set_attribute("http.status_code", status)
+        t_total = time.perf_counter() - t0
+        pages_scraped_counter.add(1, {"handler": "unpaywall", "status": status})
+        request_duration_histogram.record(t_total, {"handler": "unpaywall", "transporte": self.transporte.nome})
+        estado = "página unpaywall vazia" if status == 404 else "json unpaywall falhou" if data is None else "ok"
+        await self._registrar_requisicao(etapa="unpaywall", doi=doi, host=urlparse(api_url).hostname, http_status=status,
+                                         estado=estado, t_download=t_download, t_total=t_total)
+
+        if status == 404:
+            if self.cache_unpaywall:
+                self.cache_unpaywall.salvar_404(doi)
+            return "página unpaywall vazia", None
+        if falha_transitoria(status):
+            return f"requisição unpaywall {status}", None
+        if data is None:
+            logging.info(f"[DOI {ordem_doi}] Falha ao decodificar JSON ({status}) | DOI: {doi}")
+            return "json unpaywall falhou", None
+        if self.cache_unpaywall and status == 200:
+            self.cache_unpaywall.salvar(doi, data)
+        return None, data
+
+    def _agendar_retentativa(self, item, host, tentativa, status=None, excecao=None, retry_after=None) -> bool:
+        """Adia uma nova tentativa de uma falha transitória; False se a falha é definitiva"""
+        if not self.retentativas or not falha_transitoria(status, excecao):
+            return False
+        # o host pode já estar pausado pelo agendador (403/429/503): não volta antes da pausa acabar
+        retry_after = retry_after or self.agendador.pausa_restante(host) or None
+        return self.retentativas.agendar(item, host, tentativa, retry_after)
+
+    async def _processar_doi(self, doi, ordem_doi, tentativa=0):
+        host_api = urlparse(settings.URL_BASE_UNPAYWALL).hostname
+        try:
+            estado, data = await self._consultar_unpaywall(doi, ordem_doi)
+        except Exception as e:
+            if self._agendar_retentativa(("doi", doi, ordem_doi, tentativa + 1), host_api, tentativa + 1, excecao=e):
+                return
+            self._registrar_estado(doi, "falhou")
+            logging.error(f"Erro consultando a Unpaywall (DOI {doi}): {e}")
+            return
+        if estado:
+            if estado.startswith("requisição unpaywall") and self._agendar_retentativa(
+                    ("doi", doi, ordem_doi, tentativa + 1), host_api, tentativa + 1, status=int(estado.rsplit(" ", 1)[1])):
+                return
+            self._registrar_estado(doi, estado)
+            logging.info(f"[DOI {ordem_doi}] {estado} | DOI: {doi}")
+            return
+
+        url_artigo, is_elsevier = resolver_unpaywall(data)
+        if not url_artigo:
+            self._registrar_estado(doi, "sem pdf")
+            return
+        if is_elsevier:
+            await self._escrever_elsevier(url_artigo, doi)
+            logging.info(f"[DOI {ordem_doi}] URL Elsevier coletada | {url_artigo}")
+            return
+
+        await self._iniciar_download(url_artigo, doi, ordem_doi)
+
+    async def _iniciar_download(self, url, doi, ordem_doi, tentativa=0):
+        # o download segue em outra tarefa: o consumidor já passa ao próximo DOI
+        await self._pendentes.acquire()
+        tarefa = asyncio.create_task(self._processar_pdf(url, doi, ordem_doi, tentativa))
+        self._downloads.add(tarefa)
+        tarefa.add_done_callback(self._download_concluido)
+
+    def _download_concluido(self, tarefa):
+        self._downloads.discard(tarefa)
+        self._pendentes.release()
+
+    async def _processar_pdf(self, url, doi, ordem_doi, tentativa=0):
+        inicio_total = time.perf_counter()
+        host = urlparse(url).hostname
+        resp, erro = None, None
+        try:
+            headers = self.cache_pdf.validadores(url) if self.cache_pdf else {}
+            async with self.agendador.slot(host), self.sem:  # primeiro o host, depois o global
+                # vaga de extração antes do download: o PDF só chega à memória se houver vez para extraí-lo
+                liberar_vaga = await self.backend_pdf.reservar()
+                inicio = time.perf_counter()
+                try:
+                    resp = await self.transporte.baixar_pdf(url, headers)
+                except BaseException as e:  # inclui cancelamento
+                    liberar_vaga()
+                    if isinstance(e, Exception) and falha_transitoria(excecao=e):
+                        # timeout/conexão também conta contra o host
+                        self.agendador.registrar(host, None, time.perf_counter() - inicio)
+                    raise
+                resp.reter_vaga(liberar_vaga)
+                self.agendador.registrar(host, resp.status_code, time.perf_counter() - inicio,
+                                         retry_after=ler_retry_after(resp.headers))
+        except Exception as e:
+            erro = e
+
+        def reagendar(status, excecao, retry_after):
+            return self._agendar_retentativa(("pdf", url, doi, ordem_doi, tentativa + 1), host, tentativa + 1,
+                                             status, excecao, retry_after)
+
+        await self._concluir_pdf(resp, url, doi, ordem_doi, inicio_total, reagendar, erro)
+
+    async def _consumir(self, fila: asyncio.Queue):
+        while True:
+            item = await fila.get()
+            if item is None:
+                return
+            self._ocupados += 1
+            try:
+                await self._processar_doi(*item)
+            finally:
+                self._ocupados -= 1
+
+    async def _realimentar(self, fila: asyncio.Queue):
+        """Devolve as retentativas vencidas ao fim da fila (DOIs) ou aos downloads (PDFs)"""
+        async def ocioso():
+            return self._entrada_esgotada and fila.empty() and not self._ocupados and not self._downloads
+
+        async for item in self.retentativas.liberar(ocioso):
+            if item[0] == "doi":
+                await fila.put(item[1:])
+            else:
+                await self._iniciar_download(*item[1:])
+
+    # ---------------- orquestração ----------------
+    async def main(self, caminho_planilha_doi: str, save_emails_pdf: str, save_urls_elsevier: str | None = None,
+                   concorrencia: int = 10, amostra: int | None = None, caminho_progresso: str | None = None,
+                   tamanho_bloco: int = 10_000, janela_embaralhamento: int = 10_000):
+        """Percorre a planilha de DOIs em streaming (como o FormatadoCrawler.main).
+
+        Sem `save_urls_elsevier` os DOIs Elsevier só são registrados no diário.
+        """
+        dois = embaralhar_em_janela(ler_dois(caminho_planilha_doi, "DOI", tamanho_bloco), janela_embaralhamento)
+        if amostra is not None:
+            dois = islice(dois, amostra)
+
+        retomar = caminho_progresso is not None
+        concluidos = set()
+        if retomar:
+            self.progresso = DiarioProgresso(caminho_progresso)
+            concluidos = self.progresso.concluidos()
+            logging.info(f"Retomando execução: {len(concluidos)} DOIs já concluídos serão pulados")
+        await self.processar(dois, save_emails_pdf, save_urls_elsevier, concorrencia, concluidos, retomar)
+
+    async def processar(self, dois, save_emails_pdf: str, save_urls_elsevier: str | None = None, concorrencia: int = 10,
+                        concluidos: set | frozenset = frozenset(), retomar: bool = False):
+        """Processa um iterável de DOIs já pronto (planilha, shard ou fila compartilhada), comum ou assíncrono.
+
+        Os estados vão para `self.progresso` (qualquer objeto com `registrar`/`fechar`), que é
+        fechado no final; com `retomar` as saídas recebem append.
+        """
+        self.sem = asyncio.Semaphore(concorrencia)
+        self._pendentes = asyncio.Semaphore(concorrencia * 10)
+        fila = asyncio.Queue(maxsize=concorrencia * 2)
+        self._entrada_esgotada = False
+        realimentacao = None
+        inicio = time.perf_counter()
+        try:
+            async with AsyncExitStack() as pilha:
+                self.saida_pdf = await pilha.enter_async_context(
+                    EscritorLotes(abrir_saida(save_emails_pdf, COLUNAS_EMAILS_PDF, retomar)))
+                if save_urls_elsevier:
+                    self.saida_elsevier = await pilha.enter_async_context(
+                        EscritorLotes(abrir_saida(save_urls_elsevier, ["urls elsevier", "doi"], retomar)))
+                await pilha.enter_async_context(self.transporte)
+                if self.caminho_registros:
+                    self.registros = await pilha.enter_async_context(RegistroRequisicoes(self.caminho_registros, retomar))
+                if self.fila_ocr:  # fecha antes das saídas acima: o OCR ainda registra estados no diário
+                    await self.fila_ocr.iniciar(retomar, self._registrar_estado)
+                    pilha.push_async_callback(self.fila_ocr.fechar)
+
+                consumidores = [asyncio.create_task(self._consumir(fila)) for _ in range(concorrencia)]
+                if self.retentativas:
+                    realimentacao = asyncio.create_task(self._realimentar(fila))
+                ordem_doi = 0
+                async for doi in iterar_dois(dois):
+                    ordem_doi += 1
+                    if doi not in concluidos:
+                        await fila.put((doi, ordem_doi))
+                self._entrada_esgotada = True
+                if realimentacao:  # termina quando não há retentativa agendada nem trabalho em andamento
+                    await realimentacao
+                    logging.info(self.retentativas.resumo())
+                for _ in consumidores:
+                    await fila.put(None)
+                await asyncio.gather(*consumidores)
+                await asyncio.gather(*self._downloads)
+        finally:
+            if realimentacao and not realimentacao.done():
+                realimentacao.cancel()
+            self.backend_pdf.fechar()
+            if self.cache_unpaywall:
+                self.cache_unpaywall.fechar()
+            if self.indice_snapshot:
+                self.indice_snapshot.fechar()
+            if self.cache_pdf:
+                self.cache_pdf.fechar()
+            if self.transporte.confianca_tls:
+                self.transporte.confianca_tls.fechar()
+            # o diário fecha depois dos escritores, que ainda registram estados ao esvaziar a fila
+            if self.progresso:
+                self.progresso.fechar()
+        logging.info(f"Transporte {self.transporte.nome}: concluído em {time.perf_counter() - inicio:.1f}s")
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    import sys
+    import argparse
+    from datetime import datetime
+    from transportes import TRANSPORTES
+    from confianca_tls import CacheConfiancaTLS
+    from ocr_pdf import FilaOCR
+    from retentativas import FilaRetentativas
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s",
+                        handlers=[logging.FileHandler(f"{__file__}.log", mode="w", encoding="utf-8"),
+                                  logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="Unpaywall -> PDF -> emails com transporte selecionável")
+    parser.add_argument("--transporte", choices=sorted(TRANSPORTES), default="impit")
+    parser.add_argument("--concorrencia", type=int, default=10)
+    parser.add_argument("--amostra", type=int, default=None)
+    parser.add_argument("--progresso", default=None, help="diário SQLite para retomar a execução")
+    parser.add_argument("--snapshot", default=None, help="índice do snapshot da Unpaywall (snapshot_unpaywall.py)")
+    parser.add_argument("--registros", default=None, help="registros por requisição (.jsonl/.parquet) para o registros.py")
+    parser.add_argument("--tentativas", type=int, default=3, help="retentativas adiadas de timeouts/429/5xx (0 = desligado)")
+    parser.add_argument("--ocr", action="store_true", help="OCR da 1ª página dos PDFs somente imagem (precisa do Tesseract)")
+    args = parser.parse_args()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    transporte = TRANSPORTES[args.transporte](confianca_tls=CacheConfiancaTLS("cache_tls.sqlite"))
+    pipeline = PipelinePDF(transporte, caminho_cache_unpaywall="cache_unpaywall.sqlite", caminho_cache_pdf="cache_pdf.sqlite",
+                           caminho_indice_snapshot=args.snapshot,
+                           caminho_registros=args.registros,
+                           retentativas=FilaRetentativas(args.tentativas) if args.tentativas else None,
+                           fila_ocr=FilaOCR(fr"C:\Users\emails_ocr_{timestamp}.csv") if args.ocr else None)
+
+    inicio_codigo = time.perf_counter()
+    try:
+        asyncio.run(pipeline.main(settings.CAMINHO_PLANILHA_DOI,
+                                  fr"C:\Users\emails_coletados_pdf_{args.transporte}_{timestamp}.csv",
+                                  fr"C:\Users\urls_coletadas_elsevier_{args.transporte}_{timestamp}.csv",
+                                  concorrencia=args.concorrencia, amostra=args.amostra, caminho_progresso=args.progresso))
+    except Exception as e:
+        fim_codigo = time.perf_counter()
+        logging.error(
+            f'código interrompido: {e} '
+            f'Tempo de código: {fim_codigo - inicio_codigo:.2f}s',
+            exc_info=True
+        )
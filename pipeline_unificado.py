@@ -0,0 +1,67 @@
+import time
+import asyncio
+import logging
+from datetime import datetime
+import settings
+from hibrido_pdf import FormatadoCrawler, configurar_logging
+from hibrido_elsevier import ExtracaoElsevier
+
+
+class PipelineUnificado:
+    """Roda a coleta de PDFs e a extração Elsevier num único processo.
+
+    O crawler da Unpaywall/PDF entrega as URLs Elsevier numa fila em memória e o crawler
+    de navegador já as consome enquanto a primeira etapa continua, sem o CSV intermediário
+    como ponto de parada (ele continua sendo gravado, como registro).
+
+    Os dois estágios usam o mesmo diário de progresso: um DOI Elsevier só é dado como
+    concluído quando seus emails foram gravados ("elsevier processado").
+    """
+
+    def __init__(self, crawler_pdf: FormatadoCrawler | None = None, extracao_elsevier: ExtracaoElsevier | None = None):
+        self.crawler_pdf = crawler_pdf or FormatadoCrawler()
+        self.extracao_elsevier = extracao_elsevier or ExtracaoElsevier()
+
+    async def main(self, caminho_planilha_doi: str, save_emails_pdf: str, save_urls_elsevier: str, save_emails_elsevier: str,
+                   caminho_progresso: str | None = None, **kwargs_pdf):
+        """`kwargs_pdf` vão direto para `FormatadoCrawler.main` (amostra, tamanho_bloco, ...)"""
+        # sem limite: a etapa de PDF não deve esperar o navegador, e cada item é só (url, doi, ordem_doi)
+        fila = asyncio.Queue()
+        self.crawler_pdf.fila_elsevier = fila
+
+        estagio_elsevier = asyncio.create_task(
+            self.extracao_elsevier.main_fila(fila, save_emails_elsevier, caminho_progresso))
+        try:
+            await self.crawler_pdf.main(caminho_planilha_doi, save_emails_pdf, save_urls_elsevier,
+                                        caminho_progresso=caminho_progresso, **kwargs_pdf)
+        finally:
+            await fila.put(None)  # fim do fluxo: o estágio Elsevier termina o que já recebeu
+            logging.info(f"Etapa PDF concluída; {fila.qsize() - 1} URLs Elsevier ainda na fila")
+        await estagio_elsevier
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    configurar_logging(f"{__file__}.log")
+    caminho_planilha_doi = settings.CAMINHO_PLANILHA_DOI
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    save_emails_pdf = fr"C:\Users\emails_coletados_pdf_{timestamp}.csv"
+    save_urls_elsevier = fr"C:\Users\urls_coletadas_elsevier{timestamp}.csv"
+    save_emails_elsevier = fr"C:\Users\emails_processados_elsevier_{timestamp}.csv"
+    pipeline = PipelineUnificado(
+        FormatadoCrawler(caminho_cache_unpaywall="cache_unpaywall.sqlite", caminho_cache_pdf="cache_pdf.sqlite",
+                         caminho_cache_tls="cache_tls.sqlite"),
+        ExtracaoElsevier(),
+    )
+
+    inicio_codigo = time.perf_counter()
+    try:
+        asyncio.run(pipeline.main(caminho_planilha_doi, save_emails_pdf, save_urls_elsevier, save_emails_elsevier,
+                                  caminho_progresso="progresso.sqlite"))
+    except Exception as e:
+        fim_codigo = time.perf_counter()
+        logging.error(
+            f'código interrompido: {e} '
+            f'Tempo de código: {fim_codigo - inicio_codigo:.2f}s',
+            exc_info=True
+        )
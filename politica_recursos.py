@@ -0,0 +1,68 @@
+from urllib.parse import urlparse
+
+
+TIPOS_PESADOS = {"image", "font", "media"}
+
+DOMINIOS_RASTREAMENTO = {
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "adobedtm.com",
+    "omtrdc.net",
+    "demdex.net",
+    "hotjar.com",
+    "newrelic.com",
+    "nr-data.net",
+    "facebook.net",
+    "twitter.com",
+    "linkedin.com",
+    "crazyegg.com",
+    "qualtrics.com",
+}
+
+
+def _casa_dominio(host: str, dominios) -> bool:
+    """True se o host é um dos domínios ou subdomínio de algum deles."""
+    return any(host == d or host.endswith("." + d) for d in dominios)
+
+
+class PoliticaRecursos:
+    """Decide quais requisições do navegador são abortadas antes de sair.
+
+    - `tipos_bloqueados`: resource types do Playwright sempre bloqueados (imagens, fontes, mídia);
+    - `dominios_bloqueados`: domínios bloqueados em qualquer tipo (analytics, anúncios);
+    - `dominios_permitidos`: se informado, scripts/xhr/fetch de outros domínios também
+      são bloqueados (o documento principal nunca é bloqueado).
+    """
+
+    def __init__(self, tipos_bloqueados=TIPOS_PESADOS, dominios_bloqueados=DOMINIOS_RASTREAMENTO,
+                 dominios_permitidos=None):
+        self.tipos_bloqueados = set(tipos_bloqueados)
+        self.dominios_bloqueados = set(dominios_bloqueados)
+        self.dominios_permitidos = set(dominios_permitidos) if dominios_permitidos else None
+        self.bloqueadas = 0
+        self.liberadas = 0
+
+    def bloquear(self, tipo: str, url: str) -> bool:
+        if tipo == "document":
+            return False
+        host = urlparse(url).hostname or ""
+        if tipo in self.tipos_bloqueados or _casa_dominio(host, self.dominios_bloqueados):
+            return True
+        if self.dominios_permitidos is not None and not _casa_dominio(host, self.dominios_permitidos):
+            return True
+        return False
+
+    async def instalar(self, page):
+        """Registra a rota na página (chamar no pre_navigation_hook, antes do goto)."""
+        async def _rotear(route):
+            req = route.request
+            if self.bloquear(req.resource_type, req.url):
+                self.bloqueadas += 1
+                await route.abort()
+            else:
+                self.liberadas += 1
+                await route.continue_()
+
+        await page.route("**/*", _rotear)
@@ -0,0 +1,72 @@
+import os
+import csv
+import time
+import sqlite3
+
+
+# estados terminais que contam como "DOI concluído" numa retomada;
+# qualquer outro estado (processamento falhou, requisição 5xx, ...) é refeito
+ESTADOS_CONCLUIDOS = {
+    "pdf normal",
+    "pdf fallback",
+    "pdf em cache",
+    "página vazia",
+    "página unpaywall vazia",
+    "sem pdf",
+    "não é pdf",
+    "pdf muito grande",
+    "pdf somente imagem",
+    "pdf ocr",
+    "elsevier",
+    "elsevier processado",
+}
+
+# no estágio Elsevier (hibrido_elsevier) "elsevier" só diz que o DOI foi roteado para ele:
+# concluído ali é só o artigo já extraído
+ESTADOS_CONCLUIDOS_ELSEVIER = {"elsevier processado"}
+
+
+class DiarioProgresso:
+    """Diário durável (SQLite) com o último estado de cada DOI processado.
+
+    Cada scraper registra o estado terminal de cada DOI assim que ele é decidido.
+    Ao reiniciar uma execução interrompida, `concluidos()` devolve os DOIs que
+    podem ser pulados; os que terminaram em falha são processados de novo.
+    """
+
+    def __init__(self, caminho: str):
+        self.conn = sqlite3.connect(caminho, isolation_level=None)  # autocommit: cada registro já vai para o disco
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS progresso ("
+            " doi TEXT PRIMARY KEY,"
+            " estado TEXT NOT NULL,"
+            " atualizado_em REAL NOT NULL)"
+        )
+
+    def registrar(self, doi: str, estado: str):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO progresso (doi, estado, atualizado_em) VALUES (?, ?, ?)",
+            (doi, estado, time.time()),
+        )
+
+    def concluidos(self, estados=ESTADOS_CONCLUIDOS) -> set[str]:
+        """DOIs cujo último estado registrado está em `estados` (padrão: terminais de sucesso do crawler de PDF)."""
+        estados = list(estados)
+        marcadores = ", ".join("?" * len(estados))
+        linhas = self.conn.execute(f"SELECT doi FROM progresso WHERE estado IN ({marcadores})", estados)
+        return {doi for (doi,) in linhas}
+
+    def fechar(self):
+        self.conn.close()
+
+
+def abrir_csv_saida(caminho, cabecalho: list[str], retomar: bool):
+    """Abre o CSV de saída; ao retomar faz append e só escreve o cabeçalho se o arquivo for novo."""
+    existe = retomar and os.path.exists(caminho) and os.path.getsize(caminho) > 0
+    f = open(caminho, "a" if retomar else "w", newline="", encoding="utf-8")
+    writer = csv.writer(f)
+    if not existe:
+        writer.writerow(cabecalho)
+    return f, writer
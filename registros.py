@@ -0,0 +1,130 @@
+import time
+from pathlib import Path
+import pandas as pd
+from escritor_resultados import EscritorLotes, abrir_saida
+
+
+# um registro por requisição (consulta à Unpaywall ou download de PDF)
+CAMPOS = [
+    "ts",             # epoch do fim da requisição
+    "etapa",          # unpaywall | pdf
+    "doi",
+    "host",
+    "transporte",
+    "http_status",
+    "estado",         # estado terminal do DOI (ou o resultado da etapa unpaywall)
+    "emails",
+    "bytes",
+    "t_download",     # segundos da requisição
+    "t_parse",        # segundos da extração
+    "t_total",        # segundos da etapa, incluindo esperas por slot
+    "tls_fallback",
+    "motivo_abortado",  # por que o corpo não foi baixado, ou a classe da exceção da requisição que falhou
+]
+NUMERICOS = ["ts", "http_status", "emails", "bytes", "t_download", "t_parse", "t_total"]
+
+# estados em que os bytes baixados não renderam nada aproveitável
+ESTADOS_DESPERDICIO = {"não é pdf", "pdf muito grande", "pdf somente imagem", "processamento falhou"}
+
+
+class RegistroRequisicoes:
+    """Registros estruturados por requisição (.jsonl ou .parquet), gravados em lote pelo EscritorLotes.
+
+    Substitui o parse dos logs: `python registros.py <arquivo>` agrega os registros
+    de uma ou mais execuções (ver `relatorio`).
+    """
+
+    def __init__(self, caminho: str, retomar: bool = False):
+        self.escritor = EscritorLotes(abrir_saida(caminho, CAMPOS, retomar))
+
+    async def __aenter__(self):
+        await self.escritor.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.escritor.fechar()
+
+    async def registrar(self, **campos):
+        campos.setdefault("ts", time.time())
+        await self.escritor.escrever([campos.get(c) for c in CAMPOS])
+
+
+# ---------------- relatório ----------------
+def ler_registros(caminhos):
+    tabelas = []
+    for caminho in caminhos:
+        sufixo = Path(caminho).suffix.lower()
+        if sufixo == ".parquet":
+            tabelas.append(pd.read_parquet(caminho))
+        elif sufixo == ".csv":
+            tabelas.append(pd.read_csv(caminho))
+        else:
+            tabelas.append(pd.read_json(caminho, lines=True))
+    df = pd.concat(tabelas, ignore_index=True)
+    for coluna in NUMERICOS:
+        df[coluna] = pd.to_numeric(df[coluna], errors="coerce")
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    return df
+
+
+def relatorio(df, intervalo: str = "1min", top_hosts: int = 15) -> dict:
+    """Agrega os registros em tabelas (DataFrames):
+
+    - vazao: requisições, DOIs de PDF concluídos, emails e MB por `intervalo`;
+    - hosts_lentos: hosts de PDF ordenados pelo p90 do tempo total;
+    - latencia_por_estado: p50/p90/p99 do tempo total por etapa e estado;
+    - desperdicio: bytes baixados sem emails, por estado.
+    """
+    pdf = df[df["etapa"] == "pdf"]
+
+    vazao = df.set_index("ts").resample(intervalo).agg(
+        requisicoes=("etapa", "size"),
+        emails=("emails", "sum"),
+        mb=("bytes", lambda b: b.sum() / 1e6),
+    )
+    vazao["pdfs"] = pdf.set_index("ts").resample(intervalo)["etapa"].size().reindex(vazao.index, fill_value=0)
+
+    hosts = pdf.groupby("host").agg(
+        requisicoes=("etapa", "size"),
+        p50=("t_total", "median"),
+        p90=("t_total", lambda t: t.quantile(0.9)),
+        download_medio=("t_download", "mean"),
+        parse_medio=("t_parse", "mean"),
+        mb=("bytes", lambda b: b.sum() / 1e6),
+        emails=("emails", "sum"),
+    ).sort_values("p90", ascending=False).head(top_hosts)
+
+    latencia = df.groupby(["etapa", "estado"])["t_total"].describe(percentiles=[0.5, 0.9, 0.99])
+    latencia = latencia[["count", "50%", "90%", "99%", "max"]].sort_values("count", ascending=False)
+
+    sem_emails = pdf[(pdf["emails"].fillna(0) == 0) | pdf["estado"].isin(ESTADOS_DESPERDICIO)]
+    desperdicio = sem_emails.groupby("estado").agg(requisicoes=("etapa", "size"), mb=("bytes", lambda b: b.sum() / 1e6))
+    desperdicio = desperdicio.sort_values("mb", ascending=False)
+
+    return {"vazao": vazao, "hosts_lentos": hosts, "latencia_por_estado": latencia, "desperdicio": desperdicio}
+
+
+def imprimir_relatorio(df, tabelas: dict):
+    pdf = df[df["etapa"] == "pdf"]
+    duracao = (df["ts"].max() - df["ts"].min()).total_seconds() or 1.0
+    print(f"Registros: {len(df)} | PDFs: {len(pdf)} | Duração: {duracao:.0f}s | "
+          f"Vazão: {len(df) / duracao:.2f} req/s | {len(pdf) / duracao:.2f} PDFs/s | "
+          f"Baixado: {df['bytes'].sum() / 1e6:.1f} MB | "
+          f"Desperdiçado: {tabelas['desperdicio']['mb'].sum():.1f} MB")
+    for nome, tabela in tabelas.items():
+        print(f"\n== {nome} ==")
+        print(tabela.round(3).to_string())
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Relatório de desempenho a partir dos registros por requisição")
+    parser.add_argument("registros", nargs="+", help="arquivos .jsonl/.parquet gravados pelo RegistroRequisicoes")
+    parser.add_argument("--intervalo", default="1min", help="janela da série de vazão (regra do pandas: 30s, 1min, 5min)")
+    parser.add_argument("--top-hosts", type=int, default=15)
+    args = parser.parse_args()
+
+    df = ler_registros(args.registros)
+    imprimir_relatorio(df, relatorio(df, args.intervalo, args.top_hosts))
@@ -0,0 +1,128 @@
+import ssl
+import time
+import heapq
+import random
+import asyncio
+import logging
+
+
+# respostas que costumam passar sozinhas: vale tentar de novo mais tarde
+STATUS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504, 520, 522, 524}
+
+
+def erro_de_certificado(excecao: BaseException) -> bool:
+    """True se a exceção (ssl do Python, aiohttp ou impit) é falha de verificação do certificado."""
+    if isinstance(excecao, ssl.SSLCertVerificationError):
+        return True
+    texto = str(excecao).lower()
+    return "certificate" in texto and ("verify" in texto or "unknown issuer" in texto or "invalid" in texto)
+
+
+def falha_transitoria(status: int | None = None, excecao: BaseException | None = None) -> bool:
+    """True se a falha (status HTTP ou exceção) deve ser tentada de novo; o resto é permanente.
+
+    Transitórias: timeouts, erros de conexão e os status de STATUS_TRANSITORIOS (também
+    quando vêm dentro da exceção, como no HttpStatusCodeError do Crawlee). Erros de
+    certificado, 4xx comuns e PDFs inválidos não mudam numa nova tentativa.
+    """
+    if excecao is not None:
+        status = status or getattr(excecao, "status_code", None)
+        if status is None:
+            if erro_de_certificado(excecao):
+                return False
+            if isinstance(excecao, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+                return True
+            nome = type(excecao).__name__.lower()
+            return "timeout" in nome or "connect" in nome or "disconnect" in nome
+    return status in STATUS_TRANSITORIOS
+
+
+class FilaRetentativas:
+    """Retentativas adiadas das falhas transitórias, fora do caminho da passada principal.
+
+    `agendar` guarda o item com espera exponencial (`espera_base` * 2^(tentativa-1), até
+    `espera_max`) com jitter, ou pelo `Retry-After` quando informado; `liberar` devolve os
+    itens quando vencem, e quem consome os põe no fim da fila do crawler.
+
+    Por host há dois limites, para um publisher com problema não ocupar os workers:
+    `max_pendentes_por_host` retentativas agendadas ao mesmo tempo e `orcamento_por_host`
+    retentativas na execução inteira. Passou de `max_tentativas` ou de um dos limites,
+    `agendar` devolve False e a falha fica como definitiva.
+    """
+
+    def __init__(self, max_tentativas: int = 3, espera_base: float = 30.0, espera_max: float = 900.0,
+                 max_pendentes_por_host: int = 20, orcamento_por_host: int = 200, seed: int | None = None):
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.max_pendentes_por_host = max_pendentes_por_host
+        self.orcamento_por_host = orcamento_por_host
+        self.rng = random.Random(seed)
+
+        self.agendadas = 0
+        self.recusadas = 0
+        self.liberadas = 0
+
+        self._heap = []  # (pronto_em, seq, item, host)
+        self._seq = 0
+        self._pendentes_host: dict[str, int] = {}
+        self._usadas_host: dict[str, int] = {}
+        self._novo = asyncio.Event()
+
+    @property
+    def pendentes(self) -> int:
+        return len(self._heap)
+
+    def espera(self, tentativa: int, retry_after: float | None = None) -> float:
+        """Segundos até a retentativa: Retry-After (com um pouco de jitter) ou backoff com equal jitter"""
+        if retry_after is not None:
+            return min(retry_after, self.espera_max) * self.rng.uniform(1.0, 1.1)
+        teto = min(self.espera_base * 2 ** (tentativa - 1), self.espera_max)
+        return teto / 2 + self.rng.uniform(0, teto / 2)
+
+    def agendar(self, item, host: str | None, tentativa: int, retry_after: float | None = None) -> bool:
+        """Agenda a `tentativa` (1 = primeira retentativa); False se não há mais retentativas para o item/host"""
+        host = host or ""
+        if tentativa > self.max_tentativas \
+                or self._pendentes_host.get(host, 0) >= self.max_pendentes_por_host \
+                or self._usadas_host.get(host, 0) >= self.orcamento_por_host:
+            self.recusadas += 1
+            return False
+
+        espera = self.espera(tentativa, retry_after)
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + espera, self._seq, item, host))
+        self._pendentes_host[host] = self._pendentes_host.get(host, 0) + 1
+        self._usadas_host[host] = self._usadas_host.get(host, 0) + 1
+        self.agendadas += 1
+        self._novo.set()
+        logging.info(f"Retentativa {tentativa}/{self.max_tentativas} agendada em {espera:.0f}s | host: {host}")
+        return True
+
+    async def liberar(self, ocioso, intervalo: float = 1.0):
+        """Gera os itens conforme vencem; termina quando não há nada agendado e `ocioso()` (async) é True"""
+        while True:
+            if not self._heap:
+                if await ocioso():
+                    return
+                await self._esperar_novo(intervalo)
+                continue
+            restante = self._heap[0][0] - time.monotonic()
+            if restante > 0:
+                await self._esperar_novo(min(restante, intervalo))
+                continue
+            _, _, item, host = heapq.heappop(self._heap)
+            self._pendentes_host[host] -= 1
+            self.liberadas += 1
+            yield item
+
+    async def _esperar_novo(self, timeout: float):
+        self._novo.clear()
+        try:
+            await asyncio.wait_for(self._novo.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def resumo(self) -> str:
+        return (f"Retentativas: {self.agendadas} agendadas | {self.liberadas} liberadas | "
+                f"{self.recusadas} recusadas (limite de tentativas/host)")
@@ -0,0 +1,156 @@
+import os
+import gzip
+import json
+import time
+import logging
+import sqlite3
+from pathlib import Path
+
+
+def normalizar_doi(doi: str) -> str:
+    """DOI no formato das chaves da Unpaywall: minúsculo, sem prefixo doi.org/doi:"""
+    doi = doi.strip().lower()
+    for prefixo in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:"):
+        if doi.startswith(prefixo):
+            return doi[len(prefixo):]
+    return doi
+
+
+def _compactar(registro: dict) -> dict:
+    """Só o que resolver_unpaywall usa: publisher, doi_url e as duas URLs da best_oa_location"""
+    best_loc = registro.get("best_oa_location")
+    if best_loc:
+        best_loc = {"url_for_pdf": best_loc.get("url_for_pdf"), "url": best_loc.get("url")}
+    return {"publisher": registro.get("publisher"), "best_oa_location": best_loc, "doi_url": registro.get("doi_url")}
+
+
+class IndiceSnapshotUnpaywall:
+    """Índice local (SQLite) do snapshot / changefiles da Unpaywall, para resolver DOIs sem a API.
+
+    `importar(arquivo)` lê um JSONL gzipado em streaming e grava, por DOI, só os campos
+    usados pelo crawler (ver `_compactar`), em lotes de `tamanho_lote` linhas por transação.
+    Changefiles podem ser importados por cima do snapshot: um registro só substitui outro
+    se o campo `updated` dele não for mais antigo. Arquivos já importados (mesmo nome,
+    tamanho e mtime) são pulados.
+
+    `buscar(doi)` tem a mesma interface do CacheUnpaywall; DOI ausente do índice é miss
+    (os changefiles não cobrem tudo), então quem chama cai na API.
+    """
+
+    def __init__(self, caminho: str, tamanho_lote: int = 50_000):
+        self.tamanho_lote = tamanho_lote
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(caminho, isolation_level=None)  # autocommit; importar() abre transações
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot ("
+            " doi TEXT PRIMARY KEY,"
+            " dados TEXT NOT NULL,"
+            " atualizado TEXT NOT NULL DEFAULT '')"
+            " WITHOUT ROWID"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS arquivos_importados ("
+            " nome TEXT PRIMARY KEY,"
+            " tamanho INTEGER NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " registros INTEGER NOT NULL,"
+            " importado_em REAL NOT NULL)"
+        )
+
+    def _ja_importado(self, caminho: Path) -> bool:
+        info = caminho.stat()
+        linha = self.conn.execute("SELECT tamanho, mtime FROM arquivos_importados WHERE nome = ?",
+                                  (caminho.name,)).fetchone()
+        return linha is not None and linha[0] == info.st_size and linha[1] == info.st_mtime
+
+    def _gravar_lote(self, lote: list[tuple]):
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT INTO snapshot (doi, dados, atualizado) VALUES (?, ?, ?) "
+            "ON CONFLICT(doi) DO UPDATE SET dados = excluded.dados, atualizado = excluded.atualizado "
+            "WHERE excluded.atualizado >= snapshot.atualizado",
+            lote,
+        )
+        self.conn.execute("COMMIT")
+
+    def importar(self, caminho_arquivo: str) -> int:
+        """Importa um snapshot/changefile (.jsonl.gz ou .jsonl); retorna quantos registros foram lidos"""
+        caminho = Path(caminho_arquivo)
+        if self._ja_importado(caminho):
+            logging.info(f"Snapshot Unpaywall: {caminho.name} já importado, pulando")
+            return 0
+
+        abrir = gzip.open if caminho.suffix == ".gz" else open
+        inicio = time.perf_counter()
+        lote, total, invalidas = [], 0, 0
+        with abrir(caminho, "rt", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = json.loads(linha)
+                    doi = normalizar_doi(registro["doi"])
+                except (ValueError, KeyError, AttributeError):
+                    invalidas += 1
+                    continue
+                lote.append((doi, json.dumps(_compactar(registro), separators=(",", ":")), registro.get("updated") or ""))
+                if len(lote) >= self.tamanho_lote:
+                    self._gravar_lote(lote)
+                    total += len(lote)
+                    lote = []
+        if lote:
+            self._gravar_lote(lote)
+            total += len(lote)
+
+        info = caminho.stat()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO arquivos_importados (nome, tamanho, mtime, registros, importado_em) VALUES (?, ?, ?, ?, ?)",
+            (caminho.name, info.st_size, info.st_mtime, total, time.time()),
+        )
+        logging.info(f"Snapshot Unpaywall: {caminho.name} | {total} registros | {invalidas} linhas inválidas | "
+                     f"{time.perf_counter() - inicio:.1f}s")
+        return total
+
+    def importar_pasta(self, pasta: str) -> int:
+        """Importa os arquivos da pasta em ordem de nome (changefiles vêm datados no nome)"""
+        arquivos = sorted(p for p in Path(pasta).iterdir() if p.name.endswith((".jsonl.gz", ".jsonl")))
+        return sum(self.importar(str(p)) for p in arquivos)
+
+    def buscar(self, doi: str) -> tuple[bool, dict | None]:
+        """Retorna (encontrado, dados), como CacheUnpaywall.buscar"""
+        linha = self.conn.execute("SELECT dados FROM snapshot WHERE doi = ?", (normalizar_doi(doi),)).fetchone()
+        if linha is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, json.loads(linha[0])
+
+    def fechar(self):
+        logging.info(f"Snapshot Unpaywall: {self.hits} DOIs resolvidos localmente | {self.misses} misses")
+        self.conn.close()
+
+
+# ---------------- Programa ----------------
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s",
+                        handlers=[logging.StreamHandler(sys.stdout)])
+
+    parser = argparse.ArgumentParser(description="Monta o índice local do snapshot/changefiles da Unpaywall")
+    parser.add_argument("indice", help="arquivo SQLite do índice (criado se não existir)")
+    parser.add_argument("arquivos", nargs="+", help="arquivos .jsonl.gz ou pastas com eles")
+    args = parser.parse_args()
+
+    indice = IndiceSnapshotUnpaywall(args.indice)
+    try:
+        for caminho in args.arquivos:
+            if os.path.isdir(caminho):
+                indice.importar_pasta(caminho)
+            else:
+                indice.importar(caminho)
+    finally:
+        indice.fechar()
@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+from agendador_hosts import AgendadorHosts, HostOcupado, ler_retry_after
+
+
+def test_bloqueio_corta_limite_e_pausa():
+    agendador = AgendadorHosts(limite_inicial=4, pausa_base=10)
+    agendador.registrar("h", 429, 0.5)
+    assert agendador.hosts["h"].limite == 2
+    assert 9 < agendador.pausa_restante("h") <= 10
+    agendador.registrar("h", 503, 0.5, retry_after=120)
+    assert 119 < agendador.pausa_restante("h") <= 120
+
+
+def test_falha_de_rede_corta_limite_e_pausa_so_depois_de_seguidas():
+    agendador = AgendadorHosts(limite_inicial=8, pausa_base=10, falhas_para_pausa=3)
+    agendador.registrar("h", None, 30.0)
+    agendador.registrar("h", None, 30.0)
+    assert agendador.hosts["h"].limite == 2
+    assert agendador.pausa_restante("h") == 0
+    agendador.registrar("h", None, 30.0)
+    assert agendador.hosts["h"].limite == 1
+    assert agendador.pausa_restante("h") > 0
+    agendador.registrar("h", 200, 1.0)
+    assert agendador.hosts["h"].falhas_seguidas == 0
+
+
+def test_slot_com_espera_max_desiste_em_host_ocupado():
+    async def rodar():
+        agendador = AgendadorHosts(limite_inicial=1)
+        async with agendador.slot("h"):
+            with pytest.raises(HostOcupado):
+                async with agendador.slot("h", espera_max=0.05):
+                    pass
+        async with agendador.slot("h", espera_max=0.05):  # liberado: entra direto
+            pass
+
+    asyncio.run(rodar())
+
+
+def test_slot_com_espera_max_desiste_de_cara_em_host_pausado():
+    async def rodar():
+        agendador = AgendadorHosts(pausa_base=60)
+        agendador.registrar("h", 403, 1.0)
+        with pytest.raises(HostOcupado):
+            await asyncio.wait_for(agendador.slot("h", espera_max=1.0).__aenter__(), 0.5)
+
+    asyncio.run(rodar())
+
+
+def test_ler_retry_after():
+    assert ler_retry_after({"Retry-After": "120"}) == 120.0
+    assert ler_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert ler_retry_after({"Retry-After": "amanhã"}) is None
+    assert ler_retry_after({}) is None
@@ -0,0 +1,70 @@
+import ssl
+import datetime
+import pytest
+
+pytest.importorskip("OpenSSL")
+pytest.importorskip("certifi")
+x509 = pytest.importorskip("cryptography.x509")
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from confianca_tls import CacheConfiancaTLS, _folha  # noqa: E402
+
+HOST = "localhost"
+
+
+def _certificado(tmp_path, nome):
+    """Certificado autoassinado para HOST; devolve (PEM, caminho do cert, caminho da chave)"""
+    chave = ec.generate_private_key(ec.SECP256R1())
+    sujeito = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, HOST)])
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(sujeito).issuer_name(sujeito).public_key(chave.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(agora - datetime.timedelta(days=1)).not_valid_after(agora + datetime.timedelta(days=30))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(HOST)]), critical=False)
+            .sign(chave, hashes.SHA256()))
+    pem = cert.public_bytes(serialization.Encoding.PEM).decode("ascii")
+    caminho_cert, caminho_chave = tmp_path / f"{nome}.pem", tmp_path / f"{nome}.key"
+    caminho_cert.write_text(pem)
+    caminho_chave.write_bytes(chave.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                                  serialization.NoEncryption()))
+    return pem, caminho_cert, caminho_chave
+
+
+def _handshake(ctx_cliente: ssl.SSLContext, caminho_cert, caminho_chave) -> bool:
+    """Handshake em memória contra um servidor com o certificado dado; True se o cliente aceitou"""
+    ctx_servidor = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx_servidor.load_cert_chain(caminho_cert, caminho_chave)
+    bios = [ssl.MemoryBIO() for _ in range(4)]
+    cliente = ctx_cliente.wrap_bio(bios[0], bios[1], server_hostname=HOST)
+    servidor = ctx_servidor.wrap_bio(bios[2], bios[3], server_side=True)
+    pronto = {cliente: False, servidor: False}
+    for _ in range(10):
+        for lado, saida, entrada in ((cliente, bios[1], bios[2]), (servidor, bios[3], bios[0])):
+            if not pronto[lado]:
+                try:
+                    lado.do_handshake()
+                    pronto[lado] = True
+                except ssl.SSLWantReadError:
+                    pass
+                except ssl.SSLError:
+                    if lado is cliente:
+                        return False
+            entrada.write(saida.read())
+        if all(pronto.values()):
+            return True
+    return False
+
+
+def test_fixa_so_o_certificado_folha(tmp_path):
+    pem_a, cert_a, chave_a = _certificado(tmp_path, "a")
+    pem_b, cert_b, chave_b = _certificado(tmp_path, "b")
+    cache = CacheConfiancaTLS(str(tmp_path / "tls.sqlite"))
+    try:
+        # a cadeia apresentada traz outro certificado depois da folha: ele não vira âncora
+        ctx, impressao = cache._criar_contexto(pem_a + pem_b)
+    finally:
+        cache.fechar()
+    assert impressao == _folha(pem_a)[1] != _folha(pem_b)[1]
+    assert _handshake(ctx, cert_a, chave_a)
+    assert not _handshake(ctx, cert_b, chave_b)
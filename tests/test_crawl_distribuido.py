@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+
+pytest.importorskip("pandas")
+from crawl_distribuido import FilaCompartilhada, shard_de, filtrar_shard  # noqa: E402
+
+
+def test_shard_estavel_e_por_prefixo():
+    dois = [f"10.1016/j.x.{i}" for i in range(50)] + [f"10.1371/p.{i}" for i in range(50)]
+    assert [shard_de(d, 4) for d in dois] == [shard_de(d.upper(), 4) for d in dois]
+    assert len({shard_de(d, 4, por_prefixo=True) for d in dois[:50]}) == 1
+    assert sorted(d for i in range(4) for d in filtrar_shard(dois, i, 4)) == sorted(dois)
+
+
+def test_reserva_nao_repete_dois_e_devolve_falhas(tmp_path):
+    caminho = str(tmp_path / "fila.sqlite")
+    fila = FilaCompartilhada(caminho, max_tentativas=2)
+    assert fila.popular(["a", "b", "c"]) == 3
+    assert fila.popular(["a", "d"]) == 1
+    outra = FilaCompartilhada(caminho, max_tentativas=2)
+    assert fila.reservar("w0", 2) == ["a", "b"]
+    assert outra.reservar("w1", 10) == ["c", "d"]
+    fila.registrar("a", "pdf normal")
+    fila.registrar("b", "download falhou")  # volta para a fila
+    assert outra.reservar("w1", 10) == ["b"]
+    outra.registrar("b", "download falhou")  # segunda tentativa: desiste
+    assert fila.resumo() == {"concluido": 1, "falhou": 1, "reservado": 2}
+    outra.fechar()
+    fila.fechar()
+
+
+def test_iterar_async_reserva_em_blocos(tmp_path):
+    fila = FilaCompartilhada(str(tmp_path / "fila.sqlite"))
+    fila.popular([f"10.1/{i}" for i in range(7)])
+
+    async def consumir():
+        return [doi async for doi in fila.iterar_async("w0", tamanho_reserva=3)]
+
+    assert asyncio.run(consumir()) == [f"10.1/{i}" for i in range(7)]
+    assert fila.resumo() == {"reservado": 7}
+    fila.fechar()
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+pytest.importorskip("crawlee")
+pytest.importorskip("pymupdf")
+pytest.importorskip("OpenSSL")
+from crawlee import Request  # noqa: E402
+from backend_pdf import BackendExtracao  # noqa: E402
+from download_pdf import ImpitPDFStreamingClient, RespostaPDF, consumir_corpo_pdf  # noqa: E402
+
+PDF = b"%PDF-1.7\n" + b"0" * 100
+
+
+async def _vagas_cheias(backend: BackendExtracao) -> bool:
+    """True se todas as `max_pendentes` vagas podem ser reservadas de novo (nenhuma vazou)"""
+    try:
+        liberar = await asyncio.wait_for(asyncio.gather(*[backend.reservar() for _ in range(backend.max_pendentes)]), 1)
+    except asyncio.TimeoutError:
+        return False
+    for f in liberar:
+        f()
+    return True
+
+
+def _cliente(backend, baixar):
+    cliente = ImpitPDFStreamingClient(backend_pdf=backend)
+
+    async def _baixar_com_fallback(*args):
+        return await baixar()
+    cliente._baixar_com_fallback = _baixar_com_fallback
+    return cliente
+
+
+def _request():
+    return Request.from_url("https://exemplo.org/a.pdf", label="pdf", user_data={"doi": "10.1/a", "ordem_doi": 1})
+
+
+def test_vaga_volta_em_status_de_erro_e_timeout():
+    async def rodar():
+        backend = BackendExtracao("inline", max_pendentes=2)
+
+        async def gone():
+            return RespostaPDF("HTTP/1.1", 410, {})
+        for _ in range(3):  # o Crawlee transforma o 410 em erro sem chamar o handler: não há descartar
+            resultado = await _cliente(backend, gone).crawl(_request())
+            assert resultado.http_response.liberar_vaga is None
+
+        async def lento():
+            await asyncio.sleep(10)
+        for _ in range(3):  # timeout do handler cancela o download
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(_cliente(backend, lento).crawl(_request()), 0.01)
+
+        return await _vagas_cheias(backend)
+
+    assert asyncio.run(rodar())
+
+
+def test_pdf_baixado_segura_a_vaga_ate_descartar():
+    async def rodar():
+        backend = BackendExtracao("inline", max_pendentes=1)
+
+        async def pdf():
+            resposta = RespostaPDF("HTTP/1.1", 200, {})
+            resposta.conteudo = PDF
+            return resposta
+        resultado = await _cliente(backend, pdf).crawl(_request())
+        ocupada = not await _vagas_cheias(backend)
+        resultado.http_response.descartar()
+        return ocupada, await _vagas_cheias(backend)
+
+    assert asyncio.run(rodar()) == (True, True)
+
+
+def test_cancelamento_apaga_temporario(tmp_path):
+    async def chunks():
+        yield PDF
+        yield b"1" * 200
+        await asyncio.sleep(10)
+
+    async def rodar():
+        resposta = RespostaPDF("HTTP/1.1", 200, {})
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(consumir_corpo_pdf(chunks(), {}, resposta, 10_000, 50, str(tmp_path)), 0.05)
+        return resposta
+
+    resposta = asyncio.run(rodar())
+    assert resposta.caminho is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_sniff_e_limite_de_tamanho():
+    async def chunks(*partes):
+        for parte in partes:
+            yield parte
+
+    async def consumir(partes, max_bytes=10_000, headers=None):
+        resposta = RespostaPDF("HTTP/1.1", 200, headers or {})
+        await consumir_corpo_pdf(chunks(*partes), headers or {}, resposta, max_bytes, 5_000)
+        return resposta
+
+    assert asyncio.run(consumir([PDF])).is_pdf
+    assert asyncio.run(consumir([b"<html>" * 300])).motivo_abortado == "não é pdf"
+    assert asyncio.run(consumir([PDF, b"1" * 20_000])).motivo_abortado == "tamanho excedido"
+    assert asyncio.run(consumir([], headers={"Content-Length": "99999"})).motivo_abortado == "tamanho excedido"
@@ -0,0 +1,24 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+from entrada_dois import ler_dois, ler_linhas_em_blocos, embaralhar_em_janela  # noqa: E402
+
+
+def test_csv_em_blocos(tmp_path):
+    caminho = tmp_path / "dois.csv"
+    pd.DataFrame({"DOI": [f"10.1/{i}" for i in range(25)] + [None], "outra": range(26)}).to_csv(caminho, index=False)
+    blocos = list(ler_linhas_em_blocos(caminho, ["DOI"], tamanho_bloco=10))
+    assert [len(b) for b in blocos] == [10, 10, 6]
+    assert list(ler_dois(caminho, tamanho_bloco=10)) == [f"10.1/{i}" for i in range(25)]
+
+
+def test_formato_nao_suportado(tmp_path):
+    with pytest.raises(ValueError, match=".xls"):
+        list(ler_linhas_em_blocos(tmp_path / "dois.ods", ["DOI"]))
+
+
+def test_embaralhar_em_janela_preserva_os_itens():
+    itens = list(range(1000))
+    embaralhados = list(embaralhar_em_janela(itens, janela=50))
+    assert sorted(embaralhados) == itens
+    assert embaralhados != itens
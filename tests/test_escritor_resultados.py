@@ -0,0 +1,44 @@
+import asyncio
+import csv
+import pytest
+from escritor_resultados import EscritorLotes, SaidaCSV
+
+
+class SaidaQuebrada:
+    def gravar(self, linhas):
+        raise OSError("disco cheio")
+
+    def flush(self):
+        pass
+
+    def fechar(self):
+        pass
+
+
+def test_grava_em_lote_e_chama_depois(tmp_path):
+    caminho = tmp_path / "emails.csv"
+    gravados = []
+
+    async def rodar():
+        async with EscritorLotes(SaidaCSV(caminho, ["emails", "doi"]), intervalo=0.01) as escritor:
+            await escritor.escrever_muitas([["a@b.com", "10.1/x"], ["c@d.org", "10.1/x"]],
+                                           depois=lambda: gravados.append("10.1/x"))
+            await escritor.escrever_muitas([], depois=lambda: gravados.append("10.1/y"))
+
+    asyncio.run(rodar())
+    with open(caminho, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["emails", "doi"], ["a@b.com", "10.1/x"], ["c@d.org", "10.1/x"]]
+    assert gravados == ["10.1/x", "10.1/y"]
+
+
+def test_produtor_nao_trava_se_a_gravacao_morrer():
+    async def rodar():
+        escritor = EscritorLotes(SaidaQuebrada(), tamanho_lote=1, intervalo=0.01, max_fila=1)
+        await escritor.__aenter__()
+        with pytest.raises(OSError, match="disco cheio"):
+            for i in range(100):  # a fila enche depois que a tarefa morre
+                await asyncio.wait_for(escritor.escrever([i]), 1.0)
+        with pytest.raises(OSError):
+            await escritor.fechar()
+
+    asyncio.run(rodar())
@@ -0,0 +1,60 @@
+import pytest
+from extrator_emails import extrair_emails_texto, deduplicar
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    # "." de fim de frase antes do email na linha seguinte não é continuação do endereço
+    ("University of Sao Paulo, Brazil.\njohn@usp.br", ["john@usp.br"]),
+    ("* Corresponding author.\nmaria.silva@ufmg.br", ["maria.silva@ufmg.br"]),
+    ("Text 2023. \nmike@x.org", ["mike@x.org"]),
+])
+def test_ponto_de_fim_de_frase_nao_junta_linhas(texto, esperado):
+    assert extrair_emails_texto(texto) == esperado
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    # endereço completo no fim da linha não continua na seguinte, e nada é colado antes de um endereço
+    ("Contact: joao@usp.br.\nmaria@ufmg.br", ["joao@usp.br", "maria@ufmg.br"]),
+    ("E-mail: joao@usp.br.\nreceived 12 May 2020", ["joao@usp.br"]),
+    ("ORCID 0000-0002-\njoao@usp.br", ["joao@usp.br"]),
+])
+def test_nao_junta_linha_a_endereco_completo(texto, esperado):
+    assert extrair_emails_texto(texto) == esperado
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("joao@usp.\nbr", ["joao@usp.br"]),
+    ("joao@\nusp.br", ["joao@usp.br"]),
+    ("joao_\nsilva@usp.br", ["joao_silva@usp.br"]),
+    ("joao\n@usp.br", ["joao@usp.br"]),
+    ("maria@uni-\nbonn.de", ["maria@uni-bonn.de"]),
+])
+def test_endereco_quebrado_entre_linhas(texto, esperado):
+    assert extrair_emails_texto(texto) == esperado
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("joao [at] usp [dot] br", ["joao@usp.br"]),
+    ("joao (arroba) usp (ponto) br", ["joao@usp.br"]),
+    ("joao＠usp.br", ["joao@usp.br"]),
+    ("jo\u00adao@usp.br", ["joao@usp.br"]),
+])
+def test_desofuscacao(texto, esperado):
+    assert extrair_emails_texto(texto) == esperado
+
+
+def test_enderecos_agrupados():
+    assert extrair_emails_texto("{ana, bia; caio}@uni.edu") == ["ana@uni.edu", "bia@uni.edu", "caio@uni.edu"]
+
+
+def test_normaliza_e_deduplica():
+    texto = "Contato: Joao@USP.br. Ou joao@usp.br."
+    assert extrair_emails_texto(texto) == ["joao@usp.br"]
+
+
+def test_texto_sem_marcador():
+    assert extrair_emails_texto("Sem endereço nenhum por aqui. " * 100) == []
+
+
+def test_deduplicar_descarta_sem_arroba():
+    assert deduplicar(["A@b.com", "a@b.com.", "-", "c@d.org"]) == ["a@b.com", "c@d.org"]
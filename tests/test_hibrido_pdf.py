@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip("crawlee")
+pytest.importorskip("pymupdf")
+pytest.importorskip("OpenSSL")
+pytest.importorskip("pandas")
+pytest.importorskip("settings")
+from crawlee import Request  # noqa: E402
+from hibrido_pdf import FormatadoCrawler  # noqa: E402
+
+
+class RegistrosFalsos:
+    def __init__(self):
+        self.registros = []
+
+    async def registrar(self, **campos):
+        self.registros.append(campos)
+
+
+class SaidaFalsa:
+    async def escrever_muitas(self, linhas, depois=None):
+        if depois:
+            depois()
+
+
+class ErroStatus(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _ctx(url, label):
+    return SimpleNamespace(request=Request.from_url(url, label=label, user_data={"doi": "10.1/a", "ordem_doi": 1}))
+
+
+def test_falhas_gravam_registro_da_requisicao():
+    async def rodar():
+        crawler = FormatadoCrawler(modo_extracao="inline")
+        crawler.registros = RegistrosFalsos()
+        crawler.saida_pdf = SaidaFalsa()
+        await crawler.handle_falha(_ctx("https://api.unpaywall.org/v2/10.1/a", "unpaywall"), TimeoutError())
+        await crawler.handle_falha(_ctx("https://api.unpaywall.org/v2/10.1/a", "unpaywall"), ErroStatus(401))
+        await crawler.handle_falha(_ctx("https://exemplo.org/a.pdf", "pdf"), ErroStatus(410))
+        return crawler.registros.registros
+
+    timeout, nao_autorizado, pdf = asyncio.run(rodar())
+    assert (timeout["etapa"], timeout["estado"], timeout["motivo_abortado"]) == ("unpaywall", "falhou", "TimeoutError")
+    assert (nao_autorizado["http_status"], nao_autorizado["motivo_abortado"]) == (401, "ErroStatus")
+    assert (pdf["etapa"], pdf["http_status"], pdf["estado"]) == ("pdf", 410, "requisição 410")
@@ -0,0 +1,31 @@
+from progresso import DiarioProgresso, ESTADOS_CONCLUIDOS_ELSEVIER
+
+
+def test_concluidos_usa_o_ultimo_estado(tmp_path):
+    diario = DiarioProgresso(str(tmp_path / "progresso.sqlite"))
+    diario.registrar("10.1/a", "pdf normal")
+    diario.registrar("10.1/b", "processamento falhou")
+    diario.registrar("10.1/c", "requisição 503")
+    diario.registrar("10.1/c", "pdf em cache")
+    diario.registrar("10.1/d", "pdf normal")
+    diario.registrar("10.1/d", "download falhou")
+    assert diario.concluidos() == {"10.1/a", "10.1/c"}
+    diario.fechar()
+
+
+def test_retomada_preserva_o_diario(tmp_path):
+    caminho = str(tmp_path / "progresso.sqlite")
+    diario = DiarioProgresso(caminho)
+    diario.registrar("10.1/a", "página unpaywall vazia")
+    diario.fechar()
+    assert DiarioProgresso(caminho).concluidos() == {"10.1/a"}
+
+
+def test_estagio_elsevier_so_pula_os_proprios_estados(tmp_path):
+    diario = DiarioProgresso(str(tmp_path / "progresso.sqlite"))
+    diario.registrar("10.1/roteado", "elsevier")
+    diario.registrar("10.1/extraido", "elsevier processado")
+    diario.registrar("10.1/pdf", "pdf normal")
+    assert diario.concluidos() == {"10.1/roteado", "10.1/extraido", "10.1/pdf"}
+    assert diario.concluidos(ESTADOS_CONCLUIDOS_ELSEVIER) == {"10.1/extraido"}
+    diario.fechar()
@@ -0,0 +1,47 @@
+import asyncio
+
+from retentativas import FilaRetentativas, falha_transitoria
+
+
+class ErroStatus(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_falha_transitoria():
+    assert falha_transitoria(status=503)
+    assert not falha_transitoria(status=404)
+    assert falha_transitoria(excecao=TimeoutError())
+    assert falha_transitoria(excecao=ErroStatus(429))
+    assert not falha_transitoria(excecao=ErroStatus(403))
+    assert not falha_transitoria(excecao=ValueError("certificate verify failed"))
+
+
+def test_limites_por_host():
+    fila = FilaRetentativas(max_tentativas=2, max_pendentes_por_host=1, orcamento_por_host=2, seed=1)
+    assert fila.agendar("a", "h", 1)
+    assert not fila.agendar("b", "h", 1)   # já há uma pendente no host
+    assert not fila.agendar("c", "x", 3)   # passou de max_tentativas
+    assert fila.agendar("d", "x", 1)
+    assert fila.recusadas == 2
+
+
+def test_espera_respeita_retry_after_e_teto():
+    fila = FilaRetentativas(espera_base=10, espera_max=60, seed=1)
+    assert 5 <= fila.espera(1) <= 10
+    assert 30 <= fila.espera(10) <= 60
+    assert 20 <= fila.espera(1, retry_after=20) <= 22
+
+
+def test_liberar_devolve_quando_vence():
+    async def rodar():
+        fila = FilaRetentativas(seed=1)
+        fila.agendar("a", "h", 1, retry_after=0)
+
+        async def ocioso():
+            return True
+
+        return [item async for item in fila.liberar(ocioso, intervalo=0.01)]
+
+    assert asyncio.run(rodar()) == ["a"]
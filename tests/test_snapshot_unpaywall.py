@@ -0,0 +1,38 @@
+import gzip
+import json
+from snapshot_unpaywall import IndiceSnapshotUnpaywall, normalizar_doi
+
+
+def _gravar(caminho, registros):
+    with gzip.open(caminho, "wt", encoding="utf-8") as f:
+        for registro in registros:
+            f.write((registro if isinstance(registro, str) else json.dumps(registro)) + "\n")
+
+
+def test_normalizar_doi():
+    assert normalizar_doi(" https://doi.org/10.1/ABC ") == "10.1/abc"
+    assert normalizar_doi("doi:10.1/X") == "10.1/x"
+
+
+def test_importar_e_changefile_mais_novo(tmp_path):
+    snapshot = tmp_path / "snapshot.jsonl.gz"
+    _gravar(snapshot, [
+        {"doi": "10.1/A", "publisher": "Velho", "updated": "2024-01-01", "best_oa_location": {"url_for_pdf": "u", "x": 1}},
+        "linha inválida",
+    ])
+    changefile = tmp_path / "changefile.jsonl.gz"
+    _gravar(changefile, [{"doi": "10.1/a", "publisher": "Antigo", "updated": "2023-01-01"}])
+
+    indice = IndiceSnapshotUnpaywall(str(tmp_path / "indice.sqlite"), tamanho_lote=1)
+    try:
+        assert indice.importar(str(snapshot)) == 1
+        assert indice.importar(str(snapshot)) == 0  # já importado
+        indice.importar(str(changefile))            # mais antigo: não substitui
+
+        encontrado, dados = indice.buscar("https://doi.org/10.1/A")
+        assert encontrado
+        assert dados["publisher"] == "Velho"
+        assert dados["best_oa_location"] == {"url_for_pdf": "u", "url": None}
+        assert indice.buscar("10.1/b") == (False, None)
+    finally:
+        indice.fechar()
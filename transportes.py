@@ -0,0 +1,145 @@
+import ssl
+import json
+import time
+from urllib.parse import urlparse
+import certifi
+from crawlee import Request
+from download_pdf import RespostaPDF, ImpitPDFStreamingClient, consumir_corpo_pdf
+from retentativas import erro_de_certificado
+from otel_setup import tracer, bytes_downloaded_counter
+
+
+HEADERS_NAVEGADOR = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+    "Sec-Ch-Ua": "\"Chromium\";v=\"136\", \"Google Chrome\";v=\"136\", \"Not.A/Brand\";v=\"99\"",
+}
+
+
+def _decodificar_json(corpo: bytes) -> dict | None:
+    try:
+        return json.loads(corpo)
+    except ValueError:
+        return None
+
+
+class TransporteAiohttp:
+    """Transporte do PipelinePDF sobre aiohttp.
+
+    Um único ClientSession com pool de conexões ajustável (`limite_conexoes`, `limite_por_host`;
+    0 = sem limite) e cache de DNS por `ttl_dns` segundos. PDFs vêm em streaming com as mesmas
+    regras do ImpitPDFStreamingClient (sniff de %PDF-, `max_bytes`, spool em disco).
+    Com `confianca_tls`, hosts com cadeia quebrada usam o SSLContext guardado no cache TLS.
+    """
+
+    nome = "aiohttp"
+
+    def __init__(self, limite_conexoes: int = 100, limite_por_host: int = 0, ttl_dns: int = 300, timeout: float = 30.0,
+                 max_bytes: int = 50 * 1024 * 1024, limiar_disco: int = 4 * 1024 * 1024, pasta_temp: str | None = None,
+                 confianca_tls=None):
+        self.limite_conexoes = limite_conexoes
+        self.limite_por_host = limite_por_host
+        self.ttl_dns = ttl_dns
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.limiar_disco = limiar_disco
+        self.pasta_temp = pasta_temp
+        self.confianca_tls = confianca_tls
+        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
+        self.session = None
+
+    async def __aenter__(self):
+        import aiohttp
+        conector = aiohttp.TCPConnector(
+            limit=self.limite_conexoes,
+            limit_per_host=self.limite_por_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.ttl_dns,
+            enable_cleanup_closed=True,
+        )
+        self.session = aiohttp.ClientSession(connector=conector, headers=HEADERS_NAVEGADOR,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    async def obter_json(self, url: str) -> tuple[int, dict | None]:
+        async with self.session.get(url, ssl=self.ssl_context) as resp:
+            return resp.status, _decodificar_json(await resp.read())
+
+    async def baixar_pdf(self, url: str, headers: dict | None = None) -> RespostaPDF:
+        parsed = urlparse(url)
+        host = parsed.hostname
+        inicio = time.perf_counter()
+        with tracer.start_as_current_span("download_pdf") as span:
+            span.set_attribute("host", host or "")
+            contexto = self.confianca_tls.contexto_conhecido(host) if self.confianca_tls else None
+            try:
+                resposta = await self._baixar(url, headers, contexto or self.ssl_context)
+            except Exception as e:
+                if not self.confianca_tls or not erro_de_certificado(e):
+                    raise
+                if contexto:  # a cadeia guardada não vale mais (certificado renovado): resolve de novo, uma vez
+                    self.confianca_tls.invalidar(host, contexto)
+                contexto = await self.confianca_tls.contexto(host, parsed.port or 443)
+                if contexto is None:
+                    raise
+                resposta = await self._baixar(url, headers, contexto)
+            resposta.tls_fallback = contexto is not None
+            resposta.duracao_download = time.perf_counter() - inicio
+            span.set_attributes({"http.status_code": resposta.status_code, "bytes": resposta.tamanho,
+                                 "abortado": resposta.motivo_abortado or "", "tls_fallback": resposta.tls_fallback})
+        bytes_downloaded_counter.add(resposta.tamanho, {"host": host or ""})
+        return resposta
+
+    async def _baixar(self, url: str, headers: dict | None, contexto: ssl.SSLContext) -> RespostaPDF:
+        async with self.session.get(url, headers=headers, ssl=contexto) as resp:
+            resposta = RespostaPDF(f"HTTP/{resp.version.major}.{resp.version.minor}", resp.status, resp.headers)
+            if resp.status == 200:
+                await consumir_corpo_pdf(resp.content.iter_chunked(64 * 1024), resp.headers, resposta,
+                                         self.max_bytes, self.limiar_disco, self.pasta_temp)
+        return resposta
+
+
+class TransporteImpit:
+    """Transporte do PipelinePDF sobre o ImpitHttpClient do Crawlee (impersonation de navegador, HTTP/3).
+
+    Os PDFs passam pelo ImpitPDFStreamingClient (streaming + fallback do cache TLS); o
+    agendador por host e o cache de PDFs ficam com o PipelinePDF, como no transporte aiohttp.
+    """
+
+    nome = "impit"
+
+    def __init__(self, browser: str = "chrome", http3: bool = True, max_bytes: int = 50 * 1024 * 1024,
+                 limiar_disco: int = 4 * 1024 * 1024, pasta_temp: str | None = None, confianca_tls=None):
+        self.confianca_tls = confianca_tls
+        self.cliente = ImpitPDFStreamingClient(
+            browser=browser,
+            http3=http3,
+            verify=True,
+            max_bytes=max_bytes,
+            limiar_disco=limiar_disco,
+            pasta_temp=pasta_temp,
+            confianca_tls=confianca_tls,
+        )
+
+    async def __aenter__(self):
+        await self.cliente.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.cliente.__aexit__(*exc)
+
+    async def obter_json(self, url: str) -> tuple[int, dict | None]:
+        resp = await self.cliente.send_request(url)
+        return resp.status_code, _decodificar_json(await resp.read())
+
+    async def baixar_pdf(self, url: str, headers: dict | None = None) -> RespostaPDF:
+        resultado = await self.cliente.crawl(Request.from_url(url, label="pdf", headers=headers or {}))
+        return resultado.http_response
+
+
+TRANSPORTES = {"aiohttp": TransporteAiohttp, "impit": TransporteImpit}